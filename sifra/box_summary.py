@@ -0,0 +1,83 @@
+"""
+Box plot statistics calculated directly from arrays of samples.
+
+The statistics of all the hazard levels are found with vectorised
+percentile calculations, and drawn with matplotlib's bxp, so the cost of
+drawing a box plot does not depend on the number of samples.
+"""
+
+import numpy as np
+
+# the statistics of a box, in the order of the rows of a box stats array
+BOX_STATISTICS = ('whislo', 'q1', 'med', 'q3', 'whishi', 'mean')
+
+
+def box_stats(values, axis=0, whis=1.5, labels=None):
+    """
+    Calculate the box plot statistics of each column of an array.
+    :param values: Array of samples, e.g. samples x hazards
+    :param axis: The axis of the samples
+    :param whis: Reach of the whiskers beyond the quartiles, as a multiple
+                 of the interquartile range. The whiskers end at the most
+                 extreme sample within that reach.
+    :param labels: Optional labels of the boxes
+    :return: List of dicts of statistics, in the form accepted by Axes.bxp
+    """
+    values = np.rollaxis(np.asarray(values, dtype=np.float64), axis, 0)
+    values = values.reshape(values.shape[0], -1)
+
+    q1, med, q3 = np.percentile(values, [25, 50, 75], axis=0)
+    iqr = q3 - q1
+    low_reach = q1 - whis * iqr
+    high_reach = q3 + whis * iqr
+
+    # the most extreme samples within the reach of the whiskers
+    whislo = np.min(np.where(values >= low_reach, values, np.inf), axis=0)
+    whishi = np.max(np.where(values <= high_reach, values, -np.inf), axis=0)
+    means = np.mean(values, axis=0)
+
+    if labels is None:
+        labels = [None] * values.shape[1]
+
+    return [{'label': labels[i],
+             'mean': means[i],
+             'med': med[i],
+             'q1': q1[i],
+             'q3': q3[i],
+             'whislo': whislo[i],
+             'whishi': whishi[i],
+             'fliers': np.array([])}
+            for i in range(values.shape[1])]
+
+
+def box_stats_array(stats):
+    """
+    Arrange box plot statistics as an array that can be stored.
+    :param stats: List of dicts of statistics, as returned by box_stats
+    :return: Array of statistics x boxes, the rows are in the order of
+             BOX_STATISTICS
+    """
+    return np.array([[box[statistic] for box in stats]
+                     for statistic in BOX_STATISTICS], dtype=np.float64)
+
+
+def box_stats_from_array(stats_array, labels=None):
+    """
+    Rebuild the box plot statistics from an array of statistics.
+    :param stats_array: Array of statistics x boxes, as from box_stats_array
+    :param labels: Optional labels of the boxes
+    :return: List of dicts of statistics, in the form accepted by Axes.bxp
+    """
+    stats_array = np.asarray(stats_array)
+    num_boxes = stats_array.shape[1]
+    if labels is None:
+        labels = [None] * num_boxes
+
+    stats = []
+    for i in range(num_boxes):
+        box = {statistic: stats_array[k, i]
+               for k, statistic in enumerate(BOX_STATISTICS)}
+        box['label'] = labels[i]
+        box['fliers'] = np.array([])
+        stats.append(box)
+    return stats
@@ -0,0 +1,114 @@
+"""
+Persistence of partial simulation results.
+
+Each completed block of samples of a hazard level is written to its own
+file in the raw output directory of the run, so that an interrupted run
+can be resumed without repeating the completed work. The hash of the
+model and scenario of the run is written with the blocks, and blocks of a
+run with a different hash are discarded instead of being resumed.
+"""
+
+import os
+import shutil
+import logging
+import tempfile
+import cPickle as pickle
+
+
+class Checkpoint(object):
+    """
+    Stores the results of the (hazard level, sample block) pairs
+    that have been completed in a run.
+    """
+
+    KEY_FILE_NAME = 'run_key.txt'
+
+    def __init__(self, raw_output_dir, run_key=None, dir_name='checkpoints'):
+        """
+        :param raw_output_dir: Raw output directory of the run
+        :param run_key: Hash of the model and scenario of the run, the
+                        saved blocks of a run with another hash are removed
+        :param dir_name: Name of the checkpoint directory
+        """
+        self.checkpoint_dir = os.path.join(raw_output_dir, dir_name)
+        self.run_key = run_key
+        if run_key is not None and os.path.exists(self.checkpoint_dir) \
+                and self.saved_key() != run_key:
+            logging.warning("Discarding the checkpoints in {} of a run with "
+                            "another model or scenario".format(
+                                self.checkpoint_dir))
+            self.remove()
+        if not os.path.exists(self.checkpoint_dir):
+            os.makedirs(self.checkpoint_dir)
+            if run_key is not None:
+                with open(self.key_path(), 'w') as key_file:
+                    key_file.write(run_key)
+
+    def key_path(self):
+        return os.path.join(self.checkpoint_dir, self.KEY_FILE_NAME)
+
+    def saved_key(self):
+        """
+        The hash of the run the saved blocks belong to.
+        :return: The hash, or None if it was not saved
+        """
+        if not os.path.exists(self.key_path()):
+            return None
+        with open(self.key_path()) as key_file:
+            return key_file.read().strip()
+
+    def remove(self):
+        """
+        Delete the checkpoint directory and the saved blocks.
+        :return: None
+        """
+        if os.path.exists(self.checkpoint_dir):
+            shutil.rmtree(self.checkpoint_dir)
+
+    def block_path(self, hazard_intensity, block_index):
+        """
+        The file that holds the results of a block of samples.
+        :param hazard_intensity: Value of the hazard intensity
+        :param block_index: Index of the block of samples
+        :return: Path of the checkpoint file
+        """
+        file_name = 'haz_{:0.3f}_block_{:05d}.pickle'.format(
+            float(hazard_intensity), block_index)
+        return os.path.join(self.checkpoint_dir, file_name)
+
+    def load(self, hazard_intensity, block_index):
+        """
+        Read the results of a completed block of samples.
+        :param hazard_intensity: Value of the hazard intensity
+        :param block_index: Index of the block of samples
+        :return: The saved results, or None if the block was not completed
+        """
+        path = self.block_path(hazard_intensity, block_index)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as handle:
+            return pickle.load(handle)
+
+    def save(self, hazard_intensity, block_index, results):
+        """
+        Write the results of a block of samples. The results are written
+        to a temporary file that is renamed once complete, so a crash
+        during the write never leaves a partial checkpoint behind.
+        :param hazard_intensity: Value of the hazard intensity
+        :param block_index: Index of the block of samples
+        :param results: The results of the block
+        :return: None
+        """
+        path = self.block_path(hazard_intensity, block_index)
+        handle, tmp_path = tempfile.mkstemp(dir=self.checkpoint_dir,
+                                            suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as tmp_file:
+                pickle.dump(results, tmp_file, pickle.HIGHEST_PROTOCOL)
+                tmp_file.flush()
+                os.fsync(tmp_file.fileno())
+            os.rename(tmp_path, path)
+        except:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
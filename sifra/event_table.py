@@ -0,0 +1,103 @@
+"""
+Export of the per-sample responses of a run as a Parquet event table.
+
+The table is in long format, with one row per sample of each hazard level:
+
+    hazard, sample, economic_loss, output_<output node id>..., recovery_time
+
+The rows of each hazard level are written as one row group, so readers
+such as pyarrow, pandas or query engines can skip the hazard levels they
+do not need from the row group statistics. A run appends the row group of
+each hazard level as soon as the hazard level is simulated.
+
+Writing the table requires the optional pyarrow package.
+"""
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+EVENT_TABLE_FILE_NAME = 'event_table.parquet'
+
+
+class EventTableWriter(object):
+    """
+    Writes the event table one hazard level at a time.
+    """
+
+    def __init__(self, path, output_node_ids=(), include_loss=True,
+                 include_recovery=True, compression='snappy'):
+        """
+        :param path: Path of the Parquet file
+        :param output_node_ids: Ids of the output nodes, an output column
+                                is written for each node
+        :param include_loss: Write the economic loss column
+        :param include_recovery: Write the recovery time column
+        :param compression: Parquet compression codec
+        """
+        if pq is None:
+            raise ImportError("pyarrow is required to export the event table")
+
+        self.path = path
+        self.output_node_ids = list(output_node_ids)
+        self.include_loss = include_loss
+        self.include_recovery = include_recovery
+
+        fields = [pa.field('hazard', pa.float64()),
+                  pa.field('sample', pa.int64())]
+        if include_loss:
+            fields.append(pa.field('economic_loss', pa.float64()))
+        fields.extend(pa.field(self.output_column(node_id), pa.float64())
+                      for node_id in self.output_node_ids)
+        if include_recovery:
+            fields.append(pa.field('recovery_time', pa.float64()))
+        self.schema = pa.schema(fields)
+        self.writer = pq.ParquetWriter(path, self.schema,
+                                       compression=compression)
+
+    @staticmethod
+    def output_column(node_id):
+        return 'output_{}'.format(node_id)
+
+    def write_hazard(self, hazard_intensity, economic_loss=None,
+                     sample_output=None, recovery_time=None):
+        """
+        Write the samples of a hazard level as one row group.
+        :param hazard_intensity: The hazard intensity value
+        :param economic_loss: Economic loss of each sample
+        :param sample_output: Output of each sample, samples x output nodes
+        :param recovery_time: Recovery time of each sample
+        :return: None
+        """
+        columns = [economic_loss, sample_output, recovery_time]
+        num_samples = len(next(c for c in columns if c is not None))
+
+        arrays = [pa.array(np.full(num_samples, hazard_intensity,
+                                   dtype=np.float64)),
+                  pa.array(np.arange(num_samples, dtype=np.int64))]
+        if self.include_loss:
+            arrays.append(pa.array(np.asarray(economic_loss,
+                                              dtype=np.float64)))
+        for node_index in range(len(self.output_node_ids)):
+            arrays.append(pa.array(np.asarray(sample_output[:, node_index],
+                                              dtype=np.float64)))
+        if self.include_recovery:
+            arrays.append(pa.array(np.asarray(recovery_time,
+                                              dtype=np.float64)))
+
+        table = pa.Table.from_arrays(arrays, names=self.schema.names)
+        self.writer.write_table(table, row_group_size=num_samples)
+
+    def close(self):
+        self.writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,228 @@
+"""
+Bootstrap confidence intervals of the fitted system models.
+
+A bootstrap replicate resamples, with replacement, the samples of each
+hazard level of a run. For the fragility fit only the number of samples
+in each damage state matters, so the replicates are drawn directly as
+multinomial counts of the damage states, for all replicates at once.
+For the restoration fit each replicate is a vector of multinomial weights
+of the samples, and the weighted restoration profiles of a block of
+replicates are found with matrix products. The replicates are refitted
+with the estimators of the reported models, fit_fragility_curves and
+fit_restoration_curves.
+
+The replicates are refitted in a pool of processes. The arrays of a
+bootstrap are passed to each process once, when the pool is started, and
+the tasks only hold the range or the seed of their block of replicates.
+"""
+
+from __future__ import division
+from multiprocessing import Pool
+import warnings
+
+import numpy as np
+
+from fragility import exceedance_counts, damage_state_mean
+from fragility_fit import fit_fragility_curves
+from restoration_fit import fit_restoration_curves
+
+DEFAULT_PERCENTILES = (2.5, 50.0, 97.5)
+
+# the arrays of the fragility and restoration bootstraps, set once in
+# each process of the pool
+_fragility_data = {}
+_restoration_data = {}
+
+
+def _split(num_replicates, processes):
+    """
+    Split the replicates into blocks, a few for each process.
+    :return: list of the numbers of replicates in the blocks
+    """
+    num_blocks = max(1, min(num_replicates, 4 * (processes or 4)))
+    return [len(block) for block in
+            np.array_split(np.arange(num_replicates), num_blocks)]
+
+
+def _map(func, tasks, processes, initializer=None, initargs=()):
+    if processes == 1:
+        if initializer is not None:
+            initializer(*initargs)
+        return [func(task) for task in tasks]
+    pool = Pool(processes, initializer, initargs)
+    try:
+        return pool.map(func, tasks)
+    finally:
+        pool.close()
+        pool.join()
+
+
+# ----------------------------------------------------------------------------
+# System fragility
+# ----------------------------------------------------------------------------
+
+def resample_exceedance_counts(sys_frag, num_damage_states, num_replicates,
+                               prng):
+    """
+    Draw bootstrap replicates of the exceedance counts of the damage states.
+    :param sys_frag: damage state index of the samples, samples x hazards
+    :param num_damage_states: number of damage states, with 'no damage'
+    :param num_replicates: number of bootstrap replicates
+    :param prng: numpy RandomState
+    :return: integer array, replicates x damage states x hazards
+    """
+    num_samples, num_hazard_pts = np.shape(sys_frag)
+    counts = exceedance_counts(sys_frag, num_damage_states)
+    # fraction of the samples in each damage state
+    in_state = (counts - np.vstack((counts[1:], np.zeros(num_hazard_pts)))) \
+        / num_samples
+
+    replicates = np.empty((num_replicates, num_damage_states, num_hazard_pts),
+                          dtype=int)
+    for j in range(num_hazard_pts):
+        replicates[:, :, j] = prng.multinomial(num_samples, in_state[:, j],
+                                               size=num_replicates)
+    # samples at or above each damage state
+    return np.cumsum(replicates[:, ::-1, :], axis=1)[:, ::-1, :]
+
+
+def _init_fragility(hazard_vals, counts):
+    _fragility_data.update(hazard_vals=hazard_vals, counts=counts)
+
+
+def _fit_fragility_block(task):
+    start, stop = task
+    hazard_vals = _fragility_data['hazard_vals']
+    counts = _fragility_data['counts'][start:stop]
+    fits = np.empty((len(counts), 2, counts.shape[1] - 1))
+    for r, replicate_counts in enumerate(counts):
+        pe = replicate_counts[1:] / replicate_counts[0].astype(np.float64)
+        medians, logstds, _ = fit_fragility_curves(hazard_vals, pe)
+        fits[r, 0, :] = medians
+        fits[r, 1, :] = logstds
+    return fits
+
+
+def bootstrap_fragility(hazard_vals, sys_frag, num_damage_states,
+                        num_replicates=1000, percentiles=DEFAULT_PERCENTILES,
+                        processes=None, seed=None):
+    """
+    Bootstrap percentiles of the parameters of the system fragility curves.
+    :param hazard_vals: hazard intensity values (1D numpy array)
+    :param sys_frag: damage state index of the samples, samples x hazards
+    :param num_damage_states: number of damage states, with 'no damage'
+    :param num_replicates: number of bootstrap replicates
+    :param percentiles: percentiles of the parameters to report
+    :param processes: number of fitting processes, one per CPU if not given
+    :param seed: seed of the resampling
+    :return: (median percentiles, logstd percentiles), each an array of
+             percentiles x damage states, without 'no damage'
+    """
+    prng = np.random.RandomState(seed)
+    counts = resample_exceedance_counts(sys_frag, num_damage_states,
+                                        num_replicates, prng)
+    block_ends = np.cumsum(_split(num_replicates, processes))
+    tasks = zip(np.append(0, block_ends[:-1]), block_ends)
+    fits = np.concatenate(_map(_fit_fragility_block, tasks, processes,
+                               _init_fragility,
+                               (np.asarray(hazard_vals), counts)))
+    return (np.percentile(fits[:, 0, :], percentiles, axis=0),
+            np.percentile(fits[:, 1, :], percentiles, axis=0))
+
+
+# ----------------------------------------------------------------------------
+# System restoration
+# ----------------------------------------------------------------------------
+
+def _init_restoration(sys_frag, output_given_recovery, nominal_output,
+                      restoration_time_range, num_damage_states):
+    _restoration_data.update(
+        sys_frag=sys_frag,
+        output_given_recovery=output_given_recovery,
+        nominal_output=nominal_output,
+        restoration_time_range=restoration_time_range,
+        num_damage_states=num_damage_states)
+
+
+def restoration_profiles(weights, sys_frag, output_given_recovery,
+                         nominal_output, num_damage_states):
+    """
+    Weighted mean restoration profile of each damage state, averaged over
+    the hazard levels, for a block of bootstrap replicates.
+    :param weights: sample weights, replicates x hazards x samples
+    :param sys_frag: damage state index of the samples, samples x hazards
+    :param output_given_recovery: samples x hazards x times
+    :param nominal_output: nominal output of the system
+    :param num_damage_states: number of damage states, with 'no damage'
+    :return: array of replicates x damage states x times
+    """
+    num_replicates, num_hazard_pts, _ = weights.shape
+    num_times = output_given_recovery.shape[2]
+    profiles = np.full((num_replicates, num_hazard_pts, num_damage_states,
+                        num_times), np.nan)
+    for j in range(num_hazard_pts):
+        profiles[:, j, :, :] = damage_state_mean(
+            sys_frag[:, j], output_given_recovery[:, j, :],
+            num_damage_states, weights[:, j, :]) / nominal_output
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        return np.nanmean(profiles, axis=1)
+
+
+def _fit_restoration_block(task):
+    num_replicates, seed = task
+    data = _restoration_data
+    num_samples, num_hazard_pts = data['sys_frag'].shape
+    prng = np.random.RandomState(seed)
+
+    # multinomial weights of the samples of each hazard level
+    weights = prng.multinomial(num_samples, np.ones(num_samples) / num_samples,
+                               size=(num_replicates, num_hazard_pts))
+    profiles = restoration_profiles(weights, data['sys_frag'],
+                                    data['output_given_recovery'],
+                                    data['nominal_output'],
+                                    data['num_damage_states'])
+
+    fits = np.empty((num_replicates, 2, data['num_damage_states'] - 1))
+    for r in range(num_replicates):
+        means, stddevs, _ = fit_restoration_curves(
+            data['restoration_time_range'], profiles[r, 1:])
+        fits[r, 0, :] = means
+        fits[r, 1, :] = stddevs
+    return fits
+
+
+def bootstrap_restoration(restoration_time_range, sys_frag,
+                          output_given_recovery, nominal_output,
+                          num_damage_states, num_replicates=1000,
+                          percentiles=DEFAULT_PERCENTILES,
+                          processes=None, seed=None):
+    """
+    Bootstrap percentiles of the parameters of the normal CDF restoration
+    model of each damage state.
+    :param restoration_time_range: restoration times (1D numpy array)
+    :param sys_frag: damage state index of the samples, samples x hazards
+    :param output_given_recovery: output of the samples during recovery,
+                                  samples x hazards x times
+    :param nominal_output: nominal output of the system
+    :param num_damage_states: number of damage states, with 'no damage'
+    :param num_replicates: number of bootstrap replicates
+    :param percentiles: percentiles of the parameters to report
+    :param processes: number of fitting processes, one per CPU if not given
+    :param seed: seed of the resampling
+    :return: (mean percentiles, stddev percentiles), each an array of
+             percentiles x damage states, without 'no damage'
+    """
+    block_sizes = _split(num_replicates, processes)
+    seeds = np.random.RandomState(seed).randint(0, 2 ** 31 - 1,
+                                                 size=len(block_sizes))
+    tasks = zip(block_sizes, seeds)
+    fits = np.concatenate(_map(
+        _fit_restoration_block, tasks, processes, _init_restoration,
+        (np.asarray(sys_frag), np.asarray(output_given_recovery),
+         nominal_output, np.asarray(restoration_time_range),
+         num_damage_states)))
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        return (np.nanpercentile(fits[:, 0, :], percentiles, axis=0),
+                np.nanpercentile(fits[:, 1, :], percentiles, axis=0))
@@ -1,5 +1,12 @@
 from __future__ import print_function
 from sifraclasses import *
+from results_store import RunResults
+from fragility import damage_state_mean
+from fragility_fit import probit_estimates, fit_fragility_curves, \
+    fit_fragility_mle
+from restoration_fit import norm_cdf, fit_restoration_curves
+from fit_bootstrap import bootstrap_fragility, bootstrap_restoration, \
+    DEFAULT_PERCENTILES
 
 import matplotlib.pyplot as plt
 from matplotlib.font_manager import FontProperties
@@ -96,158 +103,54 @@ def res_lognorm_cdf(params, x, data, eps=None):
 
 # ============================================================================
 
-def fit_prob_exceed_model(hazard_input_vals, pb_exceed, SYS_DS, out_path):
+def fragility_model(hazard_input_vals, pb_exceed, SYS_DS):
     """
-    Fit a Lognormal CDF model to simulated probability exceedance data
+    Fit a Lognormal CDF model to simulated probability exceedance data,
+    without writing or plotting the fitted model
 
     :param hazard_input_vals: input values for hazard intensity (numpy array)
     :param pb_exceed: probability of exceedance (2D numpy array)
     :param SYS_DS: discrete damage states (list)
-    :param out_path: directory path for writing output (string)
     :returns:  fitted exceedance model parameters (PANDAS dataframe)
     """
-    # DataFrame for storing the calculated System Damage Algorithms for
-    # exceedance probabilities.
+    # ----- Joint fit of all damage states -----
+    # Each damage state has its own logstd, the medians increase with the
+    # damage state. The fit starts from the closed form probit estimates.
+    medians, logstds, chisqr = fit_fragility_curves(hazard_input_vals,
+                                                    pb_exceed[1:])
     indx = pd.Index(SYS_DS[1:], name='Damage States')
-    sys_dmg_model = pd.DataFrame(index=indx,
-                                 columns=['Median',
-                                          'LogStdDev',
-                                          'Location',
-                                          'Chi-Sqr'])
-    decimals = pd.Series([3, 3, 3],
-                         index=['Median', 'LogStdDev', 'Location'])
-
-    # ----- Initial fit -----
-    sys_dmg_ci = [{} for _ in xrange(len(SYS_DS))]
-    sys_dmg_fit = [[] for _ in xrange(len(SYS_DS))]
-    for dx in range(1, len(SYS_DS)):
-        x_sample = hazard_input_vals
-        y_sample = pb_exceed[dx]
-
-        p0m = np.mean(y_sample)
-        p0s = np.std(y_sample)
+    return pd.DataFrame(
+        {'Median': medians, 'LogStdDev': logstds,
+         'Location': 0.0, 'Chi-Sqr': chisqr},
+        index=indx, columns=['Median', 'LogStdDev', 'Location', 'Chi-Sqr'])
 
-        # Fit the dist:
-        params_pe = lmfit.Parameters()
-        params_pe.add('median', value=p0m)  # , min=0, max=10)
-        params_pe.add('logstd', value=p0s)
-        params_pe.add('loc', value=0.0, vary=False)
 
-        sys_dmg_fit[dx] = lmfit.minimize(res_lognorm_cdf, params_pe,
-                                         args=(x_sample, y_sample))
-
-        sys_dmg_model.loc[SYS_DS[dx]] \
-            = (sys_dmg_fit[dx].params['median'].value,
-               sys_dmg_fit[dx].params['logstd'].value,
-               sys_dmg_fit[dx].params['loc'].value,
-               sys_dmg_fit[dx].chisqr)
+def fit_prob_exceed_model(hazard_input_vals, pb_exceed, SYS_DS, out_path):
+    """
+    Fit a Lognormal CDF model to simulated probability exceedance data
 
-    # sys_dmg_model['Median'] = sys_dmg_model['Median'].map('{:,.3f}'.format)
-    # sys_dmg_model['LogStdDev'] = sys_dmg_model['LogStdDev'].map('{:,.3f}'.format)
-    # sys_dmg_model['Location'] = sys_dmg_model['Location'].map('{:,.1f}'.format)
+    :param hazard_input_vals: input values for hazard intensity (numpy array)
+    :param pb_exceed: probability of exceedance (2D numpy array)
+    :param SYS_DS: discrete damage states (list)
+    :param out_path: directory path for writing output (string)
+    :returns:  fitted exceedance model parameters (PANDAS dataframe)
+    """
+    indx = pd.Index(SYS_DS[1:], name='Damage States')
+    medians0, logstds0 = probit_estimates(hazard_input_vals, pb_exceed[1:])
+    sys_dmg_model = fragility_model(hazard_input_vals, pb_exceed, SYS_DS)
 
     print("\n" + "-" * 79)
     print(Fore.YELLOW +
           "Fitting system FRAGILITY data: Lognormal CDF" +
           Fore.RESET)
     print("-" * 79)
-    # sys_dmg_model = sys_dmg_model.round(decimals)
-    print("INITIAL System Fragilities:\n\n",
-          sys_dmg_model, '\n')
+    print("INITIAL System Fragilities (probit estimates):\n\n",
+          pd.DataFrame({'Median': medians0, 'LogStdDev': logstds0},
+                       index=indx, columns=['Median', 'LogStdDev']), '\n')
 
-    # ----- Check for crossover and resample as needed -----
-    for dx in range(1, len(SYS_DS)):
-        x_sample = hazard_input_vals
-        y_sample = pb_exceed[dx]
-
-        mu_hi = sys_dmg_fit[dx].params['median'].value
-        sd_hi = sys_dmg_fit[dx].params['logstd'].value
-        loc_hi = sys_dmg_fit[dx].params['loc'].value
-
-        y_model_hi = stats.lognorm.cdf(x_sample, sd_hi,
-                                       loc=loc_hi, scale=mu_hi)
-
-        params_pe.add('median', value=mu_hi, min=0, max=10)
-        params_pe.add('logstd', value=sd_hi)
-        params_pe.add('loc', value=0.0, vary=False)
-        sys_dmg_fit[dx] = lmfit.minimize(res_lognorm_cdf, params_pe,
-                                         args=(x_sample, y_sample))
-
-        ######################################################################
-        if dx >= 2:
-            mu_lo, sd_lo, loc_lo, chi = \
-                sys_dmg_model.loc[SYS_DS[dx - 1]].values
-            y_model_lo = stats.lognorm.cdf(x_sample, sd_lo,
-                                           loc=loc_lo, scale=mu_lo)
-
-            if sum(y_model_lo - y_model_hi < 0):
-                print(Fore.MAGENTA + "There is overlap for curve pair   : " +
-                      SYS_DS[dx - 1] + '-' + SYS_DS[dx] +
-                      Fore.RESET)
-
-                # Test if higher curve is co-incident with,
-                # or precedes lower curve
-                if (mu_hi <= mu_lo) or (loc_hi <= loc_lo):
-                    print("   *** Mean of higher curve too low: resampling")
-                    params_pe.add('median', value=mu_hi, min=mu_lo)
-                    sys_dmg_fit[dx] = lmfit.minimize(
-                        res_lognorm_cdf, params_pe, args=(x_sample, y_sample))
-
-                    (mu_hi, sd_hi, loc_hi) = \
-                        (sys_dmg_fit[dx].params['median'].value,
-                         sys_dmg_fit[dx].params['logstd'].value,
-                         sys_dmg_fit[dx].params['loc'].value)
-
-                # Thresholds for testing top or bottom crossover
-                delta_top = (3.0 * sd_lo - (mu_hi - mu_lo)) / 3
-                delta_btm = (3.0 * sd_lo + (mu_hi - mu_lo)) / 3
-
-                # Test for top crossover: resample if crossover detected
-                if (sd_hi < sd_lo) and (sd_hi <= delta_top):
-                    print("   *** Attempting to correct upper crossover")
-                    params_pe.add('logstd', value=sd_hi, min=delta_top)
-                    sys_dmg_fit[dx] = lmfit.minimize(
-                        res_lognorm_cdf, params_pe, args=(x_sample, y_sample))
-
-                # Test for bottom crossover: resample if crossover detected
-                # elif (sd_hi >= sd_lo) and sd_hi >= delta_btm:
-                elif sd_hi >= delta_btm:
-                    print("   *** Attempting to correct lower crossover")
-                    params_pe.add('logstd', value=sd_hi, max=delta_btm)
-                    sys_dmg_fit[dx] = lmfit.minimize(
-                        res_lognorm_cdf, params_pe, args=(x_sample, y_sample))
-
-            else:
-                print(Fore.GREEN +
-                      "There is NO overlap for curve pair: " +
-                      SYS_DS[dx - 1] + '-' + SYS_DS[dx] +
-                      Fore.RESET)
-
-        ######################################################################
-
-        sys_dmg_model.loc[SYS_DS[dx]] = \
-            sys_dmg_fit[dx].params['median'].value, \
-            sys_dmg_fit[dx].params['logstd'].value, \
-            sys_dmg_fit[dx].params['loc'].value, \
-            sys_dmg_fit[dx].chisqr
-
-        # sys_dmg_ci[dx] = lmfit.conf_interval(sys_dmg_fit[dx], \
-        #                                 sigmas=[0.674,0.950,0.997])
-
-    # sys_dmg_model['Median'] = sys_dmg_model['Median'].map(lambda x: '{0:.2f}'.format(x))
-    # sys_dmg_model['LogStdDev'] = sys_dmg_model['LogStdDev'].map(lambda x: '{0:.2f}'.format(x))
-    # sys_dmg_model['Location'] = sys_dmg_model['Location'].map('{0:.1f}'.format)
     print("\nFINAL System Fragilities: \n")
     print(sys_dmg_model)
 
-    # for dx in range(1, len(SYS_DS)):
-    #     print("\n\nFragility model statistics for damage state: %s"
-    #           % SYS_DS[dx])
-    #     print("Goodness-of-Fit chi-square test statistic: %f"
-    #           % sys_dmg_fit[dx].chisqr)
-    #     print("Confidence intervals: ")
-    #     lmfit.printfuncs.report_ci(sys_dmg_ci[dx])
-
     # ----- Write fitted model params to file -----
     sys_dmg_model.to_csv(
         os.path.join(out_path, 'system_model_fragility.csv'), sep=',')
@@ -313,6 +216,58 @@ def fit_prob_exceed_model(hazard_input_vals, pb_exceed, SYS_DS, out_path):
     return sys_dmg_model
 
 
+def fragility_mle_model(hazard_input_vals, exceed_counts, SYS_DS):
+    """
+    Maximum likelihood fit of a Lognormal CDF model to the number of
+    samples exceeding each damage state, without writing the fitted model
+
+    :param hazard_input_vals: input values for hazard intensity (numpy array)
+    :param exceed_counts: number of samples exceeding each damage state
+                          (2D numpy array), the first row holds the number
+                          of samples
+    :param SYS_DS: discrete damage states (list)
+    :returns:  fitted exceedance model parameters (PANDAS dataframe)
+    """
+    medians, logstds, median_se, logstd_se = fit_fragility_mle(
+        hazard_input_vals, exceed_counts[1:], exceed_counts[0])
+
+    indx = pd.Index(SYS_DS[1:], name='Damage States')
+    return pd.DataFrame(
+        {'Median': medians, 'Median StdErr': median_se,
+         'LogStdDev': logstds, 'LogStdDev StdErr': logstd_se},
+        index=indx,
+        columns=['Median', 'Median StdErr', 'LogStdDev', 'LogStdDev StdErr'])
+
+
+def fit_prob_exceed_mle(hazard_input_vals, exceed_counts, SYS_DS, out_path):
+    """
+    Maximum likelihood fit of a Lognormal CDF model to the number of
+    samples exceeding each damage state
+
+    :param hazard_input_vals: input values for hazard intensity (numpy array)
+    :param exceed_counts: number of samples exceeding each damage state
+                          (2D numpy array), the first row holds the number
+                          of samples
+    :param SYS_DS: discrete damage states (list)
+    :param out_path: directory path for writing output (string)
+    :returns:  fitted exceedance model parameters (PANDAS dataframe)
+    """
+    sys_dmg_model_mle = fragility_mle_model(hazard_input_vals, exceed_counts,
+                                            SYS_DS)
+
+    print("\n" + "-" * 79)
+    print(Fore.YELLOW +
+          "Fitting system FRAGILITY data: Lognormal CDF, maximum likelihood" +
+          Fore.RESET)
+    print("-" * 79)
+    print(sys_dmg_model_mle)
+
+    sys_dmg_model_mle.to_csv(
+        os.path.join(out_path, 'system_model_fragility_mle.csv'), sep=',')
+
+    return sys_dmg_model_mle
+
+
 # ============================================================================
 #
 # NORMAL CURVE FITTING
@@ -330,19 +285,6 @@ def fit_prob_exceed_model(hazard_input_vals, pb_exceed, SYS_DS, out_path):
 # ----------------------------------------------------------------------------
 
 
-def norm_cdf(x, mu, sd):
-    return stats.norm.cdf(x, loc=mu, scale=sd)
-
-
-def res_norm_cdf(params, x, data, eps=None):
-    mu = params['mean'].value
-    sd = params['stddev'].value
-    model = stats.norm.cdf(x, loc=mu, scale=sd)
-    if eps is None:
-        return (model - data)
-    return (model - data) / eps
-
-
 def bimodal_norm_cdf(x, m1, s1, w1, m2, s2, w2):
     return w1 * norm_cdf(x, m1, s1) + w2 * norm_cdf(x, m2, s2)
 
@@ -362,175 +304,54 @@ def res_bimodal_norm_cdf(params, x, data, eps=None):
 
 # ============================================================================
 
-def fit_restoration_data(RESTORATION_TIME_RANGE, sys_fn, SYS_DS, out_path):
+def restoration_model(RESTORATION_TIME_RANGE, sys_fn, SYS_DS):
     """
     Fits a normal CDF to each of the damage states, i.e. for each column of
-    data in 'sys_fn'
+    data in 'sys_fn', and corrects the crossover of the fitted curves,
+    without writing or plotting the fitted model. The bootstrap of the
+    restoration model refits its replicates with the same estimator,
+    fit_restoration_curves.
 
     :param RESTORATION_TIME_RANGE: restoration time range (numpy array)
     :param sys_fn: system functionality restoration over time (2D numpy array)
     :param SYS_DS: discrete damage states (list)
-    :param out_path: directory path for writing output (string)
     :returns:  fitted restoration model parameters (PANDAS dataframe)
     """
+    means, stddevs, chisqr = fit_restoration_curves(
+        RESTORATION_TIME_RANGE, [sys_fn[ds] for ds in SYS_DS[1:]],
+        verbose=True, ds_names=SYS_DS[1:])
 
-    indx = pd.Index(SYS_DS[1:], name='Damage States')
-    sys_rst_mdl_mode1 = pd.DataFrame(index=indx,
-                                     columns=['Mean',
-                                              'StdDev',
-                                              'Chi-Sqr'])
-
-    # ----- Get the initial fit -----
-    sys_rst_ci = [{} for _ in xrange(len(SYS_DS))]
-    sys_rst_fit = [[] for _ in xrange(len(SYS_DS))]
-    for dx in range(1, len(SYS_DS)):
-        x_sample = RESTORATION_TIME_RANGE
-        y_sample = sys_fn[SYS_DS[dx]]
+    # --------------------------------------------------------------------
+    # * Need to find a solution to reporting confidence interval reliably:
+    #
+    # sys_rst_ci[dx], trace = lmfit.conf_interval(sys_rst_fit[dx], \
+    #                     sigmas=[0.674,0.950,0.997], trace=True)
+    # --------------------------------------------------------------------
 
-        # Fit the dist. Add initial estimate if needed.
-        init_m = np.mean(y_sample)
-        init_s = np.std(y_sample)
-
-        params = lmfit.Parameters()
-        params.add('mean', value=init_m)
-        params.add('stddev', value=init_s)
+    indx = pd.Index(SYS_DS[1:], name='Damage States')
+    return pd.DataFrame({'Mean': means, 'StdDev': stddevs, 'Chi-Sqr': chisqr},
+                        index=indx, columns=['Mean', 'StdDev', 'Chi-Sqr'])
 
-        sys_rst_fit[dx] = lmfit.minimize(res_norm_cdf, params,
-                                         args=(x_sample, y_sample),
-                                         method='leastsq')
 
-        sys_rst_mdl_mode1.loc[SYS_DS[dx]] \
-            = sys_rst_fit[dx].params['mean'].value, \
-              sys_rst_fit[dx].params['stddev'].value, \
-              sys_rst_fit[dx].chisqr
+def fit_restoration_data(RESTORATION_TIME_RANGE, sys_fn, SYS_DS, out_path):
+    """
+    Fits a normal CDF to each of the damage states, i.e. for each column of
+    data in 'sys_fn'
 
+    :param RESTORATION_TIME_RANGE: restoration time range (numpy array)
+    :param sys_fn: system functionality restoration over time (2D numpy array)
+    :param SYS_DS: discrete damage states (list)
+    :param out_path: directory path for writing output (string)
+    :returns:  fitted restoration model parameters (PANDAS dataframe)
+    """
     print("\n\n" + "-" * 79)
     print(Fore.YELLOW +
           "Fitting system RESTORATION data: Unimodal Normal CDF" +
           Fore.RESET)
     print("-" * 79)
 
-    # # Format output to limit displayed decimal precision
-    # sys_rst_mdl_mode1['Mean'] = \
-    #     sys_rst_mdl_mode1['Mean'].map('{:,.3f}'.format)
-    # sys_rst_mdl_mode1['StdDev'] = \
-    #     sys_rst_mdl_mode1['StdDev'].map('{:,.3f}'.format)
-
-    print("INITIAL Restoration Parameters:\n\n", sys_rst_mdl_mode1, '\n')
-
-    # ----- Check for crossover and resample as needed -----
-    for dx in range(1, len(SYS_DS)):
-        x_sample = RESTORATION_TIME_RANGE
-        y_sample = sys_fn[SYS_DS[dx]]
-
-        m1_hi = sys_rst_fit[dx].params['mean'].value
-        s1_hi = sys_rst_fit[dx].params['stddev'].value
-        y_model_hi = norm_cdf(x_sample, m1_hi, s1_hi)
-
-        # --------------------------------------------------------------------
-        # Check for crossover...
-
-        if dx >= 2:
-            m1_lo, s1_lo, r1_chi = sys_rst_mdl_mode1.loc[SYS_DS[dx - 1]].values
-            y_model_lo = norm_cdf(x_sample, m1_lo, s1_lo)
-
-            if sum(y_model_lo - y_model_hi < 0):
-                print(Fore.MAGENTA +
-                      "There is overlap for curve pair   : " +
-                      SYS_DS[dx - 1] + '-' + SYS_DS[dx] +
-                      Fore.RESET)
-
-                k = 0
-                crossover = True
-                mu_err = 0
-                sdtop_err = 0
-                sdbtm_err = 0
-                while k < 50 and crossover:
-                    # Test if higher curve is co-incident with,
-                    #   or precedes lower curve
-                    if (m1_hi <= m1_lo):
-                        if not mu_err > 0:
-                            print("   *** Attempting to correct mean...")
-                        params.add('mean', value=m1_hi, min=m1_lo * 1.01)
-                        sys_rst_fit[dx] = lmfit.minimize(
-                            res_norm_cdf, params, args=(x_sample, y_sample))
-
-                        (m1_hi, s1_hi) = \
-                            (sys_rst_fit[dx].params['mean'].value,
-                             sys_rst_fit[dx].params['stddev'].value)
-                        mu_err += 1
-
-                    # Thresholds for testing top or bottom crossover
-                    delta_top = (1 + k / 100.0) * (
-                    3.0 * s1_lo - (m1_hi - m1_lo)) / 3
-                    delta_btm = (1 - k / 100.0) * (
-                    3.0 * s1_lo + (m1_hi - m1_lo)) / 3
-
-                    # Test for top crossover: resample if x-over detected
-                    if (s1_hi < s1_lo) or (s1_hi <= delta_top):
-                        if not sdtop_err > 0:
-                            print("   *** " +
-                                  "Attempting to correct top crossover...")
-                        params.add('mean', value=m1_hi * 1.01,
-                                   min=m1_lo * 1.01)
-                        params.add('stddev', value=s1_hi, min=delta_top)
-                        sys_rst_fit[dx] = lmfit.minimize(
-                            res_norm_cdf, params, args=(x_sample, y_sample))
-
-                        (m1_hi, s1_hi) = \
-                            (sys_rst_fit[dx].params['mean'].value,
-                             sys_rst_fit[dx].params['stddev'].value)
-                        sdtop_err += 1
-
-                    # Test for bottom crossover: resample if x-over detected
-                    elif (s1_hi >= delta_btm):
-                        if not sdbtm_err > 0:
-                            print("   *** " +
-                                  "Attempting to correct bottom crossover...")
-                        params.add('stddev', value=s1_hi, min=delta_btm)
-                        sys_rst_fit[dx] = lmfit.minimize(
-                            res_norm_cdf, params, args=(x_sample, y_sample))
-
-                        (m1_hi, s1_hi) = \
-                            (sys_rst_fit[dx].params['mean'].value,
-                             sys_rst_fit[dx].params['stddev'].value)
-                        sdbtm_err += 1
-
-                    y_model_hi = norm_cdf(x_sample, m1_hi, s1_hi)
-                    crossover = sum(y_model_lo < y_model_hi)
-                    k += 1
-
-                # Test if crossover correction succeeded
-                if not sum(y_model_lo < y_model_hi):
-                    print(Fore.YELLOW +
-                          "   Crossover corrected!" +
-                          Fore.RESET)
-                else:
-                    print(Fore.RED + Style.BRIGHT +
-                          "   Crossover NOT corrected!" +
-                          Fore.RESET + Style.RESET_ALL)
-
-            else:
-                print(Fore.GREEN + "There is NO overlap for curve pair: " +
-                      SYS_DS[dx - 1] + '-' + SYS_DS[dx] +
-                      Fore.RESET)
-
-        # --------------------------------------------------------------------
-        # * Need to find a solution to reporting confidence interval reliably:
-        #
-        # sys_rst_ci[dx], trace = lmfit.conf_interval(sys_rst_fit[dx], \
-        #                     sigmas=[0.674,0.950,0.997], trace=True)
-        # --------------------------------------------------------------------
-
-        sys_rst_mdl_mode1.loc[SYS_DS[dx]] \
-            = sys_rst_fit[dx].params['mean'].value, \
-              sys_rst_fit[dx].params['stddev'].value, \
-              sys_rst_fit[dx].chisqr
-
-    # sys_rst_mdl_mode1['Mean'] = \
-    #     sys_rst_mdl_mode1['Mean'].map('{:,.3f}'.format)
-    # sys_rst_mdl_mode1['StdDev'] = \
-    #     sys_rst_mdl_mode1['StdDev'].map('{:,.3f}'.format)
+    sys_rst_mdl_mode1 = restoration_model(RESTORATION_TIME_RANGE, sys_fn,
+                                          SYS_DS)
 
     print("\nFINAL Restoration Parameters: \n")
     print(sys_rst_mdl_mode1)
@@ -729,28 +550,236 @@ def fit_restoration_data_multimode(RESTORATION_TIME_RANGE,
     return sys_rst_mdl_mode2
 
 
+# ============================================================================
+# Bootstrap confidence intervals of the fitted models
+# ----------------------------------------------------------------------------
+
+def bootstrap_seed(sc):
+    """
+    Seed of the bootstrap resampling. Like the sampling of the simulation,
+    the resampling is seeded for test runs (RUN_CONTEXT), so that their
+    confidence intervals are reproducible, and is not seeded otherwise.
+
+    :param sc: Scenario object, from sifraclasses
+    :returns: integer seed, or None for an unseeded resampling
+    """
+    if not sc.run_context:
+        return None
+    return int(round(np.sum(sc.hazard_intensity_vals) * 100))
+
+
+def bootstrap_ci(hazard_input_vals, RESTORATION_TIME_RANGE, sys_frag,
+                 output_array_given_recovery, nominal_output, SYS_DS,
+                 num_replicates, percentiles=DEFAULT_PERCENTILES,
+                 processes=None, seed=None, fit_fragility=True):
+    """
+    Bootstrap percentiles of the parameters of the fragility and
+    restoration models, refitted to resampled runs in a process pool,
+    without writing them. The fragility replicates resample the damage
+    states of the samples, from their economic loss.
+
+    :param hazard_input_vals: input values for hazard intensity (numpy array)
+    :param RESTORATION_TIME_RANGE: restoration time range (numpy array)
+    :param sys_frag: damage state index of the samples (2D numpy array)
+    :param output_array_given_recovery: output of the samples during
+        recovery (3D numpy array), or None if it was not calculated
+    :param nominal_output: nominal output of the system
+    :param SYS_DS: discrete damage states (list)
+    :param num_replicates: number of bootstrap replicates
+    :param percentiles: percentiles of the parameters to report
+    :param processes: number of fitting processes, one per CPU if not given
+    :param seed: seed of the resampling, see bootstrap_seed
+    :param fit_fragility: bootstrap the fragility model, which is only
+        valid if it is fitted to the economic loss of the samples
+    :returns: percentiles of the fragility and restoration model
+              parameters (PANDAS dataframes), the fragility percentiles
+              are None if not fit_fragility, the restoration percentiles
+              are None without the output during recovery
+    """
+    indx = pd.Index(SYS_DS[1:], name='Damage States')
+    pct_labels = ['P{:g}'.format(p) for p in percentiles]
+
+    frag_ci = None
+    if fit_fragility:
+        median_pct, logstd_pct = bootstrap_fragility(
+            hazard_input_vals, sys_frag, len(SYS_DS), num_replicates,
+            percentiles, processes, seed)
+        frag_ci = pd.concat(
+            [pd.DataFrame(median_pct.T, index=indx, columns=pct_labels),
+             pd.DataFrame(logstd_pct.T, index=indx, columns=pct_labels)],
+            axis=1, keys=['Median', 'LogStdDev'])
+
+    if not has_recovery_output(output_array_given_recovery):
+        return frag_ci, None
+
+    mean_pct, stddev_pct = bootstrap_restoration(
+        RESTORATION_TIME_RANGE, sys_frag, output_array_given_recovery,
+        nominal_output, len(SYS_DS), num_replicates, percentiles,
+        processes, seed)
+    rst_ci = pd.concat(
+        [pd.DataFrame(mean_pct.T, index=indx, columns=pct_labels),
+         pd.DataFrame(stddev_pct.T, index=indx, columns=pct_labels)],
+        axis=1, keys=['Mean', 'StdDev'])
+
+    return frag_ci, rst_ci
+
+
+def bootstrap_model_ci(sc, fc, sys_frag, output_array_given_recovery,
+                       out_path, percentiles=DEFAULT_PERCENTILES,
+                       processes=None, seed=None):
+    """
+    Write bootstrap percentiles of the parameters of the fragility and
+    restoration models, refitted to resampled runs in a process pool
+
+    :param sc: Scenario object, from sifraclasses
+    :param fc: Facility object, from sifraclasses
+    :param sys_frag: damage state index of the samples (2D numpy array)
+    :param output_array_given_recovery: output of the samples during
+        recovery (3D numpy array), or None if it was not calculated
+    :param out_path: directory path for writing output (string)
+    :param percentiles: percentiles of the parameters to report
+    :param processes: number of fitting processes, one per CPU if not given
+    :param seed: seed of the resampling, see bootstrap_seed
+    :returns: percentiles of the fragility and restoration model
+              parameters (PANDAS dataframes), None for a model that was
+              not bootstrapped, see bootstrap_ci
+    """
+    # The fragility of a substation is fitted to the failure rates of its
+    # component classes, which the resampled damage states do not describe
+    fit_fragility = fc.system_class != 'Substation'
+    frag_ci, rst_ci = bootstrap_ci(
+        sc.hazard_intensity_vals, sc.restoration_time_range, sys_frag,
+        output_array_given_recovery, fc.nominal_production,
+        fc.sys_dmg_states, sc.bootstrap_replicates, percentiles, processes,
+        seed, fit_fragility)
+
+    if frag_ci is not None:
+        frag_ci.to_csv(
+            os.path.join(out_path, 'system_model_fragility_ci.csv'),
+            sep=',')
+    if rst_ci is not None:
+        rst_ci.to_csv(
+            os.path.join(out_path, 'system_model_restoration_ci.csv'),
+            sep=',')
+
+    print("\n" + "-" * 79)
+    print(Fore.YELLOW +
+          "Bootstrap confidence intervals: {} replicates".format(
+              sc.bootstrap_replicates) +
+          Fore.RESET)
+    print("-" * 79)
+    if frag_ci is not None:
+        print("System Fragilities:\n\n", frag_ci, '\n')
+    else:
+        print("System Fragilities: not bootstrapped, the fragility of a "
+              "substation is fitted to the failure rates of its component "
+              "classes\n")
+    if rst_ci is not None:
+        print("Restoration Parameters:\n\n", rst_ci, '\n')
+
+    return frag_ci, rst_ci
+
+
 # ============================================================================
 # Calculate SYSTEM RESTORATION over time, given damage state
 # ----------------------------------------------------------------------------
 
+def has_recovery_output(output_array_given_recovery):
+    """
+    Whether the output of the samples during recovery was calculated. It is
+    not calculated if recovery is not a requested metric, or if the
+    recovery times are calculated directly (RECOVERY_MODE 'direct'), and
+    then it has no time steps.
+
+    :param output_array_given_recovery: output of the samples during
+        recovery, or a chunk of it, or None
+    :returns: True if the restoration models can be fitted
+    """
+    return output_array_given_recovery is not None \
+        and np.shape(output_array_given_recovery)[-1] > 0
+
+
+def mean_restoration_profile(sys_frag, output_array_given_recovery,
+                             nominal_output, num_damage_states):
+    """
+    Mean restoration of the system output over time, for each system
+    damage state, averaged over the hazard levels
+
+    :param sys_frag: damage state index of the samples (2D numpy array)
+    :param output_array_given_recovery: output of the samples during
+        recovery, samples x hazards x times (3D numpy array), or an
+        iterable of the samples x times chunks of the hazard levels, such
+        as the memory mapped chunks of the results store
+    :param nominal_output: nominal output of the system
+    :param num_damage_states: number of damage states, with 'no damage'
+    :returns: array of damage states x times, NaN where no sample of any
+              hazard level is in the damage state
+    """
+    if np.ndim(output_array_given_recovery) == 3:
+        recovery_chunks = (output_array_given_recovery[:, p, :]
+                           for p in range(sys_frag.shape[1]))
+    else:
+        recovery_chunks = output_array_given_recovery
+
+    # mean output of the samples in each damage state, for all damage
+    # states at once: hazards x damage states x times
+    fn_tmp = np.array([damage_state_mean(sys_frag[:, p], chunk,
+                                         num_damage_states)
+                       for p, chunk in enumerate(recovery_chunks)]) \
+        / nominal_output
+    if fn_tmp.shape[-1] == 0:
+        raise ValueError(
+            "The output during recovery has no time steps, it is not "
+            "calculated in the 'direct' RECOVERY_MODE, or without the "
+            "'recovery' metric")
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        return np.nanmean(fn_tmp, axis=0)
+
+
+def restoration_profile_model(RESTORATION_TIME_RANGE, time_unit, sys_frag,
+                              output_array_given_recovery, nominal_output,
+                              SYS_DS):
+    """
+    Mean restoration of the system output over time, for each system
+    damage state, as the data the restoration model is fitted to
+
+    :param RESTORATION_TIME_RANGE: restoration time range (numpy array)
+    :param time_unit: unit of the restoration time (string)
+    :param sys_frag: damage state index of the samples (2D numpy array)
+    :param output_array_given_recovery: output of the samples during
+        recovery, see mean_restoration_profile
+    :param nominal_output: nominal output of the system
+    :param SYS_DS: discrete damage states (list)
+    :returns: restoration profile of each damage state (PANDAS dataframe)
+    """
+    sys_fn_arr = mean_restoration_profile(
+        sys_frag, output_array_given_recovery, nominal_output, len(SYS_DS))
+    return pd.DataFrame(
+        sys_fn_arr.T,
+        index=pd.Index(RESTORATION_TIME_RANGE, name="Time in " + time_unit),
+        columns=SYS_DS)
+
+
 def approximate_generic_sys_restoration(sc, fc, sys_frag,
                                         output_array_given_recovery):
-    SYS_DS = fc.sys_dmg_states
-    sys_fn = pd.DataFrame(index=sc.restoration_time_range,
-                          columns=[fc.sys_dmg_states])
-    sys_fn.fillna(1)
-    sys_fn.index.name = "Time in " + sc.time_unit
-
-    for ds in range(len(SYS_DS)):
-        fn_tmp = np.zeros((sc.num_hazard_pts, sc.num_time_steps))
-        ids = {}  # index of damage states within the samples
-        for p in range(sc.num_hazard_pts):
-            ids[p] = np.where(sys_frag[:, p] == ds)[0]
-            with warnings.catch_warnings():
-                warnings.simplefilter("ignore", category=RuntimeWarning)
-                m = np.mean(output_array_given_recovery[ids[p], p, :], axis=0)
-            fn_tmp[p] = m / fc.nominal_production
-        sys_fn[SYS_DS[ds]] = np.nanmean(fn_tmp, axis=0)
+    """
+    Mean restoration of the system output over time, for each system
+    damage state, averaged over the hazard levels
+
+    :param sc: Scenario object, from sifraclasses
+    :param fc: Facility object, from sifraclasses
+    :param sys_frag: damage state index of the samples (2D numpy array)
+    :param output_array_given_recovery: output of the samples during
+        recovery, samples x hazards x times (3D numpy array), or an
+        iterable of the samples x times chunks of the hazard levels, such
+        as the memory mapped chunks of the results store
+    :returns: restoration profile of each damage state (PANDAS dataframe)
+    """
+    sys_fn = restoration_profile_model(
+        sc.restoration_time_range, sc.time_unit, sys_frag,
+        output_array_given_recovery, fc.nominal_production,
+        fc.sys_dmg_states)
 
     # sys_fn = sys_fn.drop('DS0 None', axis=1)
     sys_fn.to_csv(os.path.join(
@@ -767,6 +796,8 @@ if __name__ == "__main__":
     # READ in SETUP data
     # The first argument is the full path to the config file
     SETUPFILE = sys.argv[1]
+    # The optional second argument is the number of bootstrap processes
+    PROCESSES = int(sys.argv[2]) if len(sys.argv) > 2 else None
     discard = {}
     config = {}
 
@@ -790,53 +821,63 @@ if __name__ == "__main__":
     # ------------------------------------------------------------------------
     # READ in raw output files from prior analysis of system fragility
 
-    economic_loss_array = \
-        np.load(os.path.join(
-            RAW_OUTPUT_DIR, 'economic_loss_array.npy'))
-
-    calculated_output_array = \
-        np.load(os.path.join(
-            RAW_OUTPUT_DIR, 'calculated_output_array.npy'))
-
-    output_array_given_recovery = \
-        np.load(os.path.join(
-            RAW_OUTPUT_DIR, 'output_array_given_recovery.npy'))
-
-    exp_damage_ratio = \
-        np.load(os.path.join(
-            RAW_OUTPUT_DIR, 'exp_damage_ratio.npy'))
+    run_results = RunResults.from_raw_output_dir(RAW_OUTPUT_DIR)
 
-    sys_frag = \
-        np.load(os.path.join(
-            RAW_OUTPUT_DIR, 'sys_frag.npy'))
-
-    required_time = \
-        np.load(os.path.join(RAW_OUTPUT_DIR, 'required_time.npy'))
+    sys_frag = run_results.get('sys_frag')
 
     if fc.system_class in ["PowerStation",
 							"PotableWaterTreatmentPlant", "PWTP",
 							"WasteWaterTreatmentPlant", "WWTP"]:
-        pe_sys = \
-            np.load(os.path.join(RAW_OUTPUT_DIR, 'pe_sys_econloss.npy'))
+        pe_sys = run_results.get('pe_sys_econloss')
     elif fc.system_class == 'Substation':
-        pe_sys = \
-            np.load(os.path.join(RAW_OUTPUT_DIR, 'pe_sys_cpfailrate.npy'))
+        pe_sys = run_results.get('pe_sys_cpfailrate')
+
+    # the output during recovery is not stored without the 'recovery'
+    # metric, and has no time steps in the 'direct' recovery mode
+    FIT_RECOVERY_OUTPUT = \
+        'output_array_given_recovery' in run_results.names() \
+        and has_recovery_output(run_results.get(
+            'output_array_given_recovery', run_results.hazards[0]))
 
     # ------------------------------------------------------------------------
     # Calculate & Plot Fitted Models
 
-    sys_fn = approximate_generic_sys_restoration(sc, fc, sys_frag,
-                                                 output_array_given_recovery)
+    if FIT_RECOVERY_OUTPUT:
+        # the output during recovery is read one hazard level at a time
+        sys_fn = approximate_generic_sys_restoration(
+            sc, fc, sys_frag,
+            (run_results.get('output_array_given_recovery', hazard)
+             for hazard in run_results.hazards))
+    else:
+        print(Fore.MAGENTA +
+              "The output during recovery was not calculated, "
+              "the restoration model is not fitted" +
+              Fore.RESET)
 
     if FIT_PE_DATA:
         sys_dmg_model = fit_prob_exceed_model(
             sc.hazard_intensity_vals, pe_sys, SYS_DS, sc.output_path)
-
-    if FIT_RESTORATION_DATA:
+        # the counts of samples are only available for the fragility
+        # based on economic loss
+        if fc.system_class != 'Substation' \
+                and 'sys_exceedance_counts' in run_results.names():
+            sys_dmg_model_mle = fit_prob_exceed_mle(
+                sc.hazard_intensity_vals,
+                run_results.get('sys_exceedance_counts'),
+                SYS_DS, sc.output_path)
+
+    if FIT_RESTORATION_DATA and FIT_RECOVERY_OUTPUT:
         sys_rst_mdl_mode1 = fit_restoration_data(
             RESTORATION_TIME_RANGE, sys_fn, SYS_DS, sc.output_path)
         # sys_rst_mdl_mode2 = fit_restoration_data_multimode(
         #     RESTORATION_TIME_RANGE, sys_fn, SYS_DS, scn.output_path)
         print("\n" + "-" * 79)
 
+    if sc.bootstrap_replicates > 0:
+        frag_ci, rst_ci = bootstrap_model_ci(
+            sc, fc, sys_frag,
+            run_results.get('output_array_given_recovery')
+            if FIT_RECOVERY_OUTPUT else None,
+            sc.output_path, processes=PROCESSES, seed=bootstrap_seed(sc))
+
 # ============================================================================
@@ -0,0 +1,140 @@
+"""
+Vectorised calculation of the system fragility.
+
+The damage state of every sample at every hazard level is found in a
+single pass over the array of samples, and the probability of exceedance
+of each damage state is derived from the counts of samples in each state.
+"""
+
+import numpy as np
+
+
+def damage_state_index(values, bounds):
+    """
+    Find the damage state of each value, as the number of damage state
+    bounds that the value exceeds.
+    :param values: Array of values, e.g. economic loss of samples x hazards
+    :param bounds: The damage state bounds of the values
+    :return: Integer array of damage state indices with the shape of values
+    """
+    bounds = np.sort(np.asarray(bounds, dtype=np.float64))
+    # the number of bounds strictly less than the value
+    return np.searchsorted(bounds, values, side='left')
+
+
+def exceedance_counts(ds_index, num_damage_states):
+    """
+    Count the samples that reach or exceed each damage state.
+    :param ds_index: Integer array of damage states, samples x hazards
+    :param num_damage_states: The number of damage states, including the
+                              'no damage' state
+    :return: Integer array of counts, damage states x hazards. The row of
+             the 'no damage' state holds the number of samples.
+    """
+    ds_index = np.asarray(ds_index, dtype=int)
+    num_samples, num_hazard_pts = ds_index.shape
+    num_bins = max(num_damage_states, ds_index.max() + 1)
+
+    # counts of samples in each damage state, for each hazard level
+    offsets = np.arange(num_hazard_pts) * num_bins
+    counts = np.bincount((ds_index + offsets).ravel(),
+                         minlength=num_bins * num_hazard_pts)
+    counts = counts.reshape(num_hazard_pts, num_bins).T
+
+    # samples that are at or above each damage state
+    exceedance = np.cumsum(counts[::-1, :], axis=0)[::-1, :]
+    return exceedance[:num_damage_states, :]
+
+
+def prob_exceedance(ds_index, num_damage_states):
+    """
+    Calculate the probability of exceedance of each damage state from
+    the damage states of the samples.
+    :param ds_index: Integer array of damage states, samples x hazards
+    :param num_damage_states: The number of damage states, including the
+                              'no damage' state
+    :return: Array of probabilities, damage states x hazards
+    """
+    num_samples = np.shape(ds_index)[0]
+    return exceedance_counts(ds_index, num_damage_states) \
+        / float(num_samples)
+
+
+def class_membership_matrix(class_members, num_components):
+    """
+    Build the matrix that averages the component columns of each class.
+    :param class_members: List, for each class, of the column indices of
+                          the components in the class
+    :param num_components: Total number of component columns
+    :return: Array of classes x components, the row of each class holds
+             the weight of its components in the class average
+    """
+    membership = np.zeros((len(class_members), num_components))
+    for class_index, columns in enumerate(class_members):
+        membership[class_index, columns] = 1.0 / len(columns)
+    return membership
+
+
+def class_damage_fraction(ds_index, membership):
+    """
+    Average the damage states of the components of each class, for all
+    samples and hazard levels in one product.
+    :param ds_index: Array of component damage states,
+                     samples x components x hazards
+    :param membership: Class membership matrix, classes x components
+    :return: Array of class averages, classes x samples x hazards
+    """
+    return np.tensordot(membership, ds_index, axes=([1], [1]))
+
+
+def pe2pb(pe, axis=-1):
+    """
+    Convert probability of exceedence of damage states, to probability of
+    being in each discrete damage state, for any number of components or
+    hazard levels at once.
+    :param pe: Array of the probabilities of exceedence of the damage
+               states above 'no damage', in any order along the axis
+    :param axis: The damage state axis of the array
+    :return: Array of the probabilities of each damage state, including
+             'no damage', with one more entry along the damage state axis
+    """
+    pe = np.asarray(pe, dtype=np.float64)
+    axis = axis % pe.ndim
+    # sorted along the last axis: from max to min
+    pex = -np.sort(-np.rollaxis(pe, axis, pe.ndim), axis=-1)
+    pb = np.concatenate((1.0 - pex[..., :1],
+                         -1.0 * np.diff(pex, axis=-1),
+                         pex[..., -1:]), axis=-1)
+    return np.rollaxis(pb, pb.ndim - 1, axis)
+
+
+def damage_state_mean(ds_index, values, num_damage_states, weights=None):
+    """
+    Mean of the values of the samples in each damage state, for all
+    damage states in one contraction with the one-hot damage states.
+    :param ds_index: Integer array of the damage states of the samples
+    :param values: Array of the values of the samples, samples x ...,
+                   e.g. the output of the samples at the recovery times
+    :param num_damage_states: The number of damage states, including the
+                              'no damage' state
+    :param weights: Optional sample weights, replicates x samples, such as
+                    the weights of bootstrap replicates
+    :return: Array of means, damage states x ..., or replicates x damage
+             states x ... with weights. NaN for damage states without
+             samples.
+    """
+    ds_index = np.asarray(ds_index, dtype=int)
+    values = np.asarray(values, dtype=np.float64)
+    one_hot = (ds_index[:, np.newaxis] ==
+               np.arange(num_damage_states)[np.newaxis, :]).astype(np.float64)
+    if weights is None:
+        totals = np.tensordot(one_hot, values, axes=([0], [0]))
+        counts = np.sum(one_hot, axis=0)
+    else:
+        weighted = np.asarray(weights, dtype=np.float64)[:, :, np.newaxis] \
+            * one_hot[np.newaxis, :, :]
+        totals = np.tensordot(weighted, values, axes=([1], [0]))
+        counts = np.sum(weighted, axis=1)
+    counts = counts.reshape(counts.shape + (1,) * (values.ndim - 1))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, totals / counts, np.nan)
@@ -0,0 +1,240 @@
+"""
+Fitting of lognormal fragility curves to probabilities of exceedance.
+
+The damage states of a system are fitted jointly, each with its own
+logarithmic standard deviation, and with medians that increase with the
+damage state, so that a higher damage state is not more likely than a
+lower one at the median intensity. The fit is started from closed form
+estimates found by probit regression on the log of the hazard intensity,
+so that it converges in a few iterations.
+
+Parameters of the lognormal CDF, as in scipy.stats.lognorm:
+
+    shape = logstd = standard deviation of log(X)
+    scale = median = exp(mean of log(X))
+"""
+
+import numpy as np
+from scipy import stats
+import lmfit
+
+# exceedance probabilities are clipped to this distance from 0 and 1
+# before they are transformed with the inverse normal CDF
+PROB_CLIP = 1.0e-6
+# starting logstd of damage states without enough data for the regression
+DEFAULT_LOGSTD = 0.5
+MIN_LOGSTD = 1.0e-3
+
+
+def probit_estimates(hazard_vals, pe):
+    """
+    Closed form estimates of the lognormal parameters of each damage state.
+
+    With z = Phi^-1(pe), the lognormal CDF is the line
+    z = (ln(x) - ln(median)) / logstd, which is fitted by least squares to
+    the points with pe away from 0 and 1, for all damage states at once.
+
+    :param hazard_vals: hazard intensity values (1D numpy array)
+    :param pe: probability of exceedance, damage states x hazard values
+               (2D numpy array, without the 'no damage' state)
+    :returns: (medians, logstds) of the damage states (numpy arrays)
+    """
+    x = np.asarray(hazard_vals, dtype=np.float64)
+    pe = np.atleast_2d(np.asarray(pe, dtype=np.float64))
+
+    ln_x = np.log(np.where(x > 0, x, 1.0))
+    # points that are not informative, with pe of 0 or 1, are left out
+    w = ((pe >= PROB_CLIP) & (pe <= 1.0 - PROB_CLIP) & (x > 0))\
+        .astype(np.float64)
+    z = stats.norm.ppf(np.clip(pe, PROB_CLIP, 1.0 - PROB_CLIP))
+
+    # weighted least squares sums for each damage state
+    sw = np.sum(w, axis=1)
+    sx = np.sum(w * ln_x, axis=1)
+    sz = np.sum(w * z, axis=1)
+    sxx = np.sum(w * ln_x ** 2, axis=1)
+    sxz = np.sum(w * ln_x * z, axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = (sw * sxz - sx * sz) / (sw * sxx - sx ** 2)
+        intercept = (sz - slope * sx) / sw
+        logstds = 1.0 / slope
+        medians = np.exp(-intercept / slope)
+
+    # damage states with too few points, or a curve that does not rise,
+    # start from the intensity at which half of the samples exceed them
+    fallback = ~((sw >= 2) & (slope > 0) & np.isfinite(medians))
+    for dx in np.where(fallback)[0]:
+        above_half = np.where(pe[dx] >= 0.5)[0]
+        medians[dx] = x[above_half[0]] if len(above_half) else np.max(x)
+        logstds[dx] = DEFAULT_LOGSTD
+
+    return medians, logstds
+
+
+def _ordered_ln_medians(params, num_ds):
+    steps = [params['ln_median_0'].value] + \
+            [params['ln_step_{}'.format(k)].value for k in range(1, num_ds)]
+    return np.cumsum(steps)
+
+
+def _logstds(params, num_ds):
+    return np.array([params['logstd_{}'.format(k)].value
+                     for k in range(num_ds)])
+
+
+def _joint_residual(params, ln_x, pe):
+    num_ds = pe.shape[0]
+    ln_medians = _ordered_ln_medians(params, num_ds)
+    logstds = _logstds(params, num_ds)
+    model = stats.norm.cdf((ln_x[np.newaxis, :] - ln_medians[:, np.newaxis])
+                           / logstds[:, np.newaxis])
+    return (model - pe).ravel()
+
+
+def fit_fragility_curves(hazard_vals, pe):
+    """
+    Fit lognormal CDFs to the exceedance probabilities of all damage
+    states in one optimisation. Each damage state has its own logstd, and
+    only the medians are constrained, to increase with the damage state.
+
+    :param hazard_vals: hazard intensity values (1D numpy array)
+    :param pe: probability of exceedance, damage states x hazard values
+               (2D numpy array, without the 'no damage' state)
+    :returns: (medians, logstds, chisqr) of the damage states, where
+              chisqr is the sum of the squared residuals of each damage
+              state
+    """
+    x = np.asarray(hazard_vals, dtype=np.float64)
+    pe = np.atleast_2d(np.asarray(pe, dtype=np.float64))
+    num_ds = pe.shape[0]
+    with np.errstate(divide='ignore'):
+        ln_x = np.log(x)
+
+    medians0, logstds0 = probit_estimates(x, pe)
+    ln_medians0 = np.maximum.accumulate(np.log(medians0))
+
+    params = lmfit.Parameters()
+    for k in range(num_ds):
+        params.add('logstd_{}'.format(k), value=max(logstds0[k], MIN_LOGSTD),
+                   min=MIN_LOGSTD)
+    params.add('ln_median_0', value=ln_medians0[0])
+    for k in range(1, num_ds):
+        # a step that starts on its bound may not move away from it
+        params.add('ln_step_{}'.format(k),
+                   value=max(ln_medians0[k] - ln_medians0[k - 1], 1.0e-3),
+                   min=0.0)
+
+    result = lmfit.minimize(_joint_residual, params, args=(ln_x, pe))
+
+    medians = np.exp(_ordered_ln_medians(result.params, num_ds))
+    logstds = _logstds(result.params, num_ds)
+    chisqr = np.sum(_joint_residual(result.params, ln_x, pe)
+                    .reshape(num_ds, -1) ** 2, axis=1)
+    return medians, logstds, chisqr
+
+
+def fit_fragility_portfolio(hazard_vals, pe_list):
+    """
+    Fit the fragility curves of a batch of systems, e.g. the facilities
+    of a portfolio, that were simulated at the same hazard values.
+
+    :param hazard_vals: hazard intensity values (1D numpy array)
+    :param pe_list: probability of exceedance of each system,
+                    damage states x hazard values
+    :returns: list of (medians, logstds, chisqr) of each system
+    """
+    return [fit_fragility_curves(hazard_vals, pe) for pe in pe_list]
+
+
+# ----------------------------------------------------------------------------
+# Maximum likelihood fitting from sample counts
+# ----------------------------------------------------------------------------
+
+def fit_fragility_mle(hazard_vals, num_exceed, num_trials,
+                      max_iter=50, tol=1.0e-10):
+    """
+    Maximum likelihood fit of lognormal fragility curves to the number of
+    samples exceeding each damage state, out of the number of samples, at
+    each hazard value.
+
+    The number of exceedances is binomial with probability
+    Phi(a + b ln(x)), a probit model that is fitted by iteratively
+    reweighted least squares, for all damage states at once. The standard
+    errors of the median and logstd, median = exp(-a / b) and
+    logstd = 1 / b, are found by the delta method from the covariance of
+    (a, b).
+
+    :param hazard_vals: hazard intensity values (1D numpy array)
+    :param num_exceed: number of samples exceeding each damage state,
+                       damage states x hazard values (2D numpy array,
+                       without the 'no damage' state)
+    :param num_trials: number of samples at each hazard value
+    :param max_iter: maximum number of iterations
+    :param tol: convergence tolerance of the change of (a, b)
+    :returns: (medians, logstds, median_se, logstd_se) of the damage
+              states (numpy arrays), NaN for damage states that are
+              exceeded by none or all of the samples
+    """
+    x = np.asarray(hazard_vals, dtype=np.float64)
+    k = np.atleast_2d(np.asarray(num_exceed, dtype=np.float64))
+    n = np.asarray(num_trials, dtype=np.float64) * np.ones_like(x)
+
+    # design matrix of the points with a positive intensity: points x 2
+    usable = (x > 0) & (n > 0)
+    ln_x = np.log(x[usable])
+    design = np.column_stack((np.ones_like(ln_x), ln_x))
+    n = n[usable]
+
+    # the likelihood has no maximum for a damage state that is exceeded
+    # by none, or by all, of the samples
+    fitted = np.full((4, k.shape[0]), np.nan)
+    identifiable = (np.sum(k[:, usable], axis=1) > 0) & \
+                   (np.sum(n - k[:, usable], axis=1) > 0)
+    k = k[identifiable][:, usable]
+    num_ds = k.shape[0]
+    if num_ds == 0:
+        return tuple(fitted)
+
+    # start from the probit estimates of the observed proportions
+    medians0, logstds0 = probit_estimates(x[usable], k / n)
+    coef = np.column_stack((-np.log(medians0) / logstds0, 1.0 / logstds0))
+
+    for _ in range(max_iter):
+        eta = np.dot(coef, design.T)                       # ds x points
+        mu = np.clip(stats.norm.cdf(eta), 1.0e-10, 1.0 - 1.0e-10)
+        dmu = np.maximum(stats.norm.pdf(eta), 1.0e-10)
+        weights = n * dmu ** 2 / (mu * (1.0 - mu))
+        working = eta + (k / n - mu) / dmu
+
+        # weighted normal equations of all damage states: ds x 2 x 2
+        xtwx = np.einsum('dp,pi,pj->dij', weights, design, design)
+        xtwz = np.einsum('dp,pi,dp->di', weights, design, working)
+        new_coef = np.linalg.solve(xtwx, xtwz[..., np.newaxis])[..., 0]
+
+        converged = np.max(np.abs(new_coef - coef)) < tol
+        coef = new_coef
+        if converged:
+            break
+
+    # covariance of (a, b) at the estimates: the inverse information
+    eta = np.dot(coef, design.T)
+    mu = np.clip(stats.norm.cdf(eta), 1.0e-10, 1.0 - 1.0e-10)
+    weights = n * np.maximum(stats.norm.pdf(eta), 1.0e-10) ** 2 \
+        / (mu * (1.0 - mu))
+    cov = np.linalg.inv(np.einsum('dp,pi,pj->dij', weights, design, design))
+
+    a, b = coef[:, 0], coef[:, 1]
+    medians = np.exp(-a / b)
+    logstds = 1.0 / b
+
+    # delta method: gradients of the median and logstd wrt (a, b)
+    grad_median = np.column_stack((-medians / b, medians * a / b ** 2))
+    grad_logstd = np.column_stack((np.zeros(num_ds), -1.0 / b ** 2))
+    median_se = np.sqrt(np.einsum('di,dij,dj->d',
+                                  grad_median, cov, grad_median))
+    logstd_se = np.sqrt(np.einsum('di,dij,dj->d',
+                                  grad_logstd, cov, grad_logstd))
+
+    fitted[:, identifiable] = (medians, logstds, median_se, logstd_se)
+    return tuple(fitted)
@@ -1,35 +1,42 @@
 from __future__ import print_function
 import os
-import sys
 import time
+import argparse
 from datetime import timedelta
-import pickle
-import zipfile
 import logging
+import functools
+from multiprocessing import Pool
 
 import numpy as np
 import pandas as pd
-import parmap
-
-import matplotlib
-matplotlib.use('Agg')
-
 
 from model_ingest import ingest_spreadsheet
 from sifraclasses import Scenario
+from checkpoint import Checkpoint
+from result_cache import ResultCache, run_key, SCENARIO_KEY_ATTRIBUTES
+from results_store import open_results_store
+from box_summary import box_stats, box_stats_array, BOX_STATISTICS
+from fragility import damage_state_index, prob_exceedance, \
+    exceedance_counts, class_membership_matrix, class_damage_fraction, pe2pb
+from event_table import EventTableWriter, EVENT_TABLE_FILE_NAME
+from report import generate_report, write_report_metadata
 from sifra.modelling.hazard_levels import HazardLevels
 
-import matplotlib.pyplot as plt
-
-import seaborn as sns
 from colorama import Fore, Back, Style
 
 
-def run_scenario(config_file):
+def run_scenario(config_file, resume_path=None, use_cache=True,
+                 headless=False):
     """
     Run a scenario by constructing a facility, and executing a scenario, with
     the parameters read from the config file.
     :param config_file: Scenario setting values and the infrastructure configuration file path
+    :param resume_path: Output path of an interrupted run to be resumed,
+                        the completed work of that run is not repeated
+    :param use_cache: Load the results of an identical earlier run from
+                      the result cache instead of simulating
+    :param headless: Skip the report stage, the figures can be rendered
+                     later from the stored results with report.py
     :return: None
     """
     # Construct the scenario object
@@ -37,7 +44,7 @@ def run_scenario(config_file):
           "\nLoading scenario config... " +
           Style.RESET_ALL, end='')
 
-    scenario = Scenario(config_file)
+    scenario = Scenario(config_file, resume_path)
     print(Style.BRIGHT + Fore.GREEN + "Done." +
           "\nInitiating model run...\n" + Style.RESET_ALL)
     code_start_time = time.time()
@@ -45,19 +52,65 @@ def run_scenario(config_file):
     # `IFSystem` object that contains a list of components
     infrastructure = ingest_spreadsheet(config_file)
 
-    post_processing_list = calculate_response(scenario, infrastructure)
+    post_processing_list = simulate_response(scenario, infrastructure,
+                                             use_cache)
+
     # After the response has been calculated the post processing
     # will record the results
     post_processing(infrastructure, scenario, post_processing_list)
 
+    # The figures are rendered from the stored results, after the
+    # simulation, in a pool of processes
+    if 'plots' in scenario.requested_metrics \
+            and not (headless or scenario.headless):
+        generate_report(scenario.raw_output_dir, scenario.output_path,
+                        scenario.report_processes)
+
+
+def simulate_response(scenario, infrastructure, use_cache=True,
+                      write_cache=True):
+    """
+    Calculate the response of the infrastructure, or load the response of
+    an identical earlier run from the result cache.
+    :param scenario: Parameters for the simulation.
+    :param infrastructure: Model of the infrastructure.
+    :param use_cache: Load and save the response with the result cache
+    :param write_cache: Save the calculated response to the result cache,
+                        without it an existing cache is only read
+    :return: List of results for each hazard level.
+    """
+    # Results are only cached for seeded runs, as the results of
+    # unseeded runs are not reproducible
+    post_processing_list = None
+    cache = None
+    if use_cache and scenario.run_context \
+            and (write_cache or os.path.isdir(scenario.cache_dir)):
+        cache = ResultCache(scenario.cache_dir, scenario.cache_max_bytes)
+        cache_key = cache.key(infrastructure, scenario)
+        post_processing_list = cache.load(cache_key)
+        if post_processing_list is not None:
+            logging.info("Results loaded from cache: {}".format(cache_key))
+
+    if post_processing_list is None:
+        post_processing_list = calculate_response(scenario, infrastructure)
+        if cache is not None and write_cache:
+            cache.save(cache_key, post_processing_list)
+    elif scenario.export_event_table:
+        # the event table is written during the simulation, the cached
+        # results are exported in one go
+        export_event_table(post_processing_list, infrastructure, scenario)
+
+    return post_processing_list
+
 
 def calculate_response(scenario, infrastructure):
     """
     The response will be calculated by creating the hazard_levels,
     iterating through the range of hazards and calling the infrastructure systems
     expose_to method. This will return the results of the infrastructure to each hazard level
-    exposure. A parameter in the scenario file determines whether the parmap.map function spawns threads
-    that will perform parallel calculations.
+    exposure. A parameter in the scenario file determines whether the hazard levels are
+    calculated in a pool of processes. If the event table is exported, the samples of
+    each hazard level are written to it as soon as the hazard level is complete.
     :param scenario: Parameters for the simulation.
     :param infrastructure: Model of the infrastructure.
     :return: List of results for each hazard level.
@@ -68,42 +121,70 @@ def calculate_response(scenario, infrastructure):
     code_start_time = time.time() # start of the overall response calculation
     # capture the results from the map call in a list
     hazard_level_response = []
+    # completed blocks of samples are saved to, and restored from,
+    # the raw output directory, for as long as the run is incomplete
+    if scenario.checkpoint:
+        checkpoint = Checkpoint(
+            scenario.raw_output_dir,
+            run_key(infrastructure, scenario,
+                    SCENARIO_KEY_ATTRIBUTES + ['sample_block_size']))
+    else:
+        checkpoint = None
+    if scenario.export_event_table:
+        event_table = open_event_table(infrastructure, scenario)
+    else:
+        event_table = None
     # Use the parallel option in the scenario to determine how to run
-    hazard_level_response.extend(parmap.map(run_para_scen,
-                                            hazard_levels.hazard_range(),
-                                            infrastructure,
-                                            scenario,
-                                            parallel=scenario.run_parallel_proc))
+    try:
+        for hazard_level_values in iter_hazard_responses(hazard_levels,
+                                                         infrastructure,
+                                                         scenario,
+                                                         checkpoint):
+            hazard_level_response.append(hazard_level_values)
+            if event_table is not None:
+                write_event_table_hazard(event_table, hazard_level_values)
+    finally:
+        if event_table is not None:
+            event_table.close()
+    if checkpoint is not None:
+        checkpoint.remove()
     # combine the responses into one list
     post_processing_list = [{},  # hazard level vs component damage state index
                             {},  # hazard level vs infrastructure output
                             {},  # hazard level vs component response
                             [],  # infrastructure output for sample
                             [],  # infrastructure econ loss for sample
-                            []]  # infrastructure output given recovery
+                            [],  # infrastructure output given recovery
+                            [],  # infrastructure recovery time for sample
+                            {}]  # hazard level vs response quantile sketches
     # iterate through the hazard levels
     for hazard_level_values in hazard_level_response:
         # iterate through the hazard level lists
         for key, value_list in hazard_level_values.items():
-            for list_number in range(6):
-                # the first three lists are dicts
-                if list_number <= 2:
+            for list_number in range(8):
+                # the first three lists, and the sketches, are dicts
+                if list_number <= 2 or list_number == 7:
                     post_processing_list[list_number]['%0.3f' % np.float(key)] \
                         = value_list[list_number]
                 else:
-                    # the last three are lists
+                    # the last four are lists
                     post_processing_list[list_number]. \
                         append(value_list[list_number])
 
-    # Convert the last 3 lists into arrays
-    for list_number in range(3, 6):
+    # Convert the last 4 lists into arrays
+    for list_number in range(3, 7):
         post_processing_list[list_number] \
             = np.array(post_processing_list[list_number])
 
+    # output of each output node for sample: samples x hazards x nodes
+    post_processing_list.append(
+        np.transpose(post_processing_list[3], axes=(1, 0, 2)))
+
     # Convert the calculated output array into the correct format
     post_processing_list[3] = np.sum(post_processing_list[3], axis=2).transpose()
     post_processing_list[4] = post_processing_list[4].transpose()
     post_processing_list[5] = np.transpose(post_processing_list[5], axes=(1, 0, 2))
+    post_processing_list[6] = post_processing_list[6].transpose()
 
     elapsed = timedelta(seconds=(time.time() - code_start_time))
     logging.info("[ Run time: %s ]\n" % str(elapsed))
@@ -111,250 +192,214 @@ def calculate_response(scenario, infrastructure):
     return post_processing_list
 
 
-def run_para_scen(hazard_level, infrastructure, scenario):
+def iter_hazard_responses(hazard_levels, infrastructure, scenario,
+                          checkpoint=None):
+    """
+    Calculate the response to each hazard level, in a pool of processes if
+    the scenario is run in parallel. The responses are yielded in the order
+    of the hazard levels, each as soon as it is complete.
+    :param hazard_levels: The hazard levels of the scenario
+    :param infrastructure: The infrastructure model that is being simulated
+    :param scenario: The Parameters for the simulation
+    :param checkpoint: Store of the completed blocks of samples
+    :return: Generator of the response dict of each hazard level
     """
-    The parmap.map function requires a module level function as a parameter.
+    run_hazard_level = functools.partial(run_para_scen,
+                                         infrastructure=infrastructure,
+                                         scenario=scenario,
+                                         checkpoint=checkpoint)
+    if not scenario.run_parallel_proc:
+        for hazard_level in hazard_levels.hazard_range():
+            yield run_hazard_level(hazard_level)
+        return
+
+    pool = Pool()
+    try:
+        for response in pool.imap(run_hazard_level,
+                                  hazard_levels.hazard_range()):
+            yield response
+    finally:
+        pool.close()
+        pool.join()
+
+
+def run_para_scen(hazard_level, infrastructure, scenario, checkpoint=None):
+    """
+    The process pool requires a module level function as a parameter.
     So this function satisfies that requirement by calling the infrastructure's
     exponse_to method within this one.
     :param hazard_level: The hazard level that the infrastructure will be exposed to
     :param infrastructure: The infrastructure model that is being simulated
     :param scenario: The Parameters for the simulation
+    :param checkpoint: Store of the completed blocks of samples
     :return: List of results of the simulation
     """
-    return infrastructure.expose_to(hazard_level, scenario)
+    return infrastructure.expose_to(hazard_level, scenario, checkpoint)
 
 
 # ****************************************************************************
 # BEGIN POST-PROCESSING ...
 # ****************************************************************************
 
-def plot_mean_econ_loss(sc, economic_loss_array):
-    """Draws and saves a boxplot of mean economic loss"""
-
-    hazvals_ext = [[str(i)] * sc.num_samples
-                   for i in list(sc.hazard_intensity_vals)]
-    x1 = np.ndarray.flatten(np.array(hazvals_ext))
-
-    smpl = range(1, sc.num_samples+1, 1)
-    x2 = np.array(smpl * sc.num_hazard_pts)
-
-    arrays = [x1, x2]
-    econ_loss = np.array(economic_loss_array)
-    econ_loss = np.ndarray.flatten(econ_loss.transpose())
-    econ_loss_flat = np.ndarray.flatten(econ_loss)
-
-    econ_loss_df = pd.DataFrame(econ_loss_flat, index=arrays)
-    econ_loss_df.index.names = ['Hazard Intensity', 'Sample Num']
-    econ_loss_df.columns = ['Econ Loss Ratio']
-
-    fig = plt.figure(figsize=(9, 5), facecolor='white')
-    sns.set(style='ticks', palette='Set2')
-    # whitesmoke='#F5F5F5', coral='#FF7F50'
-    ax = sns.boxplot(x=x1, y='Econ Loss Ratio', data=econ_loss_df,
-                     linewidth=0.8, color='whitesmoke',
-                     showmeans=True,
-                     meanprops=dict(marker='o',
-                                    markeredgecolor='coral',
-                                    markerfacecolor='coral')
-                     )
-
-    sns.despine(bottom=False, top=True, left=True, right=True, offset=10)
-    ax.spines['bottom'].set_linewidth(0.8)
-    ax.spines['bottom'].set_color('#555555')
-
-    ax.yaxis.grid(True, which="major", linestyle='-',
-                  linewidth=0.4, color='#B6B6B6')
-
-    ax.tick_params(axis='x', bottom='on', top='off',
-                   width=0.8, labelsize=8, pad=5, color='#555555')
-    ax.tick_params(axis='y', left='off', right='off',
-                   width=0.8, labelsize=8, pad=5, color='#555555')
-
-    ax.set_xticklabels(sc.hazard_intensity_vals)
-    intensity_label \
-        = sc.intensity_measure_param+' ('+sc.intensity_measure_unit+')'
-    ax.set_xlabel(intensity_label, labelpad=9, size=10)
-    ax.set_ylabel('Loss Fraction (%)', labelpad=9, size=10)
-
-    ax.set_title('Loss Ratio', loc='center', y=1.04)
-    ax.title.set_fontsize(12)
-
-    figfile = os.path.join(sc.output_path, 'fig_lossratio_boxplot.png')
-    plt.savefig(figfile, format='png', bbox_inches='tight', dpi=300)
-    plt.close(fig)
-
-
 def post_processing(infrastructure, scenario, response_list):
     """
     Post simulation processing.
 
     After the simulation has run the results are aggregated, saved
-    and the system fragility is calculated.
+    and the system fragility is calculated. The figures are not drawn
+    here, the report stage renders them from the saved results.
     :param infrastructure: The infrastructure being simulated
     :param scenario: Scenario values for the simulation
     :param response_list: Values from the simulation
     :return: None
     """
-    write_system_response(response_list, scenario)
-    loss_by_comp_type(response_list, infrastructure, scenario)
-    economic_loss_array = response_list[4]
-    plot_mean_econ_loss(scenario, economic_loss_array)
+    # only the artifacts of the requested metrics are written
+    metrics = scenario.requested_metrics
+    write_system_response(response_list, infrastructure, scenario)
+    if 'loss' in metrics:
+        loss_by_comp_type(response_list, infrastructure, scenario)
     pe_by_component_class(response_list, infrastructure, scenario)
+    write_response_quantiles(response_list, scenario)
 
-def write_system_response(response_list, scenario):
+def write_system_response(response_list, infrastructure, scenario):
+    results_store = open_results_store(scenario)
+    write_report_metadata(results_store, scenario)
+    comp_ids = sorted(infrastructure.components.keys())
+    results_store.write_metadata(
+        'component_types',
+        {comp_id: infrastructure.components[comp_id].component_type
+         for comp_id in comp_ids})
 
     # ------------------------------------------------------------------------
-    # 'ids_comp_vs_haz' is a dict of numpy arrays
-    # We pickle it for archival. But the file size can get very large.
-    # So we zip it for archival and delete the original
+    # 'ids_comp_vs_haz' is a dict of numpy arrays, stored one chunk per
+    # hazard level: samples x components x hazards
     # ------------------------------------------------------------------------
-    idshaz = os.path.join(scenario.raw_output_dir, 'ids_comp_vs_haz.pickle')
-    id_comp_vs_haz = response_list[0]
-    with open(idshaz, 'w') as handle:
-        for response_key in sorted(id_comp_vs_haz.keys()):
-            pickle.dump({response_key: id_comp_vs_haz[response_key]}, handle)
-    idshaz_zip = os.path.join(scenario.raw_output_dir, 'ids_comp_vs_haz.zip')
-    zipmode = zipfile.ZIP_DEFLATED
-    with zipfile.ZipFile(idshaz_zip, 'w', zipmode) as zip:
-        zip.write(idshaz)
-    os.remove(idshaz)
+    results_store.write_dict_by_hazard('ids_comp_vs_haz', response_list[0], 2,
+                                       axes=('sample', 'component', 'hazard'),
+                                       labels={'component': comp_ids})
 
     # ------------------------------------------------------------------------
     # System output file (for given hazard transfer parameter value)
     # ------------------------------------------------------------------------
-    sys_output_dict = response_list[1]
-    sod_pkl = os.path.join(scenario.raw_output_dir,
-                           'sys_output_dict.pickle')
-    with open(sod_pkl, 'w') as handle:
-        for response_key in sorted(sys_output_dict.keys()):
-            pickle.dump({response_key: sys_output_dict[response_key]},
-                        handle)
-
-    sys_output_df = pd.DataFrame(sys_output_dict)
-    sys_output_df = sys_output_df.transpose()
-    sys_output_df.index.name = 'Hazard Intensity'
-
-    outfile_sysoutput = os.path.join(scenario.output_path,
-                                     'system_output_vs_haz_intensity.csv')
-    sys_output_df.to_csv(outfile_sysoutput,
-                         sep=',',
-                         index_label=[sys_output_df.index.name])
+    if 'output' in scenario.requested_metrics:
+        sys_output_dict = response_list[1]
+        results_store.write_response_dict('sys_output_dict', sys_output_dict,
+                                          axes=('output',))
+
+        sys_output_df = pd.DataFrame(sys_output_dict)
+        sys_output_df = sys_output_df.transpose()
+        sys_output_df.index.name = 'Hazard Intensity'
+
+        outfile_sysoutput = os.path.join(scenario.output_path,
+                                         'system_output_vs_haz_intensity.csv')
+        sys_output_df.to_csv(outfile_sysoutput,
+                             sep=',',
+                             index_label=[sys_output_df.index.name])
 
     # ------------------------------------------------------------------------
     # Hazard response for component instances, i.e. components as-installed
     # ------------------------------------------------------------------------
     component_resp_dict = response_list[2]
-    crd_pkl = os.path.join(scenario.raw_output_dir,
-                           'component_resp_dict.pickle')
-    with open(crd_pkl, 'w') as handle:
-        for response_key in sorted(component_resp_dict.keys()):
-            pickle.dump({response_key: component_resp_dict[response_key]},
-                        handle)
+    results_store.write_response_dict('component_resp_dict',
+                                      component_resp_dict,
+                                      axes=('component', 'response'))
 
 
-def loss_by_comp_type(response_list, infrastructure, scenario):
+def component_response_df(response_list, scenario):
     """
-    Aggregate the economic loss statistics by component type.
+    Response statistics of each component at each hazard level.
+    :param response_list: list of simulation results
+    :param scenario: values used in simulation
+    :return: PANDAS dataframe, (component_id, response) x hazard
+    """
+    component_resp_df = pd.DataFrame(response_list[2])
+    component_resp_df = component_resp_df[scenario.hazard_intensity_str]
+    component_resp_df.index.names = ['component_id', 'response']
+    return component_resp_df
+
+
+def comptype_response_df(response_list, infrastructure, scenario):
+    """
+    Response statistics of each component type at each hazard level,
+    reduced from the statistics of the components of the type.
     :param response_list: list of simulation results
     :param infrastructure: simulated infrastructure
     :param scenario: values used in simulation
-    :return: None
+    :return: PANDAS dataframe, (component_type, response) x hazard
     """
-    # ------------------------------------------------------------------------
-    # Loss calculations by Component Type
-    # ------------------------------------------------------------------------
-    tp_ct = []
-    for comp_type in infrastructure.get_component_types():
-        tp_ct.extend(
-            ((comp_type, 'loss_mean'), (comp_type, 'loss_std'),
-             (comp_type, 'loss_tot'), (comp_type, 'func_mean'),
-             (comp_type, 'func_std'))
-        )
+    # The components are ordered by type, so that the statistics of each
+    # type are reduced from a contiguous group of rows
+    type_index = infrastructure.get_component_type_index()
+    component_types = sorted(type_index.keys())
+    ordered_comp_ids = [comp_id for component_type in component_types
+                        for comp_id in type_index[component_type]]
+    type_counts = np.array([len(type_index[component_type])
+                            for component_type in component_types])
+    type_starts = np.cumsum(type_counts) - type_counts
+
+    # component response statistics: (component, response) x hazard
+    component_resp_df = component_response_df(response_list, scenario)
+
+    # response of the component type: (component response, reduction)
+    comptype_responses = [('loss_mean', 'loss_mean', 'mean'),
+                          ('loss_std', 'loss_std', 'mean'),
+                          ('loss_tot', 'loss_mean', 'sum'),
+                          ('func_mean', 'func_mean', 'mean'),
+                          ('func_std', 'func_std', 'mean'),
+                          ('num_failures', 'num_failures', 'mean')]
+
+    comptype_resp = np.zeros((len(component_types),
+                              len(comptype_responses),
+                              scenario.num_hazard_pts))
+    if component_types:
+        for k, (_, comp_response, reduction) in enumerate(comptype_responses):
+            values = component_resp_df.xs(comp_response, level=1)\
+                .loc[ordered_comp_ids].values.astype(np.float64)
+            type_sums = np.add.reduceat(values, type_starts, axis=0)
+            if reduction == 'mean':
+                type_sums /= type_counts[:, np.newaxis]
+            comptype_resp[:, k, :] = type_sums
 
     mindex = pd.MultiIndex.from_tuples(
-        tp_ct,
+        [(component_type, response)
+         for component_type in component_types
+         for response, _, _ in comptype_responses],
         names=['component_type', 'response'])
-    comptype_resp_df = pd.DataFrame(
+    return pd.DataFrame(
+        comptype_resp.reshape(-1, scenario.num_hazard_pts),
         index=mindex,
-        columns=[scenario.hazard_intensity_str])
-    comptype_resp_dict = comptype_resp_df.to_dict()
-
-    component_resp_dict = response_list[2]
-    for p in scenario.hazard_intensity_str:
-
-        for component_type in infrastructure.get_component_types():
-
-            components_of_type \
-                = list(infrastructure.get_components_for_type(component_type))
+        columns=scenario.hazard_intensity_str)
 
-            ct_loss_mean_list \
-                = [component_resp_dict[p][(comp_id, 'loss_mean')]
-                   for comp_id in components_of_type]
 
-            comptype_resp_dict[p][(component_type, 'loss_mean')] \
-                = np.mean(ct_loss_mean_list)
-
-            ct_loss_mean_list \
-                = [component_resp_dict[p][(comp_id, 'loss_mean')]
-                   for comp_id in components_of_type]
-
-            comptype_resp_dict[p][(component_type, 'loss_tot')] \
-                = np.sum(ct_loss_mean_list)
-
-            ct_loss_std_list \
-                = [component_resp_dict[p][(comp_id, 'loss_std')]
-                   for comp_id in components_of_type]
-
-            comptype_resp_dict[p][(component_type, 'loss_std')] \
-                = np.mean(ct_loss_std_list)
-
-            ct_func_mean_list \
-                = [component_resp_dict[p][(comp_id, 'func_mean')]
-                   for comp_id in components_of_type]
-
-            comptype_resp_dict[p][(component_type, 'func_mean')] \
-                = np.mean(ct_func_mean_list)
-
-            ct_func_std_list \
-                = [component_resp_dict[p][(comp_id, 'func_std')]
-                   for comp_id in components_of_type]
-
-            comptype_resp_dict[p][(component_type, 'func_std')] \
-                = np.mean(ct_func_std_list)
-
-            ct_num_failures_list \
-                = [component_resp_dict[p][(comp_id, 'num_failures')]
-                   for comp_id in components_of_type]
-
-            comptype_resp_dict[p][(component_type, 'num_failures')] \
-                = np.mean(ct_num_failures_list)
+def loss_by_comp_type(response_list, infrastructure, scenario):
+    """
+    Aggregate the economic loss statistics by component type.
+    :param response_list: list of simulation results
+    :param infrastructure: simulated infrastructure
+    :param scenario: values used in simulation
+    :return: None
+    """
+    # ------------------------------------------------------------------------
+    # Loss calculations by Component Type
+    # ------------------------------------------------------------------------
+    comptype_resp_df = comptype_response_df(response_list, infrastructure,
+                                            scenario)
 
     # ------------------------------------------------------------------------
     # Calculating system fragility:
     economic_loss_array = response_list[4]
-    sys_frag = np.zeros_like(economic_loss_array, dtype=int)
     if_system_damage_states = infrastructure.get_dmg_scale_bounds(scenario)
-    for j, hazard_level in enumerate(scenario.hazard_intensity_str):
-        for i in range(scenario.num_samples):
-            # system output and economic loss
-            sys_frag[i, j] = \
-                np.sum(economic_loss_array[i, j] > if_system_damage_states)
-
-    # Calculating Probability of Exceedence:
-    pe_sys_econloss = np.zeros(
-        (len(infrastructure.get_system_damage_states()),
-         scenario.num_hazard_pts)
-    )
-    for j in range(scenario.num_hazard_pts):
-        for i in range(len(infrastructure.get_system_damage_states())):
-            pe_sys_econloss[i, j] = \
-                np.sum(sys_frag[:, j] >= i) / float(scenario.num_samples)
+    sys_frag = damage_state_index(economic_loss_array, if_system_damage_states)
+
+    # Calculating Probability of Exceedence, from the number of samples
+    # that exceed each damage state:
+    sys_exceedance_counts = exceedance_counts(
+        sys_frag, len(infrastructure.get_system_damage_states()))
+    pe_sys_econloss = sys_exceedance_counts / float(sys_frag.shape[0])
 
     # --- Output File --- response of each COMPONENT TYPE to hazard ---
     outfile_comptype_resp = os.path.join(
         scenario.output_path, 'comptype_response.csv')
-    comptype_resp_df = pd.DataFrame(comptype_resp_dict)
-    comptype_resp_df.index.names = ['component_type', 'response']
     comptype_resp_df.to_csv(
         outfile_comptype_resp, sep=',',
         index_label=['component_type', 'response']
@@ -384,15 +429,80 @@ def loss_by_comp_type(response_list, infrastructure, scenario):
         index_label=['component_type']
     )
 
-    np.save(
-        os.path.join(scenario.raw_output_dir, 'sys_frag.npy'),
-        sys_frag
-    )
+    results_store = open_results_store(scenario)
+    results_store.write_by_hazard('sys_frag', sys_frag,
+                                  scenario.hazard_intensity_str, 1,
+                                  axes=('sample', 'hazard'))
+    results_store.write_by_hazard(
+        'pe_sys_econloss', pe_sys_econloss, scenario.hazard_intensity_str, 1,
+        axes=('damage_state', 'hazard'),
+        labels={'damage_state': infrastructure.get_system_damage_states()})
+    # the counts are sufficient for maximum likelihood fitting of the
+    # system fragility, without the samples
+    results_store.write_by_hazard(
+        'sys_exceedance_counts', sys_exceedance_counts,
+        scenario.hazard_intensity_str, 1,
+        axes=('damage_state', 'hazard'),
+        labels={'damage_state': infrastructure.get_system_damage_states()})
+    # box statistics of the sample losses, the loss box plot of the report
+    # is drawn from these instead of the samples
+    results_store.write_by_hazard(
+        'economic_loss_box_stats',
+        box_stats_array(box_stats(economic_loss_array, axis=0)),
+        scenario.hazard_intensity_str, 1,
+        axes=('statistic', 'hazard'),
+        labels={'statistic': BOX_STATISTICS})
+
+
+def component_class_pe(response_list, infrastructure, scenario):
+    """
+    Probability of exceedence of the system damage states, based on the
+    failures of the costed component classes.
 
-    np.save(
-        os.path.join(scenario.raw_output_dir, 'pe_sys_econloss.npy'),
-        pe_sys_econloss
-    )
+    Damage state boundaries for Component Type Failures (Substations) are
+    based on HAZUS MH MR3, p 8-66 to 8-68
+    :param response_list: list of simulation results
+    :param infrastructure: simulated infrastructure
+    :param scenario: values used in simulation
+    :return: array of damage states x hazards
+    """
+    cp_classes_in_system = np.unique(list(infrastructure.get_component_class_list()))
+
+    cp_class_map = {k: [] for k in cp_classes_in_system}
+    for comp_id, component in infrastructure.components.items():
+        cp_class_map[component.component_class].append(component)
+
+    cp_classes_costed = \
+        [x for x in cp_classes_in_system
+         if x not in infrastructure.uncosted_classes]
+
+    # --- System fragility - Based on Failure of Component Classes ---
+    # damage states of samples x components x hazards, the component
+    # columns are in the order of the sorted component ids
+    ids_comp_vs_haz = response_list[0]
+    ids_tensor = np.dstack([ids_comp_vs_haz[hazard_str]
+                            for hazard_str in scenario.hazard_intensity_str])
+    comp_columns = {comp_id: index for index, comp_id in
+                    enumerate(sorted(infrastructure.components.keys()))}
+    class_membership = class_membership_matrix(
+        [[comp_columns[component.component_id]
+          for component in cp_class_map[cc]]
+         for cc in cp_classes_costed],
+        ids_tensor.shape[1])
+    comp_class_failures = class_damage_fraction(ids_tensor,
+                                                class_membership)
+
+    comp_class_frag = \
+        {cc: damage_state_index(comp_class_failures[k],
+                                infrastructure.ds_lims_compclasses[cc])
+         for k, cc in enumerate(cp_classes_costed)}
+
+    # Probability of Exceedence -- Based on Failure of Component Classes
+    return np.median(
+        [prob_exceedance(comp_class_frag[cc],
+                         len(infrastructure.sys_dmg_states))
+         for cc in cp_classes_costed],
+        axis=0)
 
 
 def pe_by_component_class(response_list, infrastructure, scenario):
@@ -403,71 +513,23 @@ def pe_by_component_class(response_list, infrastructure, scenario):
     :param scenario:
     :return:
     """
-    # ------------------------------------------------------------------------
-    # For Probability of Exceedence calculations based on component failures
-    # ------------------------------------------------------------------------
-    #
-    #   Damage state boundaries for Component Type Failures (Substations) are
-    #   based on HAZUS MH MR3, p 8-66 to 8-68
-    #
-    # ------------------------------------------------------------------------
-
-    cp_classes_in_system = np.unique(list(infrastructure.get_component_class_list()))
-
-    cp_class_map = {k: [] for k in cp_classes_in_system}
-    for comp_id, component in infrastructure.components.items():
-        cp_class_map[component.component_class].append(component)
+    metrics = scenario.requested_metrics
 
     # ------------------------------------------------------------------------
     # For Probability of Exceedence calculations based on component failures:
     #   Damage state boundaries for Component Type Failures (Substations) are
     #   based on HAZUS MH MR3, p 8-66 to 8-68
     # ------------------------------------------------------------------------
-    if infrastructure.system_class == 'Substation':
-        cp_classes_costed = \
-            [x for x in cp_classes_in_system
-             if x not in infrastructure.uncosted_classes]
-
-        # --- System fragility - Based on Failure of Component Classes ---
-        comp_class_failures = \
-            {cc: np.zeros((scenario.num_samples, scenario.num_hazard_pts))
-             for cc in cp_classes_costed}
-
-        comp_class_frag = \
-            {cc: np.zeros((scenario.num_samples, scenario.num_hazard_pts))
-             for cc in cp_classes_costed}
-
-        for j, hazard_level in enumerate(HazardLevels(scenario)):
-            for i in range(scenario.num_samples):
-                for compclass in cp_classes_costed:
-                    for c in cp_class_map[compclass]:
-                        comp_class_failures[compclass][i, j] += \
-                            response_list[hazard_level.hazard_intensity]\
-                                         [i, infrastructure.components[c]]
-                    comp_class_failures[compclass][i, j] /= \
-                        len(cp_class_map[compclass])
-
-                    comp_class_frag[compclass][i, j] = \
-                        np.sum(comp_class_failures[compclass][i, j] > \
-                               infrastructure.ds_lims_compclasses[compclass])
-
-        # Probability of Exceedence -- Based on Failure of Component Classes
-        pe_sys_cpfailrate = np.zeros(
-            (len(infrastructure.sys_dmg_states), scenario.num_hazard_pts)
-        )
-        for p in range(scenario.num_hazard_pts):
-            for d in range(len(infrastructure.sys_dmg_states)):
-                ds_ss_ix = []
-                for compclass in cp_classes_costed:
-                    ds_ss_ix.append(
-                        np.sum(comp_class_frag[compclass][:, p] >= d) /
-                        float(scenario.num_samples)
-                    )
-                pe_sys_cpfailrate[d, p] = np.median(ds_ss_ix)
-
-        # --- Save prob exceedance data as npy ---
-        np.save(os.path.join(scenario.raw_output_dir, 'pe_sys_cpfailrate.npy'),
-                pe_sys_cpfailrate)
+    if infrastructure.system_class == 'Substation' and 'loss' in metrics:
+        pe_sys_cpfailrate = component_class_pe(response_list, infrastructure,
+                                               scenario)
+
+        # --- Save prob exceedance data ---
+        open_results_store(scenario).write_by_hazard(
+            'pe_sys_cpfailrate', pe_sys_cpfailrate,
+            scenario.hazard_intensity_str, 1,
+            axes=('damage_state', 'hazard'),
+            labels={'damage_state': infrastructure.sys_dmg_states})
 
     # ------------------------------------------------------------------------
     # Validate damage ratio of the system
@@ -475,31 +537,43 @@ def pe_by_component_class(response_list, infrastructure, scenario):
 
     exp_damage_ratio = np.zeros((len(infrastructure.components),
                                  scenario.num_hazard_pts))
-    for l, hazard_level in enumerate(HazardLevels(scenario).hazard_range()):
-        # compute expected damage ratio
+    if 'loss' in metrics:
+        hazard_range = list(HazardLevels(scenario).hazard_range())
         for j, component in enumerate(infrastructure.components.values()):
-            pb = pe2pb(component.expose_to(hazard_level, scenario)[1:])
+            # damage state probabilities at all hazard levels:
+            # hazard levels x damage states
+            pb = pe2pb([component.expose_to(hazard_level, scenario)[1:]
+                        for hazard_level in hazard_range])
             dr = np.array([component.frag_func.damage_states[ds].damage_ratio
                            for ds in infrastructure.sys_dmg_states])
-            cf = component.cost_fraction
-            loss_list = dr * cf
-            exp_damage_ratio[j, l] = np.sum(pb * loss_list)
+            exp_damage_ratio[j, :] = component.cost_fraction * np.dot(pb, dr)
 
     # ------------------------------------------------------------------------
     # Time to Restoration of Full Capacity
     # ------------------------------------------------------------------------
 
-    threshold = 0.99
+    # The time to full recovery is read off the mean recovery curve: the
+    # first time the mean output of the samples reaches the recovery
+    # threshold, or the end of the restoration period if it never does.
     required_time = []
+    restoration_profile = []
     output_array_given_recovery = response_list[5]
-    for j in range(scenario.num_hazard_pts):
-        cpower = np.mean(output_array_given_recovery[:, j, :], axis=0)\
-                 / infrastructure.get_nominal_output()
-        temp = cpower > threshold
-        if sum(temp) > 0:
-            required_time.append(np.min(scenario.restoration_time_range[temp]))
+    recovery_time_array = response_list[6]
+    if 'recovery' in metrics:
+        if output_array_given_recovery.shape[2] > 0:
+            restoration_profile = \
+                np.mean(output_array_given_recovery, axis=0) \
+                / infrastructure.get_nominal_output()
+            restored = restoration_profile >= scenario.recovery_threshold
+            required_time = \
+                scenario.restoration_time_range[np.argmax(restored, axis=1)]
+            required_time[~np.any(restored, axis=1)] = \
+                scenario.restore_time_max
+            required_time = list(required_time)
         else:
-            required_time.append(scenario.restore_time_max)
+            # the output time series is not available when the recovery
+            # times are calculated directly, use the mean recovery time
+            required_time = list(np.mean(recovery_time_array, axis=0))
 
     # ------------------------------------------------------------------------
     # Write analytical outputs to file
@@ -508,32 +582,39 @@ def pe_by_component_class(response_list, infrastructure, scenario):
     # --- Output File --- summary output ---
     outfile_sys_response = os.path.join(
         scenario.output_path, 'system_response.csv')
-    out_cols = ['PGA',
-                'Economic Loss',
-                'Mean Output',
-                'Days to Full Recovery']
+    out_cols = ['PGA']
 
     # create the arrays
-    comp_response_list = response_list[2]
     economic_loss_array = response_list[4]
     calculated_output_array = response_list[3]
 
-    outdat = {out_cols[0]: scenario.hazard_intensity_vals,
-              out_cols[1]: np.mean(economic_loss_array, axis=0),
-              out_cols[2]: np.mean(calculated_output_array, axis=0),
-              out_cols[3]: required_time}
+    outdat = {'PGA': scenario.hazard_intensity_vals}
+    if 'loss' in metrics:
+        out_cols.append('Economic Loss')
+        outdat['Economic Loss'] = np.mean(economic_loss_array, axis=0)
+    if 'output' in metrics:
+        out_cols.append('Mean Output')
+        outdat['Mean Output'] = np.mean(calculated_output_array, axis=0)
+    if 'recovery' in metrics:
+        out_cols.append('Days to Full Recovery')
+        outdat['Days to Full Recovery'] = required_time
     df = pd.DataFrame(outdat)
     df.to_csv(
         outfile_sys_response, sep=',',
         index=False, columns=out_cols
     )
 
+    # --- Output File --- distribution of sample recovery times ---
+    if 'recovery' in metrics:
+        outfile_recovery_time = os.path.join(
+            scenario.output_path, 'system_recovery_time.csv')
+        recovery_time_df = recovery_time_stats(scenario, recovery_time_array)
+        recovery_time_df.to_csv(outfile_recovery_time, sep=',')
+
     # --- Output File --- response of each COMPONENT to hazard ---
     outfile_comp_resp = os.path.join(scenario.output_path,
                                      'component_response.csv')
-    component_resp_df = pd.DataFrame(comp_response_list)
-    component_resp_df.index.names = ['component_id', 'response']
-    component_resp_df.columns = scenario.hazard_intensity_str
+    component_resp_df = component_response_df(response_list, scenario)
     component_resp_df.to_csv(
         outfile_comp_resp, sep=',',
         index_label=['component_id', 'response']
@@ -561,32 +642,44 @@ def pe_by_component_class(response_list, infrastructure, scenario):
     # *** Saving vars ***
     # ------------------------------------------------------------------------
 
-    if scenario.save_vars_npy:
-        np.save(
-            os.path.join(scenario.raw_output_dir, 'economic_loss_array.npy'),
-            economic_loss_array
-        )
-
-        np.save(
-            os.path.join(scenario.raw_output_dir, 'calculated_output_array.npy'),
-            calculated_output_array
-        )
-
-        np.save(
-            os.path.join(scenario.raw_output_dir,
-                         'output_array_given_recovery.npy'),
-            output_array_given_recovery
-        )
-
-        np.save(
-            os.path.join(scenario.raw_output_dir, 'exp_damage_ratio.npy'),
-            exp_damage_ratio
-        )
-
-        np.save(
-            os.path.join(scenario.raw_output_dir, 'required_time.npy'),
-            required_time
-        )
+    results_store = open_results_store(scenario)
+    hazards = scenario.hazard_intensity_str
+
+    # mean fraction of nominal output during recovery, for the report
+    if len(restoration_profile) > 0:
+        results_store.write_by_hazard(
+            'restoration_profile', restoration_profile, hazards, 0,
+            axes=('hazard', 'time'),
+            labels={'time': scenario.restoration_time_range.tolist()})
+
+    # the expected damage ratios are small, components x hazards,
+    # and are saved with every run
+    if 'loss' in metrics:
+        results_store.write_by_hazard(
+            'exp_damage_ratio', exp_damage_ratio, hazards, 1,
+            axes=('component', 'hazard'),
+            labels={'component': list(infrastructure.components.keys())})
+
+    if scenario.save_vars_npy and 'loss' in metrics:
+        results_store.write_by_hazard('economic_loss_array',
+                                      economic_loss_array, hazards, 1,
+                                      axes=('sample', 'hazard'))
+
+    if scenario.save_vars_npy and 'output' in metrics:
+        results_store.write_by_hazard('calculated_output_array',
+                                      calculated_output_array, hazards, 1,
+                                      axes=('sample', 'hazard'))
+
+    if scenario.save_vars_npy and 'recovery' in metrics:
+        results_store.write_by_hazard(
+            'output_array_given_recovery', output_array_given_recovery,
+            hazards, 1, axes=('sample', 'hazard', 'time'),
+            labels={'time': scenario.restoration_time_range.tolist()})
+        results_store.write_by_hazard('required_time', required_time,
+                                      hazards, 0, axes=('hazard',))
+        results_store.write_by_hazard('recovery_time_array',
+                                      recovery_time_array, hazards, 1,
+                                      axes=('sample', 'hazard'))
 
     # ------------------------------------------------------------------------
     logging.info("\nOutputs saved in: " +
@@ -598,22 +691,139 @@ def pe_by_component_class(response_list, infrastructure, scenario):
     # ... END POST-PROCESSING
     # ****************************************************************************
 
-def pe2pb(pe):
+def recovery_time_stats(scenario, recovery_time_array,
+                        percentiles=(5, 25, 50, 75, 95)):
+    """
+    Summarise the distribution of the sample recovery times.
+    :param scenario: values used in simulation
+    :param recovery_time_array: recovery time of each sample
+        (samples x hazard levels)
+    :param percentiles: the percentiles to report
+    :return: DataFrame of recovery time statistics for each hazard level
+    """
+    recovery_time_df = pd.DataFrame(
+        np.percentile(recovery_time_array, percentiles, axis=0).transpose(),
+        index=scenario.hazard_intensity_vals,
+        columns=['P{}'.format(p) for p in percentiles])
+    recovery_time_df.insert(0, 'Std', np.std(recovery_time_array, axis=0))
+    recovery_time_df.insert(0, 'Mean', np.mean(recovery_time_array, axis=0))
+    recovery_time_df.index.name = scenario.intensity_measure_param
+
+    return recovery_time_df
+
+
+def write_response_quantiles(response_list, scenario,
+                             percentiles=(5, 50, 95)):
+    """
+    Write the percentiles of the responses of each hazard level, estimated
+    from the quantile sketches of the simulation.
+    :param response_list: list of simulation results
+    :param scenario: values used in simulation
+    :param percentiles: the percentiles to report
+    :return: None
+    """
+    response_sketches = response_list[7]
+    hazards = scenario.hazard_intensity_str
+    sketch_names = sorted(set(name for sketches in response_sketches.values()
+                              for name in sketches.keys()))
+    if not sketch_names:
+        return
+
+    # response x percentile x hazard
+    response_quantiles = np.array(
+        [[response_sketches[hazard][name].percentiles(percentiles)
+          for hazard in hazards]
+         for name in sketch_names]).transpose((0, 2, 1))
+
+    open_results_store(scenario).write_by_hazard(
+        'response_quantiles', response_quantiles, hazards, 2,
+        axes=('response', 'percentile', 'hazard'),
+        labels={'response': sketch_names, 'percentile': list(percentiles)})
+
+    mindex = pd.MultiIndex.from_tuples(
+        [(name, 'P{}'.format(p)) for name in sketch_names for p in percentiles],
+        names=['response', 'percentile'])
+    response_quantiles_df = pd.DataFrame(
+        response_quantiles.reshape(-1, len(hazards)),
+        index=mindex, columns=hazards)
+    response_quantiles_df.to_csv(
+        os.path.join(scenario.output_path, 'response_quantiles.csv'),
+        sep=',', index_label=['response', 'percentile'])
+
+
+def open_event_table(infrastructure, scenario):
+    """
+    Open the Parquet event table of the run, with the columns of the
+    requested metrics.
+    :param infrastructure: simulated infrastructure
+    :param scenario: values used in simulation
+    :return: EventTableWriter
+    """
+    metrics = scenario.requested_metrics
+    if 'output' in metrics:
+        output_node_ids = list(infrastructure.output_nodes.keys())
+    else:
+        output_node_ids = []
+
+    outfile_event_table = os.path.join(scenario.output_path,
+                                       EVENT_TABLE_FILE_NAME)
+    return EventTableWriter(outfile_event_table, output_node_ids,
+                            include_loss='loss' in metrics,
+                            include_recovery='recovery' in metrics)
+
+
+def write_event_table_hazard(event_table, hazard_level_values):
     """
-    Convert probability of excedence of damage states, to
-    probability of being in each discrete damage state
+    Write the samples of a completed hazard level to the event table, as
+    one row group.
+    :param event_table: EventTableWriter of the run
+    :param hazard_level_values: The response dict of the hazard level, as
+                                returned by the infrastructure's expose_to
+    :return: None
     """
-    # sorted array: from max to min
-    pex = np.sort(pe)[::-1]
-    tmp = -1.0 * np.diff(pex)
-    pb = np.append(tmp, pex[-1])
-    pb = np.insert(pb, 0, 1 - pex[0])
-    return pb
+    for hazard_intensity, value_list in hazard_level_values.items():
+        event_table.write_hazard(hazard_intensity,
+                                 value_list[4],
+                                 value_list[3],
+                                 value_list[6])
+
+
+def export_event_table(response_list, infrastructure, scenario):
+    """
+    Export the responses of the samples of all the hazard levels as a
+    Parquet event table, one row group per hazard level.
+    :param response_list: list of simulation results
+    :param infrastructure: simulated infrastructure
+    :param scenario: values used in simulation
+    :return: None
+    """
+    economic_loss_array = response_list[4]
+    recovery_time_array = response_list[6]
+    node_output_array = response_list[8]
+
+    with open_event_table(infrastructure, scenario) as writer:
+        for j, hazard_intensity in enumerate(scenario.hazard_intensity_vals):
+            writer.write_hazard(hazard_intensity,
+                                economic_loss_array[:, j],
+                                node_output_array[:, j, :],
+                                recovery_time_array[:, j])
 
 
 def main():
-    SETUPFILE = sys.argv[1]
-    run_scenario(SETUPFILE)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("setup_file",
+                        help="scenario configuration file")
+    parser.add_argument("--resume", metavar="OUTPUT_PATH", default=None,
+                        help="output path of an interrupted run to resume")
+    parser.add_argument("--no-cache", dest="use_cache", action="store_false",
+                        help="simulate even if the results are cached")
+    parser.add_argument("--headless", action="store_true",
+                        help="skip the report, it can be generated later "
+                             "with report.py")
+    args = parser.parse_args()
+
+    code_start_time = time.time()
+    run_scenario(args.setup_file, args.resume, args.use_cache, args.headless)
 
     print(Style.BRIGHT + Fore.YELLOW +
           "[ Run time: %s ]\n" %
@@ -1,4 +1,5 @@
 import numpy as np
+import scipy.stats as stats
 import time
 from datetime import timedelta
 import logging
@@ -14,6 +15,7 @@ from sifra.modelling.structural import (
 from sifra.modelling.component import Component
 from sifra.modelling.elements import Model
 from sifra.modelling.iodict import IODict
+from sifra.modelling.sketches import HistogramSketch, merge_sketches
 
 
 class IFSystem(Model):
@@ -90,12 +92,14 @@ class IFSystem(Model):
         """Add a component to the component dict"""
         self.components[name] = component
 
-    def expose_to(self, hazard_level, scenario):
+    def expose_to(self, hazard_level, scenario, checkpoint=None):
         """
         Exposes the components of the infrastructure to a hazard level
         within a scenario.
         :param hazard_level: The hazard level that the infrastructure is to be exposed to.
         :param scenario: The parameters for the scenario being simulated.
+        :param checkpoint: Optional store of the completed blocks of samples,
+                           blocks found in the store are not recalculated.
         :return: The state of the infrastructure after the exposure.
         """
 
@@ -105,12 +109,40 @@ class IFSystem(Model):
         component_damage_state_ind = self.probable_ds_hazard_level(hazard_level, scenario)
 
         # calculate the component loss, functionality, output,
-        #  economic loss and recovery output over time
+        #  economic loss and recovery output over time, one block of
+        #  samples at a time
+        block_size = scenario.sample_block_size or scenario.num_samples
+        block_results = []
+        for block_index, block_start in \
+                enumerate(range(0, scenario.num_samples, block_size)):
+            results = None
+            if checkpoint is not None:
+                results = checkpoint.load(hazard_level.hazard_intensity,
+                                          block_index)
+            if results is None:
+                block_ds_ind = component_damage_state_ind[
+                    block_start:block_start + block_size, :]
+                results = (block_ds_ind,) + \
+                    self.calc_output_loss(scenario, block_ds_ind)
+                if checkpoint is not None:
+                    checkpoint.save(hazard_level.hazard_intensity,
+                                    block_index, results)
+            block_results.append(results)
+
+        # the distributions of the responses are summarised block by block
+        response_sketches = merge_sketches(
+            self.sample_sketches(scenario, results) for results in block_results)
+
+        # the damage states are taken from the blocks, as the blocks
+        # restored from a checkpoint were sampled in an earlier run
+        component_damage_state_ind, \
         component_sample_loss, \
         comp_sample_func, \
         if_sample_output, \
         if_sample_economic_loss, \
-        if_output_given_recovery = self.calc_output_loss(scenario, component_damage_state_ind)
+        if_output_given_recovery, \
+        if_sample_recovery_time = [np.concatenate(block_arrays)
+                                   for block_arrays in zip(*block_results)]
 
         # Construct the dictionary containing the statisitics of the response
         component_response = self.calc_response(component_sample_loss,
@@ -119,8 +151,9 @@ class IFSystem(Model):
 
         # determine average output for the output components
         if_output = {}
-        for output_index, (output_comp_id, output_comp) in enumerate(self.output_nodes.iteritems()):
-            if_output[output_comp_id] = np.mean(if_sample_output[:, output_index])
+        if 'output' in scenario.requested_metrics:
+            for output_index, (output_comp_id, output_comp) in enumerate(self.output_nodes.iteritems()):
+                if_output[output_comp_id] = np.mean(if_sample_output[:, output_index])
 
         # log the elapsed time for this hazard level
         elapsed = timedelta(seconds=(time.time() - code_start_time))
@@ -133,10 +166,38 @@ class IFSystem(Model):
                                                          component_response,
                                                          if_sample_output,
                                                          if_sample_economic_loss,
-                                                         if_output_given_recovery]}
+                                                         if_output_given_recovery,
+                                                         if_sample_recovery_time,
+                                                         response_sketches]}
 
         return response_dict
 
+    def sample_sketches(self, scenario, results):
+        """
+        Summarise the responses of a block of samples in quantile sketches.
+        :param scenario: Parameters for the scenario
+        :param results: The results of the block, as calculated in expose_to
+        :return: Dict of metric name vs HistogramSketch, for the requested
+                 metrics of 'economic_loss', 'output' and 'recovery_time'
+        """
+        metrics = scenario.requested_metrics
+        if_sample_output, if_sample_economic_loss = results[3], results[4]
+        if_sample_recovery_time = results[6]
+
+        sketches = {}
+        if 'loss' in metrics:
+            sketches['economic_loss'] = \
+                HistogramSketch(0.0, 1.0).add(if_sample_economic_loss)
+        if 'output' in metrics:
+            sketches['output'] = \
+                HistogramSketch(0.0, self.get_nominal_output()).add(
+                    np.sum(if_sample_output, axis=1))
+        if 'recovery' in metrics:
+            sketches['recovery_time'] = \
+                HistogramSketch(0.0, scenario.restore_time_max).add(
+                    if_sample_recovery_time)
+        return sketches
+
     def probable_ds_hazard_level(self, hazard_level, scenario):
         """
         Calculate the probability that being exposed to a hazard level
@@ -199,25 +260,41 @@ class IFSystem(Model):
         parameter
         :param scenario: Details of the scenario being run
         :param component_damage_state_ind: The array of the component's damage state samples
-        :return: 5 lists of calculations
+        :return: 6 lists of calculations
         """
+        num_samples = component_damage_state_ind.shape[0]
         # Component loss caused by the damage
-        if_level_loss = np.zeros((scenario.num_samples, len(self.components)),
+        if_level_loss = np.zeros((num_samples, len(self.components)),
                                  dtype=np.float64)
         # Infrastructure loss: sum of component loss
-        if_level_economic_loss = np.zeros(scenario.num_samples,
+        if_level_economic_loss = np.zeros(num_samples,
                                           dtype=np.float64)
         # Component functionality
-        if_level_functionality = np.zeros((scenario.num_samples, len(self.components)),
+        if_level_functionality = np.zeros((num_samples, len(self.components)),
                                           dtype=np.float64)
+        # only the requested metrics are evaluated, the arrays of the
+        # skipped stages are left empty
+        calc_output = 'output' in scenario.requested_metrics
+        calc_recovery = 'recovery' in scenario.requested_metrics
         # output for the level of damage
-        if_level_output = np.zeros((scenario.num_samples, len(self.output_nodes)),
+        num_output_nodes = len(self.output_nodes) if calc_output else 0
+        if_level_output = np.zeros((num_samples, num_output_nodes),
                                    dtype=np.float64)
-        # output available as recovery progresses
-        if_output_given_recovery = np.zeros((scenario.num_samples, scenario.num_time_steps), dtype=np.float64)
+        # output available as recovery progresses, the dense time series
+        # is not required when recovery times are calculated directly
+        if not calc_recovery or scenario.recovery_mode == 'direct':
+            num_time_steps = 0
+        else:
+            num_time_steps = scenario.num_time_steps
+        if_output_given_recovery = np.zeros((num_samples, num_time_steps), dtype=np.float64)
+        # time for each sample to restore full output
+        if_sample_recovery_time = np.zeros(num_samples, dtype=np.float64)
+        # outputs already evaluated for quantised functionality levels,
+        # shared between the samples of this hazard level
+        recovery_output_cache = {}
 
         # iterate through the samples
-        for sample_index in range(scenario.num_samples):
+        for sample_index in range(num_samples):
             # initialise the function and loss arrays for the sample
             component_function_at_time = []
             comp_sample_loss = np.zeros(len(self.components))
@@ -234,9 +311,10 @@ class IFSystem(Model):
                 comp_sample_loss[component_index] = loss
                 comp_sample_func[component_index] = damage_state.functionality
                 # calculate the recovery time
-                component_function_at_time.append(self.calc_recov_time_given_comp_ds(component,
-                                                                                     component_ds[component_index],
-                                                                                     scenario))
+                if num_time_steps > 0:
+                    component_function_at_time.append(self.calc_recov_time_given_comp_ds(component,
+                                                                                         component_ds[component_index],
+                                                                                         scenario))
             # save this sample's component loss and functionality
             if_level_loss[sample_index, :] = comp_sample_loss
             if_level_functionality[sample_index, :] = comp_sample_func
@@ -244,19 +322,166 @@ class IFSystem(Model):
             # component losses
             if_level_economic_loss[sample_index] = np.sum(comp_sample_loss)
             # estimate the output for this sample's component functionality
-            if_level_output[sample_index, :] = self.compute_output_given_ds(comp_sample_func)
+            if calc_output:
+                if_level_output[sample_index, :] = self.compute_output_given_ds(comp_sample_func)
 
             # calculate the restoration output
-            component_function_at_time = np.array(component_function_at_time)
-            for time_step in range(scenario.num_time_steps):
-                if_output_given_recovery[sample_index, time_step] = \
-                    sum(self.compute_output_given_ds(component_function_at_time[:, time_step]))
+            if not calc_recovery:
+                continue
+            elif scenario.recovery_mode == 'direct':
+                if_sample_recovery_time[sample_index] = \
+                    self.calc_recovery_time(component_ds, scenario)
+            else:
+                component_function_at_time = np.array(component_function_at_time)
+                if_output_given_recovery[sample_index, :] = \
+                    self.calc_output_given_recovery(component_function_at_time,
+                                                    scenario,
+                                                    recovery_output_cache)
+
+        if num_time_steps > 0:
+            if_sample_recovery_time = \
+                self.recovery_time_given_output(if_output_given_recovery,
+                                                scenario)
 
         return if_level_loss, \
                if_level_functionality, \
                if_level_output, \
                if_level_economic_loss, \
-               if_output_given_recovery
+               if_output_given_recovery, \
+               if_sample_recovery_time
+
+    def calc_output_given_recovery(self, component_function_at_time,
+                                   scenario, output_cache=None):
+        """
+        Calculate the infrastructure output at each restoration time step
+        for a single sample.
+
+        With the default 'time_grid' recovery mode the output is calculated
+        for every time step. In the 'event' recovery mode the output is only
+        calculated at the breakpoints where the functionality of a component
+        changes by more than the scenario's functionality quantum (or at the
+        configured recovery checkpoints), and the output is held constant
+        between breakpoints.
+        :param component_function_at_time: Array of component functionality,
+            (num components x num time steps)
+        :param scenario: Details of the scenario being run
+        :param output_cache: Optional dict of outputs that have already been
+            calculated for a set of quantised functionality levels
+        :return: Array of the total output at each time step
+        """
+        num_time_steps = component_function_at_time.shape[1]
+
+        if scenario.recovery_mode == 'time_grid':
+            output_given_recovery = np.zeros(num_time_steps)
+            for time_step in range(num_time_steps):
+                output_given_recovery[time_step] = \
+                    sum(self.compute_output_given_ds(component_function_at_time[:, time_step]))
+            return output_given_recovery
+
+        if scenario.recovery_mode != 'event':
+            raise ValueError("Unknown recovery mode "
+                             "{}".format(scenario.recovery_mode))
+
+        if output_cache is None:
+            output_cache = {}
+
+        if scenario.recovery_checkpoints:
+            # evaluate the output at the time steps closest to the checkpoints
+            function_levels = component_function_at_time
+            breakpoints = np.unique(np.concatenate((
+                [0],
+                np.searchsorted(scenario.restoration_time_range,
+                                scenario.recovery_checkpoints).clip(
+                    0, num_time_steps - 1))))
+        else:
+            # quantise the functionality and only evaluate the output where
+            # the functionality of one or more components changes level
+            quantum = scenario.recovery_func_quantum
+            function_levels = \
+                np.round(component_function_at_time / quantum) * quantum
+            level_changed = np.any(np.diff(function_levels, axis=1) != 0,
+                                   axis=0)
+            breakpoints = np.concatenate(([0],
+                                          np.nonzero(level_changed)[0] + 1))
+
+        breakpoint_output = np.zeros(len(breakpoints))
+        for bp_index, time_step in enumerate(breakpoints):
+            comp_func = np.array(function_levels[:, time_step])
+            cache_key = comp_func.tostring()
+            if cache_key not in output_cache:
+                output_cache[cache_key] = \
+                    sum(self.compute_output_given_ds(comp_func))
+            breakpoint_output[bp_index] = output_cache[cache_key]
+
+        # reconstruct the piecewise constant output curve
+        breakpoint_index = np.searchsorted(breakpoints,
+                                           np.arange(num_time_steps),
+                                           side='right') - 1
+        return breakpoint_output[breakpoint_index]
+
+    def calc_recovery_time(self, component_ds, scenario):
+        """
+        Calculate the time for a sample to restore the infrastructure
+        output to the scenario's recovery threshold.
+
+        The output is a monotone function of the restoration time, so
+        the time is found by bisection, to within the scenario's
+        recovery time tolerance, without evaluating the full time series.
+        :param component_ds: The damage state index of each component
+        :param scenario: Details of the scenario being run
+        :return: The restoration time, or the maximum restoration time if
+            the output is not restored within the restoration period.
+        """
+        num_components = len(component_ds)
+        recovery_mean = np.zeros(num_components)
+        recovery_std = np.zeros(num_components)
+        functionality = np.zeros(num_components)
+        for component_index, comp_key in enumerate(sorted(self.components.keys())):
+            component = self.components[comp_key]
+            recovery_parameters = component.get_recovery(component_ds[component_index])
+            recovery_mean[component_index] = recovery_parameters.recovery_mean
+            recovery_std[component_index] = recovery_parameters.recovery_std
+            functionality[component_index] = \
+                component.get_damage_state(component_ds[component_index]).functionality
+
+        def is_restored(restoration_time):
+            cdf = stats.norm.cdf(restoration_time, loc=recovery_mean,
+                                 scale=recovery_std)
+            output = sum(self.compute_output_given_ds(cdf + (1.0 - cdf) * functionality))
+            return output / self.get_nominal_output() >= scenario.recovery_threshold
+
+        lower = 0.0
+        upper = float(scenario.restore_time_max)
+        if is_restored(lower):
+            return lower
+        if not is_restored(upper):
+            return upper
+
+        while upper - lower > scenario.recovery_time_tol:
+            middle = 0.5 * (lower + upper)
+            if is_restored(middle):
+                upper = middle
+            else:
+                lower = middle
+
+        return upper
+
+    def recovery_time_given_output(self, output_given_recovery, scenario):
+        """
+        Calculate the time for each sample to restore the infrastructure
+        output to the scenario's recovery threshold, from the output
+        calculated at each restoration time step.
+        :param output_given_recovery: Array of output (samples x time steps)
+        :param scenario: Details of the scenario being run
+        :return: Array of the restoration time for each sample
+        """
+        restored = output_given_recovery / self.get_nominal_output() \
+            >= scenario.recovery_threshold
+        recovery_time = \
+            scenario.restoration_time_range[np.argmax(restored, axis=1)]
+        recovery_time[~np.any(restored, axis=1)] = scenario.restore_time_max
+
+        return recovery_time
 
     def get_nominal_output(self):
         """
@@ -368,6 +593,20 @@ class IFSystem(Model):
 
         return list(component_types)
 
+    def get_component_type_index(self):
+        """
+        Index the costed components by their component type.
+        :return: Dict of the sorted component ids of each costed component type
+        """
+        component_types = set(self.get_component_types())
+        type_index = {component_type: [] for component_type in component_types}
+        for comp_id in sorted(self.components.keys()):
+            component_type = self.components[comp_id].component_type
+            if component_type in component_types:
+                type_index[component_type].append(comp_id)
+
+        return type_index
+
     def get_components_for_type(self, component_type):
         """
         Return a list of components for the passed component type.
@@ -0,0 +1,119 @@
+"""
+Mergeable quantile sketches of the response distributions.
+
+A sketch summarises a stream of samples in fixed size, so the percentiles
+of the loss, output or recovery time of a hazard level can be reported
+without keeping every sample. Sketches of blocks of samples, or of the
+samples of different workers, are combined with merge.
+"""
+
+import numpy as np
+
+DEFAULT_NUM_BINS = 1000
+
+
+class HistogramSketch(object):
+    """
+    Fixed bin histogram of the samples in a range of values.
+
+    Quantiles are interpolated linearly within the bins, so their error is
+    at most the width of a bin. Samples outside the range are counted in
+    the end bins, and the exact minimum and maximum are kept so that the
+    extreme quantiles do not fall outside the samples.
+    """
+
+    def __init__(self, lower, upper, num_bins=DEFAULT_NUM_BINS):
+        """
+        :param lower: Lower bound of the range of the binned values
+        :param upper: Upper bound of the range of the binned values
+        :param num_bins: Number of bins of equal width in the range
+        """
+        self.lower = float(lower)
+        self.upper = float(upper)
+        if self.upper <= self.lower:
+            self.upper = self.lower + 1.0
+        self.num_bins = int(num_bins)
+        self.bin_width = (self.upper - self.lower) / self.num_bins
+        self.counts = np.zeros(self.num_bins, dtype=np.int64)
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def add(self, values):
+        """
+        Add samples to the sketch.
+        :param values: Array of samples, NaN values are ignored
+        :return: The sketch
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return self
+
+        bins = np.floor((values - self.lower) / self.bin_width).astype(int)
+        bins = np.clip(bins, 0, self.num_bins - 1)
+        self.counts += np.bincount(bins, minlength=self.num_bins)
+        self.count += values.size
+        self.min = min(self.min, np.min(values))
+        self.max = max(self.max, np.max(values))
+        return self
+
+    def merge(self, other):
+        """
+        Add the samples of another sketch of the same range and bins.
+        :param other: HistogramSketch
+        :return: The sketch
+        """
+        if (self.lower, self.upper, self.num_bins) != \
+                (other.lower, other.upper, other.num_bins):
+            raise ValueError("Sketches with different bins cannot be merged")
+        self.counts += other.counts
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q):
+        """
+        Estimate quantiles of the samples.
+        :param q: A quantile, or an array of quantiles, in [0, 1]
+        :return: The estimated quantiles, NaN if the sketch is empty
+        """
+        q = np.asarray(q, dtype=np.float64)
+        if self.count == 0:
+            return np.full(q.shape, np.nan)
+
+        cumulative = np.cumsum(self.counts)
+        target = q * self.count
+        # the bin in which the cumulative count reaches the target
+        index = np.clip(np.searchsorted(cumulative, target, side='left'),
+                        0, self.num_bins - 1)
+        below = cumulative[index] - self.counts[index]
+        in_bin = np.maximum(self.counts[index], 1)
+        fraction = np.clip((target - below) / in_bin, 0.0, 1.0)
+        values = self.lower + (index + fraction) * self.bin_width
+        return np.clip(values, self.min, self.max)
+
+    def percentiles(self, percentiles):
+        """
+        :param percentiles: Array of percentiles in [0, 100]
+        :return: The estimated percentiles
+        """
+        return self.quantile(np.asarray(percentiles, dtype=np.float64) / 100.0)
+
+
+def merge_sketches(sketch_dicts):
+    """
+    Merge dicts of sketches, such as those of the blocks of a hazard level.
+    :param sketch_dicts: Iterable of dicts of metric name vs sketch
+    :return: Dict of metric name vs the merged sketch
+    """
+    merged = {}
+    for sketches in sketch_dicts:
+        for name, sketch in sketches.items():
+            if name in merged:
+                merged[name].merge(sketch)
+            else:
+                merged[name] = HistogramSketch(sketch.lower, sketch.upper,
+                                               sketch.num_bins).merge(sketch)
+    return merged
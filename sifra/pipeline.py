@@ -0,0 +1,298 @@
+"""
+In-process pipeline of a scenario: simulation, fitting of the system
+fragility and restoration models and their bootstrap confidence
+intervals, and the loss and restoration analysis of the scenario hazard
+values.
+
+The stages are chained in memory: the response arrays of the simulation
+are passed directly to the fitting stage and to the loss analysis,
+instead of being written to the output directory and read back by
+fit_model.py and scenario_loss_analysis.py, whose fitting and analysis
+functions are reused here. Writing the results, the fitted models and
+the restoration prognosis to disk is optional, so that small runs, and
+runs repeated within a study, are not dominated by the I/O.
+"""
+
+from __future__ import print_function
+import os
+import time
+import argparse
+import logging
+from datetime import timedelta
+
+from model_ingest import ingest_spreadsheet
+from sifraclasses import Scenario
+from infrastructure_response import simulate_response, post_processing, \
+    component_class_pe, component_response_df, comptype_response_df
+from fragility import damage_state_index, exceedance_counts
+from fit_model import fragility_model, fragility_mle_model, \
+    restoration_model, restoration_profile_model, has_recovery_output, \
+    bootstrap_ci, bootstrap_seed
+from scenario_loss_analysis import load_facility, loss_analysis_data, \
+    analyse_scenarios, write_line_restoration
+
+from colorama import Fore, Style
+
+
+def system_damage_states(infrastructure, scenario, response_list):
+    """
+    Damage state index of the samples, from their economic loss.
+    :param infrastructure: The infrastructure that was simulated
+    :param scenario: Scenario values for the simulation
+    :param response_list: Values from the simulation
+    :return: integer array, samples x hazards
+    """
+    return damage_state_index(response_list[4],
+                              infrastructure.get_dmg_scale_bounds(scenario))
+
+
+def system_pe(infrastructure, scenario, response_list, sys_frag):
+    """
+    Probability of exceedance of the system damage states that the
+    fragility model is fitted to, as in fit_model.py: from the failures of
+    the component classes for substations, and from the economic loss of
+    the samples otherwise.
+    :param infrastructure: The infrastructure that was simulated
+    :param scenario: Scenario values for the simulation
+    :param response_list: Values from the simulation
+    :param sys_frag: damage state index of the samples, samples x hazards
+    :return: array of damage states x hazards
+    """
+    if infrastructure.system_class == 'Substation':
+        return component_class_pe(response_list, infrastructure, scenario)
+    return exceedance_counts(
+        sys_frag, len(infrastructure.get_system_damage_states())) \
+        / float(sys_frag.shape[0])
+
+
+def fit_system_models(infrastructure, scenario, response_list,
+                      out_path=None, processes=None):
+    """
+    Fit the system fragility and restoration models to the response of a
+    simulation, held in memory. The restoration models are not fitted if
+    the output during recovery was not calculated.
+    :param infrastructure: The infrastructure that was simulated
+    :param scenario: Scenario values for the simulation
+    :param response_list: Values from the simulation
+    :param out_path: directory the fitted models are written to, they are
+                     only returned if not given
+    :param processes: number of processes of the bootstrap
+    :return: dict of the fitted models (PANDAS dataframes), with the keys
+             'fragility', 'fragility_mle', 'restoration_profile',
+             'restoration', 'fragility_ci' and 'restoration_ci', of the
+             models that were requested
+    """
+    sys_ds = infrastructure.get_system_damage_states()
+    hazard_vals = scenario.hazard_intensity_vals
+    time_vals = scenario.restoration_time_range
+    nominal_output = infrastructure.get_nominal_output()
+
+    sys_frag = system_damage_states(infrastructure, scenario, response_list)
+    output_given_recovery = response_list[5]
+    if not has_recovery_output(output_given_recovery):
+        logging.info("The output during recovery was not calculated, "
+                     "the restoration models are not fitted")
+        output_given_recovery = None
+
+    models = {}
+    if scenario.fit_pe_data:
+        models['fragility'] = fragility_model(
+            hazard_vals,
+            system_pe(infrastructure, scenario, response_list, sys_frag),
+            sys_ds)
+        # the counts of samples are only available for the fragility
+        # based on economic loss
+        if infrastructure.system_class != 'Substation':
+            models['fragility_mle'] = fragility_mle_model(
+                hazard_vals, exceedance_counts(sys_frag, len(sys_ds)),
+                sys_ds)
+
+    if output_given_recovery is not None:
+        models['restoration_profile'] = restoration_profile_model(
+            time_vals, scenario.time_unit, sys_frag, output_given_recovery,
+            nominal_output, sys_ds)
+        if scenario.fit_restoration_data:
+            models['restoration'] = restoration_model(
+                time_vals, models['restoration_profile'], sys_ds)
+
+    if scenario.bootstrap_replicates > 0:
+        # the resampled damage states of the samples do not describe the
+        # failure rates of the component classes a substation is fitted to
+        fit_fragility = infrastructure.system_class != 'Substation'
+        if not fit_fragility:
+            logging.info("The fragility of a substation is fitted to the "
+                         "failure rates of its component classes, its "
+                         "confidence intervals are not bootstrapped")
+        frag_ci, rst_ci = bootstrap_ci(
+            hazard_vals, time_vals, sys_frag, output_given_recovery,
+            nominal_output, sys_ds, scenario.bootstrap_replicates,
+            processes=processes, seed=bootstrap_seed(scenario),
+            fit_fragility=fit_fragility)
+        if frag_ci is not None:
+            models['fragility_ci'] = frag_ci
+        if rst_ci is not None:
+            models['restoration_ci'] = rst_ci
+
+    if out_path is not None:
+        write_system_models(models, out_path)
+
+    return models
+
+
+# file names of the fitted models, as written by fit_model.py
+MODEL_FILE_NAMES = {
+    'fragility': 'system_model_fragility.csv',
+    'fragility_mle': 'system_model_fragility_mle.csv',
+    'restoration_profile': 'system_restoration_profile.csv',
+    'restoration': 'system_model_restoration__mode1.csv',
+    'fragility_ci': 'system_model_fragility_ci.csv',
+    'restoration_ci': 'system_model_restoration_ci.csv'}
+
+
+def write_system_models(models, out_path):
+    """
+    Write the fitted models to csv files.
+    :param models: dict of the fitted models, from fit_system_models
+    :param out_path: directory path for writing output (string)
+    :return: None
+    """
+    for name, model_df in models.items():
+        model_df.to_csv(os.path.join(out_path, MODEL_FILE_NAMES[name]),
+                        sep=',')
+
+
+def analyse_losses(config_file, infrastructure, scenario, response_list,
+                   write_outputs=True, processes=None):
+    """
+    Loss and restoration analysis of the scenario hazard values, from the
+    response of a simulation held in memory instead of the response files
+    of the run. The figures of the analysis are not drawn.
+
+    The analysis still runs on the legacy facility model of
+    scenario_loss_analysis.py, and the facility is built by reading the
+    infrastructure configuration file a second time, with FacilitySystem.
+    The component table, fragility and recovery parameters and output
+    nodes it uses are not built from the ingested 'infrastructure', so
+    the second read is part of the cost of the analysis, and the two
+    models must come from the same file.
+    :param config_file: Scenario setting values and the infrastructure
+                        configuration file path
+    :param infrastructure: The infrastructure that was simulated
+    :param scenario: Scenario values for the simulation
+    :param response_list: Values from the simulation
+    :param write_outputs: Write the restoration setups and the restoration
+                          prognosis of the output lines
+    :param processes: number of processes of the analysis
+    :return: (line_rst_times_df, analyses), see analyse_scenarios
+    """
+    facility = load_facility(config_file, write_outputs)
+    results = loss_analysis_data(
+        facility,
+        comptype_response_df(response_list, infrastructure, scenario),
+        component_response_df(response_list, scenario))
+
+    line_rst_times_df, analyses = analyse_scenarios(
+        results, facility, scenario, processes=processes,
+        draw_figures=False, write_outputs=write_outputs)
+    if write_outputs:
+        write_line_restoration(scenario, line_rst_times_df, analyses)
+
+    return line_rst_times_df, analyses
+
+
+def run_pipeline(config_file, output_path=None, write_outputs=True,
+                 use_cache=True, processes=None):
+    """
+    Simulate a scenario, fit the system models to its response, and
+    analyse the losses and restoration of its scenario hazard values, in
+    one process, without reading the results back from disk.
+    :param config_file: Scenario setting values and the infrastructure
+                        configuration file path
+    :param output_path: Output path of the run, the path configured in
+                        the scenario is used if not given
+    :param write_outputs: Write the results of the simulation, the fitted
+                          models and the loss analysis to the output path.
+                          Without it nothing is written: no output
+                          directories, checkpoints, event table or result
+                          cache entries.
+    :param use_cache: Load the results of an identical earlier run from
+                      the result cache instead of simulating
+    :param processes: number of processes of the bootstrap and the loss
+                      analysis
+    :return: dict with the 'scenario', the 'infrastructure', the
+             'response' list of the simulation, the fitted 'models', and
+             the 'line_rst_times' and 'analyses' of analyse_scenarios,
+             which are None without the 'loss' metric
+    """
+    scenario = Scenario(config_file, output_path, write_outputs)
+    infrastructure = ingest_spreadsheet(config_file)
+
+    response_list = simulate_response(scenario, infrastructure, use_cache,
+                                      write_cache=write_outputs)
+    if write_outputs:
+        post_processing(infrastructure, scenario, response_list)
+
+    models = fit_system_models(
+        infrastructure, scenario, response_list,
+        scenario.output_path if write_outputs else None, processes)
+
+    # the loss analysis depends on the loss statistics of the components
+    if 'loss' in scenario.requested_metrics:
+        line_rst_times_df, analyses = analyse_losses(
+            config_file, infrastructure, scenario, response_list,
+            write_outputs, processes)
+    else:
+        logging.info("The 'loss' metric was not requested, "
+                     "the scenario losses are not analysed")
+        line_rst_times_df, analyses = None, None
+
+    return {'scenario': scenario,
+            'infrastructure': infrastructure,
+            'response': response_list,
+            'models': models,
+            'line_rst_times': line_rst_times_df,
+            'analyses': analyses}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("setup_file",
+                        help="scenario configuration file")
+    parser.add_argument("--output-path", default=None,
+                        help="output path of the run")
+    parser.add_argument("--no-write", dest="write_outputs",
+                        action="store_false",
+                        help="keep the results in memory, nothing is "
+                             "written, the fitted models are printed")
+    parser.add_argument("--no-cache", dest="use_cache", action="store_false",
+                        help="simulate even if the results are cached")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="number of processes of the bootstrap and "
+                             "the loss analysis")
+    args = parser.parse_args()
+
+    code_start_time = time.time()
+    results = run_pipeline(args.setup_file, args.output_path,
+                           args.write_outputs, args.use_cache, args.processes)
+
+    for name in sorted(results['models']):
+        if name == 'restoration_profile':
+            continue
+        print("\n" + "-" * 79)
+        print(Fore.YELLOW + name + Fore.RESET)
+        print("-" * 79)
+        print(results['models'][name])
+
+    if results['line_rst_times'] is not None:
+        print("\n" + "-" * 79)
+        print(Fore.YELLOW + "restoration prognosis" + Fore.RESET)
+        print("-" * 79)
+        print(results['line_rst_times'])
+
+    print(Style.BRIGHT + Fore.YELLOW +
+          "[ Run time: %s ]\n" %
+          str(timedelta(seconds=(time.time() - code_start_time))) +
+          Style.RESET_ALL)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,251 @@
+"""
+Report of a simulation run.
+
+The figures of a run are rendered from the results store after the
+simulation has finished, with one process per figure, so rendering is not
+on the critical path of the simulation. The report of a run can be
+generated again, e.g. after a headless run, without re-simulating::
+
+    python report.py OUTPUT_PATH
+
+where OUTPUT_PATH is the output directory of the run.
+
+The figures of the scenario loss analysis (the restoration charts, the
+component type loss charts and the component criticality) are excluded
+from the report. The restoration prognosis they show is computed by
+scenario_loss_analysis.py from the legacy facility model and is not kept
+in the results store, so the report cannot re-render them. They are
+drawn inline while that analysis runs, and are kept off its critical
+path only by skipping them with its --no-figures option.
+"""
+
+from __future__ import print_function
+import os
+import argparse
+import logging
+from multiprocessing import Pool
+
+import numpy as np
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+import seaborn as sns
+
+from results_store import RunResults
+from box_summary import box_stats_from_array
+
+RAW_OUTPUT_DIR_NAME = 'raw_output'
+
+
+def write_report_metadata(results_store, scenario):
+    """
+    Record the values of the scenario that the figures of the report need.
+    :param results_store: The results store of the run
+    :param scenario: The scenario of the run
+    :return: None
+    """
+    results_store.write_metadata(
+        'scenario',
+        {'hazard_intensity_vals':
+             [float(h) for h in scenario.hazard_intensity_vals],
+         'intensity_measure_param': scenario.intensity_measure_param,
+         'intensity_measure_unit': scenario.intensity_measure_unit,
+         'time_unit': scenario.time_unit})
+
+
+def _intensity_label(run_metadata):
+    return run_metadata['intensity_measure_param'] + \
+        ' (' + run_metadata['intensity_measure_unit'] + ')'
+
+
+# ----------------------------------------------------------------------------
+# Figures
+# ----------------------------------------------------------------------------
+
+def plot_mean_econ_loss(run_results, output_path):
+    """Draws and saves a boxplot of mean economic loss"""
+    run_metadata = run_results.store.metadata('scenario')
+    loss_box_stats = box_stats_from_array(
+        run_results.get('economic_loss_box_stats'))
+
+    fig = plt.figure(figsize=(9, 5), facecolor='white')
+    sns.set(style='ticks', palette='Set2')
+    ax = fig.add_subplot(111)
+    # whitesmoke='#F5F5F5', coral='#FF7F50'
+    ax.bxp(loss_box_stats, showmeans=True, showfliers=False,
+           patch_artist=True,
+           boxprops=dict(facecolor='whitesmoke', linewidth=0.8),
+           whiskerprops=dict(color='#555555', linewidth=0.8),
+           capprops=dict(color='#555555', linewidth=0.8),
+           medianprops=dict(color='#555555', linewidth=0.8),
+           meanprops=dict(marker='o',
+                          markeredgecolor='coral',
+                          markerfacecolor='coral')
+           )
+
+    sns.despine(bottom=False, top=True, left=True, right=True, offset=10)
+    ax.spines['bottom'].set_linewidth(0.8)
+    ax.spines['bottom'].set_color('#555555')
+
+    ax.yaxis.grid(True, which="major", linestyle='-',
+                  linewidth=0.4, color='#B6B6B6')
+
+    ax.tick_params(axis='x', bottom='on', top='off',
+                   width=0.8, labelsize=8, pad=5, color='#555555')
+    ax.tick_params(axis='y', left='off', right='off',
+                   width=0.8, labelsize=8, pad=5, color='#555555')
+
+    ax.set_xticklabels(run_metadata['hazard_intensity_vals'])
+    ax.set_xlabel(_intensity_label(run_metadata), labelpad=9, size=10)
+    ax.set_ylabel('Loss Fraction (%)', labelpad=9, size=10)
+
+    ax.set_title('Loss Ratio', loc='center', y=1.04)
+    ax.title.set_fontsize(12)
+
+    figfile = os.path.join(output_path, 'fig_lossratio_boxplot.png')
+    plt.savefig(figfile, format='png', bbox_inches='tight', dpi=300)
+    plt.close(fig)
+    return figfile
+
+
+def plot_sys_pe(run_results, output_path):
+    """Draws and saves the system fragility curves of the simulation"""
+    run_metadata = run_results.store.metadata('scenario')
+    hazard_vals = run_metadata['hazard_intensity_vals']
+    pe_sys = run_results.get('pe_sys_econloss')
+    damage_states = run_results.labels('pe_sys_econloss', 'damage_state')
+
+    fig = plt.figure(figsize=(9, 5), facecolor='white')
+    sns.set(style='ticks', palette='Set2')
+    ax = fig.add_subplot(111)
+    # the first damage state is exceeded by all the samples
+    for dsi in range(1, pe_sys.shape[0]):
+        ax.plot(hazard_vals, pe_sys[dsi], marker='o', markersize=4,
+                linewidth=1.0, label=damage_states[dsi])
+
+    sns.despine(top=True, right=True)
+    ax.yaxis.grid(True, which="major", linestyle='-',
+                  linewidth=0.4, color='#B6B6B6')
+    ax.set_ylim([0.0, 1.0])
+    ax.set_xlabel(_intensity_label(run_metadata), labelpad=9, size=10)
+    ax.set_ylabel('Probability of Exceedence', labelpad=9, size=10)
+    ax.legend(loc='upper left', frameon=False, fontsize=9)
+
+    ax.set_title('System Fragility (Economic Loss)', loc='center', y=1.04)
+    ax.title.set_fontsize(12)
+
+    figfile = os.path.join(output_path, 'fig_sys_pe_econloss.png')
+    plt.savefig(figfile, format='png', bbox_inches='tight', dpi=300)
+    plt.close(fig)
+    return figfile
+
+
+def plot_restoration_profile(run_results, output_path):
+    """Draws and saves the mean restoration of output for each hazard level"""
+    run_metadata = run_results.store.metadata('scenario')
+    hazard_vals = run_metadata['hazard_intensity_vals']
+    restoration_profile = run_results.get('restoration_profile')
+    times = run_results.labels('restoration_profile', 'time')
+
+    fig = plt.figure(figsize=(9, 5), facecolor='white')
+    sns.set(style='ticks', palette='Set2')
+    ax = fig.add_subplot(111)
+    colours = plt.cm.viridis(np.linspace(0.0, 0.9, len(hazard_vals)))
+    for j, hazard_val in enumerate(hazard_vals):
+        ax.plot(times, restoration_profile[j], color=colours[j],
+                linewidth=1.0, label='{:.3f}'.format(hazard_val))
+
+    sns.despine(top=True, right=True)
+    ax.yaxis.grid(True, which="major", linestyle='-',
+                  linewidth=0.4, color='#B6B6B6')
+    ax.set_ylim([0.0, 1.05])
+    ax.set_xlabel('Time (' + run_metadata['time_unit'] + ')',
+                  labelpad=9, size=10)
+    ax.set_ylabel('Fraction of Nominal Output', labelpad=9, size=10)
+    ax.legend(loc='lower right', frameon=False, fontsize=7, ncol=2,
+              title=_intensity_label(run_metadata))
+
+    ax.set_title('Restoration of Output', loc='center', y=1.04)
+    ax.title.set_fontsize(12)
+
+    figfile = os.path.join(output_path, 'fig_restoration_profile.png')
+    plt.savefig(figfile, format='png', bbox_inches='tight', dpi=300)
+    plt.close(fig)
+    return figfile
+
+
+# figure name vs (the stored array the figure is drawn from, plot function)
+REPORT_FIGURES = {
+    'loss_boxplot': ('economic_loss_box_stats', plot_mean_econ_loss),
+    'sys_pe': ('pe_sys_econloss', plot_sys_pe),
+    'restoration_profile': ('restoration_profile', plot_restoration_profile),
+}
+
+
+# ----------------------------------------------------------------------------
+# Report generation
+# ----------------------------------------------------------------------------
+
+def render_figure(task):
+    """
+    Render one figure of the report. This is a module level function so
+    that it can be mapped over a process pool.
+    :param task: (raw output directory, output path, figure name)
+    :return: Path of the figure file
+    """
+    raw_output_dir, output_path, figure_name = task
+    _, plot_func = REPORT_FIGURES[figure_name]
+    return plot_func(RunResults.from_raw_output_dir(raw_output_dir),
+                     output_path)
+
+
+def generate_report(raw_output_dir, output_path=None, processes=None):
+    """
+    Render the figures of a run from its results store. Only the figures
+    of the arrays that are in the store are rendered.
+    :param raw_output_dir: The raw output directory of the run
+    :param output_path: Directory of the figures, the output directory of
+                        the run if not given
+    :param processes: Number of rendering processes, one per CPU if not given
+    :return: List of the paths of the figure files
+    """
+    if output_path is None:
+        output_path = os.path.dirname(os.path.normpath(raw_output_dir))
+
+    stored_names = RunResults.from_raw_output_dir(raw_output_dir).names()
+    tasks = [(raw_output_dir, output_path, figure_name)
+             for figure_name, (array_name, _) in sorted(REPORT_FIGURES.items())
+             if array_name in stored_names]
+
+    if processes == 1 or len(tasks) <= 1:
+        figfiles = [render_figure(task) for task in tasks]
+    else:
+        pool = Pool(processes)
+        try:
+            figfiles = pool.map(render_figure, tasks)
+        finally:
+            pool.close()
+            pool.join()
+
+    logging.info("Report figures saved in: " + output_path)
+    return figfiles
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Render the figures of a run from its stored results")
+    parser.add_argument("output_path",
+                        help="output directory of the run")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="number of rendering processes")
+    args = parser.parse_args()
+
+    raw_output_dir = os.path.join(args.output_path, RAW_OUTPUT_DIR_NAME)
+    for figfile in generate_report(raw_output_dir, args.output_path,
+                                   args.processes):
+        print(figfile)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,297 @@
+"""
+Planning of the restoration of a facility after a hazard event.
+
+The repair planner finds, for each output line, the smallest set of
+components whose repair restores supply to the line. The supply nodes of
+each commodity that are to be restored are chosen by a depth-first
+search over the subsets of the supply nodes, which is pruned with the
+capacity that the remaining supply nodes can still contribute and with
+the size of the best repair set found so far. The shortest paths from the
+supply nodes are found once per supply node, for all the output lines.
+
+The repairs are scheduled by list scheduling: the components are repaired
+in order of priority, each as soon as a repair stream is free. For the
+distribution of the restoration times the damage states and repair times
+of the components are sampled, and the repairs of all the realisations
+are scheduled together, one task at a time for all of them.
+"""
+
+import heapq
+
+import numpy as np
+from scipy import stats
+
+# tolerance of the capacity bound of the repair set search, so that
+# rounding of the sums of the capacities does not prune a feasible subset
+CAPACITY_TOL = 1.0e-9
+
+
+def shortest_path_nodes(G, sources, targets, weights='weight'):
+    """
+    Names of the nodes on the shortest path from each source to each
+    target, with one shortest path search per source.
+    :param G: igraph Graph, with the node names in the 'name' attribute
+    :param sources: names of the source nodes
+    :param targets: names of the target nodes
+    :param weights: name of the edge attribute with the edge weights
+    :return: dict of the set of node names on the path of each
+             (source, target) pair, empty if the target is not reachable
+    """
+    target_ids = [G.vs.find(t).index for t in targets]
+    paths = {}
+    for source in set(sources):
+        source_paths = G.get_shortest_paths(G.vs.find(source), to=target_ids,
+                                            weights=weights, mode='OUT')
+        for target, path in zip(targets, source_paths):
+            paths[(source, target)] = set(G.vs[v]['name'] for v in path)
+    return paths
+
+
+def min_repair_set(capacities, threshold, path_nodes, base_nodes=()):
+    """
+    Smallest set of nodes to repair to restore a required capacity.
+
+    A subset of the supply nodes is feasible if the sum of their
+    capacities reaches the threshold. Its repair set is the union of the
+    base nodes and the path nodes of the supply nodes in the subset. The
+    feasible subset with the smallest repair set is chosen, ties going to
+    the subset with fewer supply nodes, then to the first subset in
+    lexicographic order of the supply node indices.
+
+    :param capacities: capacity of each supply node
+    :param threshold: capacity to be restored
+    :param path_nodes: nodes to repair to restore each supply node, a
+                       list of sets
+    :param base_nodes: nodes that are repaired in any case
+    :return: (subset, repair set), the tuple of the indices of the chosen
+             supply nodes and the set of nodes to repair, (None, None) if
+             no subset reaches the threshold
+    """
+    capacities = np.asarray(capacities, dtype=np.float64)
+    num_supply = len(capacities)
+    # capacity the supply nodes from each index onwards can contribute
+    remaining = np.append(np.cumsum(capacities[::-1])[::-1], 0.0)
+    base_nodes = set(base_nodes)
+    best = [(np.inf, np.inf, ()), None]
+
+    def search(start, subset, total, nodes):
+        for i in range(start, num_supply):
+            if total + remaining[i] < threshold - CAPACITY_TOL:
+                return
+            new_subset = subset + (i,)
+            new_total = total + capacities[i]
+            new_nodes = nodes | path_nodes[i]
+            # a repair set only grows with the subset
+            if (len(new_nodes), len(new_subset)) > best[0][:2]:
+                continue
+            if new_total >= threshold:
+                key = (len(new_nodes), len(new_subset), new_subset)
+                if key < best[0]:
+                    best[:] = [key, new_nodes]
+                # supersets of a feasible subset are never better
+                continue
+            search(i + 1, new_subset, new_total, new_nodes)
+
+    search(0, (), 0.0, base_nodes)
+    if best[1] is None:
+        return None, None
+    return best[0][2], best[1]
+
+
+# ----------------------------------------------------------------------------
+# Scheduling of the repairs
+# ----------------------------------------------------------------------------
+
+def list_schedule(durations, num_streams, start_time=0.0, delays=None):
+    """
+    Schedule repair tasks, in the given order, on a number of repair
+    streams (crews) that each repair one component at a time.
+
+    The first tasks start on the streams at the start time, each after the
+    delay of the task before it. Every later task starts when the stream
+    that finishes first becomes free, found with a priority queue of the
+    finishing times of the running tasks.
+
+    :param durations: repair time of each task, in the order of priority
+    :param num_streams: number of repairs that can be done concurrently
+    :param start_time: time at which the repairs start
+    :param delays: delay of the start of each of the first tasks after the
+                   start of the task before it, none if not given
+    :return: (start, end, freed), the start and end times of the tasks, and
+             a boolean array that is True for the tasks whose completion
+             freed a stream for a later task
+    """
+    durations = np.asarray(durations, dtype=np.float64)
+    num_tasks = len(durations)
+    start = np.zeros(num_tasks)
+    freed = np.zeros(num_tasks, dtype=bool)
+    delays = np.zeros(num_tasks) if delays is None \
+        else np.asarray(delays, dtype=np.float64)
+
+    # the first tasks start at once, one on each stream
+    num_first = min(num_streams, num_tasks)
+    start[:num_first] = start_time + \
+        np.cumsum(np.append(0.0, delays[1:num_first]))
+    end = start + durations
+
+    # running tasks by end time, ties going to the earlier task
+    running = [(end[i], i) for i in range(num_first)]
+    heapq.heapify(running)
+    for i in range(num_first, num_tasks):
+        t_free, finished = heapq.heappop(running)
+        freed[finished] = True
+        start[i] = t_free
+        end[i] = t_free + durations[i]
+        heapq.heappush(running, (end[i], i))
+
+    return start, end, freed
+
+
+def schedule_repairs(durations, streams, start_time=0.0, delays=None):
+    """
+    Schedule the repair tasks for each of a number of repair stream counts.
+    :param durations: repair time of each task, in the order of priority
+    :param streams: numbers of repairs that can be done concurrently
+    :param start_time: time at which the repairs start
+    :param delays: delay of the start of each of the first tasks after the
+                   start of the task before it
+    :return: dict of the (start, end, freed) arrays of each stream count
+    """
+    return {num_streams: list_schedule(durations, num_streams, start_time,
+                                       delays)
+            for num_streams in streams}
+
+
+# ----------------------------------------------------------------------------
+# Stochastic restoration
+# ----------------------------------------------------------------------------
+
+def sample_repair_durations(pb, recovery_mean, recovery_std, num_samples,
+                            prng):
+    """
+    Sample the damage states of the components, and their repair times
+    from the normal recovery distribution of the damage state.
+    :param pb: probability of each damage state of each component,
+               components x damage states, with 'no damage' first
+    :param recovery_mean: mean repair time, components x damage states
+    :param recovery_std: standard deviation of the repair time,
+                         components x damage states
+    :param num_samples: number of realisations
+    :param prng: numpy RandomState
+    :return: repair times, samples x components, zero for the components
+             that are not damaged
+    """
+    pb = np.asarray(pb, dtype=np.float64)
+    num_comps, num_ds = pb.shape
+    cum_pb = np.cumsum(pb, axis=1)
+    rnd = prng.uniform(size=(num_samples, num_comps))
+    ds = np.minimum(np.sum(rnd[:, :, np.newaxis] > cum_pb[np.newaxis, :, :],
+                           axis=2), num_ds - 1)
+
+    comp_index = np.arange(num_comps)
+    damaged = ds > 0
+    mean = np.where(damaged, np.asarray(recovery_mean)[comp_index, ds], 0.0)
+    std = np.where(damaged, np.asarray(recovery_std)[comp_index, ds], 0.0)
+    durations = mean + std * prng.standard_normal((num_samples, num_comps))
+    return np.where(damaged, np.maximum(durations, 0.0), 0.0)
+
+
+def batch_list_schedule(durations, num_streams, start_time=0.0):
+    """
+    List scheduling of the repair tasks of many realisations at once. The
+    tasks are taken in the same order in every realisation, and each is
+    started on the stream that becomes free first. Tasks with no repair
+    time are not scheduled.
+    :param durations: repair times, samples x tasks, in order of priority
+    :param num_streams: number of repairs that can be done concurrently
+    :param start_time: time at which the repairs start
+    :return: end times of the repairs, samples x tasks, NaN for the tasks
+             that were not scheduled
+    """
+    durations = np.asarray(durations, dtype=np.float64)
+    num_samples, num_tasks = durations.shape
+    sample_index = np.arange(num_samples)
+    free_at = np.full((num_samples, num_streams), float(start_time))
+    end = np.full((num_samples, num_tasks), np.nan)
+    for i in range(num_tasks):
+        repaired = durations[:, i] > 0
+        stream = np.argmin(free_at, axis=1)
+        t_end = free_at[sample_index, stream] + durations[:, i]
+        free_at[sample_index[repaired], stream[repaired]] = t_end[repaired]
+        end[repaired, i] = t_end[repaired]
+    return end
+
+
+def line_restoration_times(end, line_tasks):
+    """
+    Time to the restoration of each output line, when the last of the
+    repairs on its repair path is done.
+    :param end: end times of the repairs, samples x tasks, NaN for the
+                tasks that were not scheduled
+    :param line_tasks: boolean array, tasks x lines, True for the tasks on
+                       the repair path of the line
+    :return: restoration times, samples x lines, zero for a line with no
+             repairs on its path
+    """
+    ends = np.where(np.isnan(end), 0.0, end)
+    line_tasks = np.asarray(line_tasks, dtype=bool)
+    times = np.zeros((ends.shape[0], line_tasks.shape[1]))
+    for line in range(line_tasks.shape[1]):
+        if np.any(line_tasks[:, line]):
+            times[:, line] = np.max(ends[:, line_tasks[:, line]], axis=1)
+    return times
+
+
+# ----------------------------------------------------------------------------
+# Recovery of the components
+# ----------------------------------------------------------------------------
+
+def recovery_given_hazard(hazard, damage_median, damage_logstd,
+                          recovery_mean, recovery_std, times):
+    """
+    Expected functionality of components over the restoration time, after
+    a hazard event, for any number of components or component types at
+    once: the sum over the damage states of the probability of the damage
+    state and the normal CDF of its recovery (the HAZUS method).
+    :param hazard: hazard intensity value
+    :param damage_median: median of the lognormal fragility of each damage
+                          state, components x damage states, with 'no
+                          damage' first
+    :param damage_logstd: logstd of the lognormal fragility of each damage
+                          state, components x damage states
+    :param recovery_mean: mean recovery time, components x damage states
+    :param recovery_std: standard deviation of the recovery time,
+                         components x damage states
+    :param times: restoration times (1D numpy array)
+    :return: expected functionality, components x times
+    """
+    pe = stats.lognorm.cdf(hazard, np.asarray(damage_logstd),
+                           scale=np.asarray(damage_median))
+    pb = np.empty_like(pe)
+    pb[:, 0] = 1.0 - pe[:, 1]
+    pb[:, 1:-1] = pe[:, 1:-1] - pe[:, 2:]
+    pb[:, -1] = pe[:, -1]
+
+    recov = stats.norm.cdf(np.asarray(times)[np.newaxis, np.newaxis, :],
+                           loc=np.asarray(recovery_mean)[:, :, np.newaxis],
+                           scale=np.asarray(recovery_std)[:, :, np.newaxis])
+    # undamaged components are fully functional
+    recov[:, 0, :] = 1.0
+    return np.einsum('kd,kdt->kt', pb, recov)
+
+
+def full_restoration_times(functionality, times, threshold):
+    """
+    Time at which the functionality of each component first reaches the
+    threshold, rounded to the nearest time unit.
+    :param functionality: expected functionality, components x times
+    :param times: restoration times (1D numpy array)
+    :param threshold: functionality of a restored component
+    :return: restoration time of each component, the last of the times
+             for components that are not restored within them
+    """
+    times = np.asarray(times)
+    restored = np.asarray(functionality) >= threshold
+    restoration_times = times[np.argmax(restored, axis=1)]
+    restoration_times[~np.any(restored, axis=1)] = times[-1]
+    return np.round(restoration_times, 0)
@@ -0,0 +1,186 @@
+"""
+Fitting of normal CDF restoration curves to the restoration profiles of
+the damage states of a system.
+
+The restoration profile of each damage state, the fraction of the
+nominal output restored over time, is fitted with a normal CDF of the
+restoration time. The fitted curve of a damage state should not rise
+above the curve of the damage state below it, so where the curves of two
+consecutive damage states cross, the higher damage state is refitted
+with bounds on its mean and stddev until they no longer cross.
+
+The restoration model of fit_model.py and its bootstrap replicates in
+fit_bootstrap.py are both fitted with fit_restoration_curves, so the
+confidence intervals are those of the reported estimates.
+"""
+
+from __future__ import print_function
+
+import numpy as np
+from scipy import stats
+import lmfit
+from colorama import Fore, Style
+
+# damage states with fewer finite points in their profile are not fitted
+MIN_POINTS = 3
+# maximum number of refits to correct the crossover of a pair of curves
+MAX_CROSSOVER_ITER = 50
+
+
+def norm_cdf(x, mu, sd):
+    return stats.norm.cdf(x, loc=mu, scale=sd)
+
+
+def res_norm_cdf(params, x, data, eps=None):
+    mu = params['mean'].value
+    sd = params['stddev'].value
+    model = stats.norm.cdf(x, loc=mu, scale=sd)
+    if eps is None:
+        return (model - data)
+    return (model - data) / eps
+
+
+def _quiet(*args):
+    pass
+
+
+def _initial_params(times, profile):
+    """
+    Starting values of the fit: the time the profile reaches 50%, and half
+    the time it takes to go from 16% to 84%.
+    """
+    t16, t50, t84 = [times[min(np.searchsorted(np.maximum.accumulate(profile),
+                                               level), len(times) - 1)]
+                     for level in (0.16, 0.5, 0.84)]
+    params = lmfit.Parameters()
+    params.add('mean', value=t50)
+    params.add('stddev', value=max((t84 - t16) / 2.0, np.max(times) / 100.0))
+    return params
+
+
+def _fit(params, x, y):
+    result = lmfit.minimize(res_norm_cdf, params, args=(x, y),
+                            method='leastsq')
+    return np.array([result.params['mean'].value,
+                     result.params['stddev'].value,
+                     result.chisqr])
+
+
+def _correct_crossover(params, x, y, times, fit_lo, fit_hi, log):
+    """
+    Refit the higher of a pair of damage states, with bounds on its mean
+    and stddev, until its curve no longer rises above the lower one.
+    :return: (mean, stddev, chisqr) of the higher damage state
+    """
+    m1_lo, s1_lo = fit_lo[:2]
+    m1_hi, s1_hi = fit_hi[:2]
+    y_model_lo = norm_cdf(times, m1_lo, s1_lo)
+
+    k = 0
+    crossover = True
+    mu_err = 0
+    sdtop_err = 0
+    sdbtm_err = 0
+    while k < MAX_CROSSOVER_ITER and crossover:
+        # Test if higher curve is co-incident with, or precedes lower curve
+        if m1_hi <= m1_lo:
+            if not mu_err > 0:
+                log("   *** Attempting to correct mean...")
+            params.add('mean', value=m1_hi, min=m1_lo * 1.01)
+            fit_hi = _fit(params, x, y)
+            m1_hi, s1_hi = fit_hi[:2]
+            mu_err += 1
+
+        # Thresholds for testing top or bottom crossover
+        delta_top = (1 + k / 100.0) * (3.0 * s1_lo - (m1_hi - m1_lo)) / 3
+        delta_btm = (1 - k / 100.0) * (3.0 * s1_lo + (m1_hi - m1_lo)) / 3
+
+        # Test for top crossover: refit if x-over detected
+        if (s1_hi < s1_lo) or (s1_hi <= delta_top):
+            if not sdtop_err > 0:
+                log("   *** Attempting to correct top crossover...")
+            params.add('mean', value=m1_hi * 1.01, min=m1_lo * 1.01)
+            params.add('stddev', value=s1_hi, min=delta_top)
+            fit_hi = _fit(params, x, y)
+            m1_hi, s1_hi = fit_hi[:2]
+            sdtop_err += 1
+
+        # Test for bottom crossover: refit if x-over detected
+        elif s1_hi >= delta_btm:
+            if not sdbtm_err > 0:
+                log("   *** Attempting to correct bottom crossover...")
+            params.add('stddev', value=s1_hi, min=delta_btm)
+            fit_hi = _fit(params, x, y)
+            m1_hi, s1_hi = fit_hi[:2]
+            sdbtm_err += 1
+
+        crossover = np.any(y_model_lo < norm_cdf(times, m1_hi, s1_hi))
+        k += 1
+
+    if not crossover:
+        log(Fore.YELLOW + "   Crossover corrected!" + Fore.RESET)
+    else:
+        log(Fore.RED + Style.BRIGHT + "   Crossover NOT corrected!" +
+            Fore.RESET + Style.RESET_ALL)
+    return fit_hi
+
+
+def fit_restoration_curves(times, profiles, verbose=False, ds_names=None):
+    """
+    Fit normal CDFs to the restoration profiles of the damage states, and
+    correct the crossover of the fitted curves of consecutive damage
+    states, from the lowest damage state up.
+
+    :param times: restoration times (1D numpy array)
+    :param profiles: fraction of the nominal output restored at the times,
+                     damage states x times (2D numpy array, without the
+                     'no damage' state), NaN where it is not known
+    :param verbose: print the initial fits and the crossover corrections
+    :param ds_names: names of the damage states in the printed messages
+    :returns: (means, stddevs, chisqr) of the damage states (numpy
+              arrays), NaN for damage states with fewer than MIN_POINTS
+              finite points in their profile
+    """
+    times = np.asarray(times, dtype=np.float64)
+    profiles = np.atleast_2d(np.asarray(profiles, dtype=np.float64))
+    num_ds = profiles.shape[0]
+    if ds_names is None:
+        ds_names = ['DS{}'.format(dx + 1) for dx in range(num_ds)]
+    log = print if verbose else _quiet
+
+    # ----- Get the initial fit -----
+    fits = np.full((num_ds, 3), np.nan)
+    params = [None] * num_ds
+    points = [None] * num_ds
+    for dx in range(num_ds):
+        valid = np.isfinite(profiles[dx])
+        if np.sum(valid) < MIN_POINTS:
+            continue
+        points[dx] = times[valid], profiles[dx][valid]
+        params[dx] = _initial_params(*points[dx])
+        fits[dx] = _fit(params[dx], *points[dx])
+
+    log("INITIAL Restoration Parameters:\n")
+    for dx in range(num_ds):
+        log("{}: Mean {:.3f}, StdDev {:.3f}, Chi-Sqr {:.3f}".format(
+            ds_names[dx], *fits[dx]))
+    log()
+
+    # ----- Check for crossover and refit as needed -----
+    for dx in range(1, num_ds):
+        if params[dx] is None or params[dx - 1] is None:
+            continue
+        y_model_lo = norm_cdf(times, *fits[dx - 1, :2])
+        y_model_hi = norm_cdf(times, *fits[dx, :2])
+        pair = ds_names[dx - 1] + '-' + ds_names[dx]
+        if np.any(y_model_lo < y_model_hi):
+            log(Fore.MAGENTA + "There is overlap for curve pair   : " +
+                pair + Fore.RESET)
+            x, y = points[dx]
+            fits[dx] = _correct_crossover(params[dx], x, y, times,
+                                          fits[dx - 1], fits[dx], log)
+        else:
+            log(Fore.GREEN + "There is NO overlap for curve pair: " +
+                pair + Fore.RESET)
+
+    return fits[:, 0], fits[:, 1], fits[:, 2]
@@ -0,0 +1,142 @@
+"""
+Cache of simulation results.
+
+The results of a run are stored under a hash of the infrastructure model
+and of the scenario parameters that determine the results, so that
+identical runs can load the stored results instead of simulating.
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+import cPickle as pickle
+
+from sifra.modelling.utils import jsonify
+
+# Changes to the layout of the cached results must change the version,
+# so results stored by an earlier version are not loaded
+CACHE_VERSION = 3
+
+# The scenario attributes that determine the simulation results
+SCENARIO_KEY_ATTRIBUTES = ['num_samples',
+                           'hazard_intensity_vals',
+                           'intensity_measure_param',
+                           'intensity_measure_unit',
+                           'restoration_time_range',
+                           'restore_time_max',
+                           'recovery_mode',
+                           'recovery_func_quantum',
+                           'recovery_checkpoints',
+                           'recovery_threshold',
+                           'recovery_time_tol',
+                           'requested_metrics',
+                           'run_context']
+
+
+def _to_serialisable(value):
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    return repr(value)
+
+
+def run_key(infrastructure, scenario, attributes=SCENARIO_KEY_ATTRIBUTES):
+    """
+    Calculate the hash of the model and scenario of a run.
+    :param infrastructure: The infrastructure model
+    :param scenario: The parameters of the simulation
+    :param attributes: The scenario attributes included in the hash
+    :return: Hex digest identifying the results of the run
+    """
+    scenario_fields = {attr: getattr(scenario, attr, None)
+                       for attr in attributes}
+    description = {'version': CACHE_VERSION,
+                   'infrastructure': jsonify(infrastructure),
+                   'scenario': scenario_fields}
+    return hashlib.sha1(json.dumps(description,
+                                   sort_keys=True,
+                                   default=_to_serialisable)).hexdigest()
+
+
+class ResultCache(object):
+    """
+    Directory of cached results, the least recently used results are
+    removed once the size of the cache exceeds its limit.
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+    def key(self, infrastructure, scenario):
+        """
+        Calculate the hash of the model and scenario of a run.
+        :param infrastructure: The infrastructure model
+        :param scenario: The parameters of the simulation
+        :return: Hex digest identifying the results of the run
+        """
+        return run_key(infrastructure, scenario)
+
+    def result_path(self, key):
+        return os.path.join(self.cache_dir, key + '.pickle')
+
+    def load(self, key):
+        """
+        Read the results of a run from the cache.
+        :param key: Hash of the run
+        :return: The cached results, or None if the run is not in the cache
+        """
+        path = self.result_path(key)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as handle:
+            results = pickle.load(handle)
+        # mark the results as recently used
+        os.utime(path, None)
+        return results
+
+    def save(self, key, results):
+        """
+        Write the results of a run to the cache, then evict the least
+        recently used results if the cache is over its size limit.
+        :param key: Hash of the run
+        :param results: The results of the run
+        :return: None
+        """
+        handle, tmp_path = tempfile.mkstemp(dir=self.cache_dir,
+                                            suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as tmp_file:
+                pickle.dump(results, tmp_file, pickle.HIGHEST_PROTOCOL)
+            os.rename(tmp_path, self.result_path(key))
+        except:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.evict(keep=key)
+
+    def evict(self, keep=None):
+        """
+        Remove the least recently used results until the cache is within
+        its size limit.
+        :param keep: Hash of results that are never removed
+        :return: None
+        """
+        entries = []
+        for file_name in os.listdir(self.cache_dir):
+            if not file_name.endswith('.pickle'):
+                continue
+            path = os.path.join(self.cache_dir, file_name)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            if keep is not None and path == self.result_path(keep):
+                continue
+            os.remove(path)
+            total_bytes -= size
@@ -0,0 +1,498 @@
+"""
+Results store of a simulation run.
+
+The arrays of a run are held in one directory with a manifest describing
+its contents. Arrays with a hazard axis are split into one chunk per
+hazard level, so a reader can fetch the results of some hazard levels
+without loading the results of the whole run.
+
+Layout of the store::
+
+    results_store/
+        manifest.json
+        <array name>.npy                   arrays without a hazard axis
+        <array name>/haz_<hazard>.npy      one chunk per hazard level
+
+Chunks are compressed npz files by default, which are small on disk but
+are always read in full. With the 'npy' format the chunks are
+uncompressed npy files, which readers memory map.
+
+The manifest names the axes of each array, e.g. ('sample', 'component',
+'hazard'), and holds the labels of the labelled axes, such as the
+component ids, which RunResults uses to select parts of the arrays.
+"""
+
+import os
+import json
+import tempfile
+
+import numpy as np
+
+STORE_DIR_NAME = 'results_store'
+MANIFEST_FILE_NAME = 'manifest.json'
+STORE_VERSION = 1
+STORE_FORMATS = ('npz', 'npy')
+
+
+def results_store_path(raw_output_dir):
+    """
+    The location of the results store of a run.
+    :param raw_output_dir: The raw output directory of the run
+    :return: Path of the results store
+    """
+    return os.path.join(raw_output_dir, STORE_DIR_NAME)
+
+
+def open_results_store(scenario):
+    """
+    Open the results store of the run of a scenario.
+    :param scenario: The scenario of the run
+    :return: ResultsStore
+    """
+    return ResultsStore(results_store_path(scenario.raw_output_dir),
+                        scenario.results_format)
+
+
+class ResultsStore(object):
+    """
+    Chunked store of the arrays of a run.
+    """
+
+    def __init__(self, store_dir, store_format='npz'):
+        """
+        Open a results store, the manifest of an existing store is read.
+        :param store_dir: Directory of the store
+        :param store_format: 'npz' for compressed chunks, 'npy' for
+                             uncompressed chunks that can be memory mapped
+        """
+        self.store_dir = store_dir
+        self.manifest_path = os.path.join(store_dir, MANIFEST_FILE_NAME)
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r') as handle:
+                self.manifest = json.load(handle)
+        else:
+            if store_format not in STORE_FORMATS:
+                raise ValueError("Unknown results format {}, the available "
+                                 "formats are {}".format(store_format,
+                                                         STORE_FORMATS))
+            self.manifest = {'version': STORE_VERSION,
+                             'format': store_format,
+                             'hazards': [],
+                             'arrays': {},
+                             'metadata': {}}
+
+    @property
+    def store_format(self):
+        return self.manifest['format']
+
+    @property
+    def hazards(self):
+        return list(self.manifest['hazards'])
+
+    def names(self):
+        return sorted(self.manifest['arrays'].keys())
+
+    # ------------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------------
+
+    def write(self, name, array, axes=None, labels=None):
+        """
+        Write an array that has no hazard axis.
+        :param name: Name of the array
+        :param array: The array
+        :param axes: Optional names of the axes of the array
+        :param labels: Optional dict of axis name vs labels, e.g. component ids
+        :return: None
+        """
+        array = np.asarray(array)
+        self._write_file(self._chunk_path(name), array)
+        self._add_entry(name, array, None, axes, labels)
+        self._write_manifest()
+
+    def write_by_hazard(self, name, array, hazards, hazard_axis,
+                        axes=None, labels=None):
+        """
+        Write an array that has a hazard axis, one chunk per hazard level.
+        :param name: Name of the array
+        :param array: The array
+        :param hazards: The hazard level strings, in the order of the axis
+        :param hazard_axis: The axis of the array that indexes the hazards
+        :param axes: Optional names of the axes of the array
+        :param labels: Optional dict of axis name vs labels, e.g. component ids
+        :return: None
+        """
+        array = np.asarray(array)
+        for index, hazard in enumerate(hazards):
+            self._write_chunk(name, hazard,
+                              np.take(array, index, axis=hazard_axis),
+                              hazard_axis, axes, labels)
+        self._write_manifest()
+
+    def write_chunk(self, name, hazard, chunk, hazard_axis,
+                    axes=None, labels=None):
+        """
+        Write the chunk of an array for a single hazard level.
+        :param name: Name of the array
+        :param hazard: The hazard level string
+        :param chunk: The array for the hazard level, without the hazard axis
+        :param hazard_axis: The axis that indexes the hazards in the full array
+        :param axes: Optional names of the axes of the full array
+        :param labels: Optional dict of axis name vs labels, e.g. component ids
+        :return: None
+        """
+        self._write_chunk(name, hazard, chunk, hazard_axis, axes, labels)
+        self._write_manifest()
+
+    def _write_chunk(self, name, hazard, chunk, hazard_axis,
+                     axes=None, labels=None):
+        # the manifest is updated in memory only, the callers write it
+        # once all the chunks of the array are written
+        chunk = np.asarray(chunk)
+        chunk_dir = os.path.join(self.store_dir, name)
+        if not os.path.exists(chunk_dir):
+            os.makedirs(chunk_dir)
+        self._write_file(self._chunk_path(name, hazard), chunk)
+        if hazard not in self.manifest['hazards']:
+            self.manifest['hazards'].append(hazard)
+            self.manifest['hazards'].sort(key=float)
+        self._add_entry(name, chunk, hazard_axis, axes, labels)
+
+    def write_dict_by_hazard(self, name, hazard_dict, hazard_axis,
+                             axes=None, labels=None):
+        """
+        Write a dict of arrays keyed by hazard level, such as the component
+        damage state indices of each hazard level.
+        :param name: Name of the array
+        :param hazard_dict: Dict of hazard level string vs array
+        :param hazard_axis: The axis that indexes the hazards in the full array
+        :param axes: Optional names of the axes of the full array
+        :param labels: Optional dict of axis name vs labels, e.g. component ids
+        :return: None
+        """
+        for hazard in sorted(hazard_dict.keys(), key=float):
+            self._write_chunk(name, hazard, hazard_dict[hazard], hazard_axis,
+                              axes, labels)
+        self._write_manifest()
+
+    def write_response_dict(self, name, response_dict, axes):
+        """
+        Write a dict, keyed by hazard level, of dicts of scalar responses.
+        Tuple keys such as (component id, response) are stored as the rows
+        and columns of a 2D chunk, other keys as the entries of a 1D chunk.
+        :param name: Name of the array
+        :param response_dict: Dict of hazard level string vs dict of responses
+        :param axes: Names of the axes of the keys, e.g. ('component', 'response')
+        :return: None
+        """
+        keys = sorted(set(key for responses in response_dict.values()
+                          for key in responses.keys()))
+        if keys and isinstance(keys[0], tuple):
+            rows = sorted(set(key[0] for key in keys))
+            columns = sorted(set(key[1] for key in keys))
+            labels = {axes[0]: rows, axes[1]: columns}
+            for hazard in sorted(response_dict.keys(), key=float):
+                responses = response_dict[hazard]
+                chunk = np.array([[responses.get((row, column), np.nan)
+                                   for column in columns] for row in rows],
+                                 dtype=np.float64)
+                self._write_chunk(name, hazard, chunk, 2,
+                                  list(axes[:2]) + ['hazard'], labels)
+        else:
+            labels = {axes[0]: keys}
+            for hazard in sorted(response_dict.keys(), key=float):
+                responses = response_dict[hazard]
+                chunk = np.array([responses.get(key, np.nan) for key in keys],
+                                 dtype=np.float64)
+                self._write_chunk(name, hazard, chunk, 1,
+                                  [axes[0], 'hazard'], labels)
+        self._write_manifest()
+
+    def write_metadata(self, key, value):
+        """
+        Record a value describing the run, such as the component types.
+        :param key: Name of the value
+        :param value: JSON serialisable value
+        :return: None
+        """
+        self.manifest.setdefault('metadata', {})[key] = value
+        self._write_manifest()
+
+    def _add_entry(self, name, array, hazard_axis, axes, labels):
+        entry = self.manifest['arrays'].get(name, {})
+        entry.update({'shape': list(array.shape),
+                      'dtype': array.dtype.str,
+                      'hazard_axis': hazard_axis})
+        if axes is not None:
+            entry['axes'] = list(axes)
+        if labels is not None:
+            entry['labels'] = {axis: list(axis_labels)
+                               for axis, axis_labels in labels.items()}
+        self.manifest['arrays'][name] = entry
+
+    def _write_manifest(self):
+        self._atomic_write(self.manifest_path,
+                           lambda handle: json.dump(self.manifest, handle,
+                                                    indent=2, default=str))
+
+    def _write_file(self, path, array):
+        if self.store_format == 'npz':
+            self._atomic_write(path,
+                               lambda handle: np.savez_compressed(handle,
+                                                                  data=array))
+        else:
+            self._atomic_write(path, lambda handle: np.save(handle, array))
+
+    def _atomic_write(self, path, write_func):
+        directory = os.path.dirname(path)
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        handle, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as tmp_file:
+                write_func(tmp_file)
+            os.rename(tmp_path, path)
+        except:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _chunk_path(self, name, hazard=None):
+        if hazard is None:
+            file_name = name
+        else:
+            file_name = os.path.join(name, 'haz_{}'.format(hazard))
+        return os.path.join(self.store_dir,
+                            '{}.{}'.format(file_name, self.store_format))
+
+    # ------------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------------
+
+    def info(self, name):
+        """
+        The manifest entry of an array.
+        :param name: Name of the array
+        :return: Dict of the shape, dtype, hazard axis and labels of the array
+        """
+        if name not in self.manifest['arrays']:
+            raise KeyError("Array {} is not in the results store "
+                           "{}".format(name, self.store_dir))
+        return self.manifest['arrays'][name]
+
+    def metadata(self, key, default=None):
+        return self.manifest.get('metadata', {}).get(key, default)
+
+    def read_chunk(self, name, hazard=None, mmap_mode=None):
+        """
+        Read the chunk of an array for one hazard level, or the whole array
+        if it has no hazard axis.
+        :param name: Name of the array
+        :param hazard: The hazard level string
+        :param mmap_mode: Memory map mode of 'npy' chunks, e.g. 'r'. Chunks
+                          in the 'npz' format are always read in full.
+        :return: The array
+        """
+        self.info(name)
+        path = self._chunk_path(name, hazard)
+        if self.store_format == 'npz':
+            with np.load(path) as chunk_file:
+                return chunk_file['data']
+        return np.load(path, mmap_mode=mmap_mode)
+
+    def read(self, name, hazards=None):
+        """
+        Read an array, arrays with a hazard axis are assembled from the
+        chunks of the requested hazard levels.
+        :param name: Name of the array
+        :param hazards: Optional list of hazard level strings, all hazard
+                        levels are read if not given
+        :return: The array
+        """
+        hazard_axis = self.info(name)['hazard_axis']
+        if hazard_axis is None:
+            return self.read_chunk(name)
+        if hazards is None:
+            hazards = self.manifest['hazards']
+        return np.stack([self.read_chunk(name, hazard) for hazard in hazards],
+                        axis=hazard_axis)
+
+    def read_dict_by_hazard(self, name, hazards=None):
+        """
+        Read an array as a dict of hazard level string vs chunk.
+        :param name: Name of the array
+        :param hazards: Optional list of hazard level strings
+        :return: Dict of arrays
+        """
+        if hazards is None:
+            hazards = self.manifest['hazards']
+        return {hazard: self.read_chunk(name, hazard) for hazard in hazards}
+
+    def read_response_dict(self, name, hazards=None):
+        """
+        Read an array written by write_response_dict.
+        :param name: Name of the array
+        :param hazards: Optional list of hazard level strings
+        :return: Dict of hazard level string vs dict of responses
+        """
+        entry = self.info(name)
+        labels = entry['labels']
+        key_axes = [axis for axis in entry['axes'] if axis != 'hazard']
+        response_dict = {}
+        for hazard, chunk in self.read_dict_by_hazard(name, hazards).items():
+            if len(key_axes) == 2:
+                response_dict[hazard] = \
+                    {(row, column): chunk[i, j]
+                     for i, row in enumerate(labels[key_axes[0]])
+                     for j, column in enumerate(labels[key_axes[1]])}
+            else:
+                response_dict[hazard] = \
+                    {row: chunk[i]
+                     for i, row in enumerate(labels[key_axes[0]])}
+        return response_dict
+
+
+class RunResults(object):
+    """
+    Lazy reader of the results of a run.
+
+    Only the chunks of the requested hazard levels are read, and the 'npy'
+    chunks are memory mapped, so selecting some components or a time window
+    of a large run only touches the parts of the files that are needed.
+    """
+
+    def __init__(self, store_dir):
+        self.store = ResultsStore(store_dir)
+        if self.store.store_format == 'npy':
+            self.mmap_mode = 'r'
+        else:
+            self.mmap_mode = None
+
+    @classmethod
+    def from_raw_output_dir(cls, raw_output_dir):
+        return cls(results_store_path(raw_output_dir))
+
+    @property
+    def hazards(self):
+        return self.store.hazards
+
+    def names(self):
+        return self.store.names()
+
+    def axes(self, name):
+        return self.store.info(name).get('axes')
+
+    def labels(self, name, axis):
+        return self.store.info(name).get('labels', {}).get(axis)
+
+    def component_types(self):
+        """
+        :return: Dict of component id vs component type
+        """
+        return self.store.metadata('component_types', {})
+
+    def components_of_type(self, component_type):
+        """
+        :param component_type: A string representing a component type
+        :return: Sorted list of the ids of the components of the type
+        """
+        return sorted(comp_id for comp_id, comp_type
+                      in self.component_types().items()
+                      if comp_type == component_type)
+
+    def get(self, name, hazard=None, component=None, component_type=None,
+            time_window=None):
+        """
+        Read a selection of an array.
+        :param name: Name of the array, e.g. 'economic_loss_array'
+        :param hazard: A hazard intensity, or a list of hazard intensities,
+                       as values or '%0.3f' strings. All hazard levels are
+                       read if not given. The hazard axis is dropped when a
+                       single hazard intensity is given.
+        :param component: A component id, or a list of component ids
+        :param component_type: Select the components of this type
+        :param time_window: (start, end) of the restoration times to select
+        :return: The selected array
+        """
+        entry = self.store.info(name)
+        axes = entry.get('axes') or []
+        chunk_axes = [axis for axis in axes if axis != 'hazard']
+
+        selection = []
+        if time_window is not None:
+            start, end = time_window
+            times = np.asarray(self._axis_labels(entry, 'time'))
+            in_window = np.where((times >= start) & (times <= end))[0]
+            if len(in_window) > 0:
+                time_slice = slice(in_window[0], in_window[-1] + 1)
+            else:
+                time_slice = slice(0, 0)
+            selection.append((chunk_axes.index('time'), time_slice))
+
+        if component is not None or component_type is not None:
+            comp_labels = self._axis_labels(entry, 'component')
+            if component is None:
+                comp_ids = self.components_of_type(component_type)
+            else:
+                if isinstance(component, basestring):
+                    component = [component]
+                comp_ids = list(component)
+                if component_type is not None:
+                    of_type = set(self.components_of_type(component_type))
+                    comp_ids = [c for c in comp_ids if c in of_type]
+            comp_index = {comp_id: i for i, comp_id in enumerate(comp_labels)}
+            missing = [c for c in comp_ids if c not in comp_index]
+            if missing:
+                raise KeyError("Components {} are not in {}".format(missing,
+                                                                    name))
+            selection.append((chunk_axes.index('component'),
+                              np.array([comp_index[c] for c in comp_ids],
+                                       dtype=int)))
+
+        if entry['hazard_axis'] is None:
+            return self._select(self.store.read_chunk(name,
+                                                      mmap_mode=self.mmap_mode),
+                                selection)
+
+        single_hazard = hazard is not None and \
+            not isinstance(hazard, (list, tuple, np.ndarray))
+        if hazard is None:
+            hazards = self.hazards
+        elif single_hazard:
+            hazards = [self.hazard_key(hazard)]
+        else:
+            hazards = [self.hazard_key(h) for h in hazard]
+
+        chunks = [self._select(self.store.read_chunk(name, h, self.mmap_mode),
+                               selection)
+                  for h in hazards]
+        if single_hazard:
+            return chunks[0]
+        return np.stack(chunks, axis=entry['hazard_axis'])
+
+    @staticmethod
+    def hazard_key(hazard):
+        """
+        The string of a hazard intensity used as the key of the chunks.
+        """
+        if isinstance(hazard, basestring):
+            return hazard
+        return '%0.3f' % float(hazard)
+
+    @staticmethod
+    def _axis_labels(entry, axis):
+        labels = entry.get('labels', {})
+        if axis not in labels:
+            raise ValueError("The array has no labelled {} axis".format(axis))
+        return labels[axis]
+
+    @staticmethod
+    def _select(chunk, selection):
+        # slices first, as they give views of memory mapped chunks
+        for axis, indexer in sorted(selection,
+                                    key=lambda s: not isinstance(s[1], slice)):
+            if isinstance(indexer, slice):
+                chunk = chunk[(slice(None),) * axis + (indexer,)]
+            else:
+                chunk = np.take(chunk, indexer, axis=axis)
+        return chunk
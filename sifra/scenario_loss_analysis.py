@@ -8,10 +8,16 @@ import igraph
 
 import sys, os
 import copy
-import itertools
+import argparse
+from multiprocessing import Pool
 from colorama import Fore, init
 init()
 
+from fragility import pe2pb
+from restoration import shortest_path_nodes, min_repair_set, \
+    schedule_repairs, sample_repair_durations, batch_list_schedule, \
+    line_restoration_times, recovery_given_hazard, full_restoration_times
+
 import sifraplot as spl
 
 import matplotlib.pyplot as plt
@@ -19,6 +25,36 @@ from matplotlib import gridspec
 import seaborn as sns
 sns.set(style='whitegrid', palette='coolwarm')
 
+# ****************************************************************************
+# Configuration values that can be adjusted for specific scenarios:
+
+# Nodes not considered in the loss calculations
+UNCOSTED_COMPTYPES = ['CONN_NODE', 'SYSTEM_INPUT', 'SYSTEM_OUTPUT',
+                      'Bus', 'Bus 230kV', 'Bus 69kV',
+                      'Generation Source', 'Grounding']
+
+RST_THRESHOLD = 0.98
+
+# Restoration time starts x time units after hazard impact:
+# This represents lead up time for damage and safety assessments
+RST_OFFSET = 1
+
+# Set weighting criteria for edges:
+# This influences the path chosen for restoration
+# Options are:
+#   [1] None
+#   [2] 'MIN_COST'
+#   [3] 'MIN_TIME'
+WEIGHT_CRITERIA = 'MIN_COST'
+
+# Percentiles of the sampled restoration times of the output lines
+RST_PERCENTILES = (5, 50, 95)
+
+# ****************************************************************************
+
+# the state of the analysis, set once in each process of the pool
+_analysis_state = {}
+
 # ============================================================================
 
 
@@ -138,7 +174,7 @@ def comp_recovery_given_haz(facility, compname, hazval, t,
     comp_fn = component_response.loc[(compname, 'func_mean'), ('%0.3f'% hazval)]
     
     haz_val_str = ("%0.3f" % np.float(hazval))
-    if ct not in uncosted_comptypes \
+    if ct not in UNCOSTED_COMPTYPES \
         and comps_avl_for_int_replacement >= 1:
         # Parameters for Temporary Restoration:
         rmu = [fragdict['tmp_rst_mean'][ct][ds] for ds in comptype_dmg_states]
@@ -185,6 +221,52 @@ def comp_recovery_given_haz(facility, compname, hazval, t,
 # ============================================================================
 
 
+def fragility_param_array(fragdict, name, comp_types, damage_states):
+    """
+    Array of a fragility or recovery parameter of component types
+
+    :param fragdict: fragility parameters of the facility
+    :param name: name of the parameter, e.g. 'damage_median'
+    :param comp_types: list of component types
+    :param damage_states: list of damage states
+    :return: array of component types x damage states
+    """
+    return np.array([[fragdict[name][ct][ds] for ds in damage_states]
+                     for ct in comp_types], dtype=np.float64).\
+        reshape(len(comp_types), len(damage_states))
+
+
+def comptype_recovery_given_haz(facility, comp_types, hazval, times,
+                                comptype_dmg_states):
+    """
+    Calculates level of recovery of component types over the restoration
+    times after impact, for all the types and times in one broadcasted
+    calculation
+
+    Uses the parameters for full restoration, as comp_recovery_given_haz
+    does for components that are not available for internal replacement.
+
+    :param facility: facility object, from sifraclasses
+    :param comp_types: list of component types
+    :param hazval: hazard intensity value
+    :param times: restoration times (numpy array)
+    :param comptype_dmg_states: damage states, with 'DS0 None' first
+    :return: array of the level of recovery, component types x times
+    """
+    def param_array(name):
+        return fragility_param_array(facility.fragdict, name, comp_types,
+                                     comptype_dmg_states)
+
+    return recovery_given_hazard(hazval,
+                                 param_array('damage_median'),
+                                 param_array('damage_logstd'),
+                                 param_array('recovery_mean'),
+                                 param_array('recovery_std'),
+                                 times)
+
+# ============================================================================
+
+
 def prep_repair_list(facility_obj,
                      weight_criteria, sc_haz_val_str,
                      component_meanloss, comp_fullrst_time):
@@ -200,73 +282,46 @@ def prep_repair_list(facility_obj,
     output_dict = facility_obj.output_dict
     nodes_by_commoditytype = facility_obj.nodes_by_commoditytype
     out_node_list = facility_obj.network.out_node_list
+    dep_node_list = facility_obj.network.dep_node_list
 
     w = 'weight'
+    edge_weights = []
     for tp in G.get_edgelist():
-        eid = G.get_eid(*tp)
         origin = G.vs[tp[0]]['name']
-        destin = G.vs[tp[1]]['name']
         if weight_criteria == None:
             wt = 1.0
         elif weight_criteria == 'MIN_TIME':
             wt = 1.0/comp_fullrst_time.ix[origin]['Full Restoration Time']
         elif weight_criteria == 'MIN_COST':
             wt = 1.0/component_meanloss.loc[origin, sc_haz_val_str]
-        G.es[eid][w] = wt
-    
-    repair_list = {outnode:{sn:0 for sn in nodes_by_commoditytype.keys()}
+        edge_weights.append(wt)
+    G.es[w] = edge_weights
+
+    # the shortest paths from every supply and dependency node to all the
+    # output nodes, for the edge weights of this weight criterion
+    sup_node_list = [n for nodes in nodes_by_commoditytype.values()
+                     for n in nodes]
+    sp_nodes = shortest_path_nodes(G, sup_node_list + list(dep_node_list),
+                                   out_node_list, weights=w)
+
+    repair_list = {outnode:{sn:[] for sn in nodes_by_commoditytype.keys()}
                    for outnode in out_node_list}
     repair_list_combined = {}
-    
+
     for o,onode in enumerate(out_node_list):
+        sp_dep = set([]).union(*[sp_nodes[(dnode, onode)]
+                                 for dnode in dep_node_list])
+        thresh = output_dict[onode]['capacity_fraction']
         for CK, sup_nodes_by_commtype in nodes_by_commoditytype.iteritems():
-            arr_row = []
-            for i,inode in enumerate(sup_nodes_by_commtype):
-                arr_row.append(input_dict[inode]['capacity_fraction'])
-        
-            for i,inode in enumerate(sup_nodes_by_commtype):
-                thresh = output_dict[onode]['capacity_fraction']
-            
-                vx = []
-                vlist = []
-                for L in range(0, len(arr_row)+1):
-                    for subset in \
-                            itertools.combinations(range(0, len(arr_row)), L):
-                        vx.append(subset)
-                    for subset in itertools.combinations(arr_row, L):
-                        vlist.append(subset)
-                vx = vx[1:]
-                vlist = [sum(x) for x in vlist[1:]]
-                vcrit = np.array(vlist)>=thresh
-            
-                sp_len = np.zeros(len(vx))
-                LEN_CHK = np.inf
-                
-                sp_dep = []
-                for dnode in facility_obj.network.dep_node_list:
-                    sp_dep.extend(G.get_shortest_paths(
-                        G.vs.find(dnode), to=G.vs.find(onode),
-                        weights=w, mode='OUT')[0]
-                    )
-                for cix, criteria in enumerate(vcrit):
-                    sp_list = []
-                    if not criteria:
-                        sp_len[cix] = np.inf
-                    else:
-                        for inx in vx[cix]:
-                            icnode = sup_nodes_by_commtype[inx]
-                            sp_list.extend(G.get_shortest_paths(
-                                G.vs.find(icnode),
-                                to=G.vs.find(onode),
-                                weights=w, mode='OUT')[0])
-                        sp_list = np.unique(sp_list)
-                        RL = [G.vs[x]['name']
-                              for x in set([]).union(sp_dep, sp_list)]
-                        sp_len[cix] = len(RL)
-                    if sp_len[cix] < LEN_CHK:
-                        LEN_CHK = sp_len[cix]
-                        repair_list[onode][CK] = sorted(RL)
-    
+            arr_row = [input_dict[inode]['capacity_fraction']
+                       for inode in sup_nodes_by_commtype]
+            _, RL = min_repair_set(
+                arr_row, thresh,
+                [sp_nodes[(inode, onode)] for inode in sup_nodes_by_commtype],
+                sp_dep)
+            if RL is not None:
+                repair_list[onode][CK] = sorted(RL)
+
         repair_list_combined[onode] = sorted(
             list(set([]).union(*repair_list[onode].values()))
         )
@@ -276,24 +331,61 @@ def prep_repair_list(facility_obj,
 # ============================================================================
 
 
-def calc_restoration_setup(out_node_list, repair_list_combined, 
-                           rst_stream, rst_offset, sc_haz_val_str, 
-                           comps_costed, comp_fullrst_time, output_path,
-                           haztag,
+def repair_task_list(out_node_list, repair_list_combined, uncosted_comps,
+                     comp_fullrst_time):
+    """
+    The repair tasks, line by line in order of priority, and the longest
+    repairs first within a line. Components shared with a line of higher
+    priority are repaired for that line.
+
+    :param out_node_list: list of output nodes, in order of priority
+    :param repair_list_combined: dict with output nodes as keys, with list
+                                 of nodes needing repair for each output
+                                 node as values
+    :param uncosted_comps: components that are not repaired
+    :param comp_fullrst_time: dataframe with components names as indices,
+                              and time required to restore those components
+    :return: list of (component, output node, restoration time) tuples
+    """
+    fixed_asset_list = set()
+    repair_tasks = []
+    for onode in out_node_list:
+        line_nodes = sorted(set(repair_list_combined[onode]).
+                            difference(fixed_asset_list))
+        fixed_asset_list.update(line_nodes)
+        line_tasks = [
+            (c, onode, comp_fullrst_time.loc[c, 'Full Restoration Time'])
+            for c in line_nodes if c not in uncosted_comps]
+        repair_tasks.extend(sorted(line_tasks, key=lambda task: -task[2]))
+    return repair_tasks
+
+
+def calc_restoration_setup(facility, out_node_list, repair_list_combined,
+                           repair_path, rst_streams, rst_offset,
+                           sc_haz_val_str, comps_costed, comp_fullrst_time,
+                           component_meanloss, output_path, haztag,
                            buffer_time_to_commission=0.00):
     """
     Calculates the timeline for full repair of all output lines of the system
 
     Depends on the given the hazard/restoration scenario specified through
-    the parameters
+    the parameters. The repairs are list scheduled, with a priority queue
+    of the times at which the repair streams become free, for each of the
+    numbers of restoration streams.
     --------------------------------------------------------------------------
+    :param facility:
+            facility object, from sifraclasses
     :param out_node_list:
             list of output nodes
     :param repair_list_combined:
             dict with output nodes as keys, with list of nodes needing repair
             for each output node as values
-    :param rst_stream:
-            maximum number of components that can be repaired concurrently
+    :param repair_path:
+            copy of repair_list_combined, the uncosted components are
+            removed from it in place
+    :param rst_streams:
+            list of the maximum numbers of components that can be repaired
+            concurrently
     :param rst_offset:
             time delay from hazard impact to start of repair
     :param sc_haz_val_str:
@@ -303,114 +395,157 @@ def calc_restoration_setup(out_node_list, repair_list_combined,
     :param comp_fullrst_time:
             dataframe with components names as indices, and time required to
             restore those components
+    :param component_meanloss:
+            dataframe with the mean loss of the components at each hazard
+            intensity
     :param output_path:
-            directory path for saving output
+            directory path for saving output, the restoration setup is
+            not written if it is None
     :param haztag:
             tag to add to the outputs produced
     :param buffer_time_to_commission:
             buffer time between completion of one repair task and
             commencement of the next repair task
     --------------------------------------------------------------------------
-    :return: rst_setup_df: PANDAS DataFrame with:
+    :return: dict with the number of restoration streams as keys, and
+             PANDAS DataFrames as values, with:
                 - The components to repaired as indices
                 - Time required to repair each component
                 - Repair start time for each component
                 - Repair end time for each component
     --------------------------------------------------------------------------
     """
-    cols = ['NodesToRepair', 'OutputNode', 'RestorationTimes', 
+    cols = ['NodesToRepair', 'OutputNode', 'RestorationTimes',
             'RstStart', 'RstEnd', 'DeltaTC', 'RstSeq', 'Fin', 'EconLoss']
 
-
-    fixed_asset_list = []
-    restore_time_each_node = {}
-    # restore_time_aggregate = {}
-    # rst_setup_dict = {col:{n:[] for n in out_node_list} for col in cols}
-    
-    rst_setup_df = pd.DataFrame(columns=cols)
-    # df = pd.DataFrame(columns=cols)
-    
-    for onode in out_node_list:
-    
-        repair_list_combined[onode] = \
-            list(set(repair_list_combined[onode]).difference(fixed_asset_list))
-        fixed_asset_list.extend(repair_list_combined[onode])
-    
-        restore_time_each_node[onode] = \
-            [comp_fullrst_time.ix[i]['Full Restoration Time'] 
-             for i in repair_list_combined[onode]]
-        # restore_time_aggregate[onode] = \
-        #     max(restore_time_each_node[onode]) + \
-        #     sum(np.array(restore_time_each_node[onode]) * 0.01)
-    
-        df = pd.DataFrame(
-            {'NodesToRepair': repair_list_combined[onode],
-             'OutputNode': [onode]*len(repair_list_combined[onode]),
-             'RestorationTimes': restore_time_each_node[onode],
-             'Fin': 0
-             })
-        df = df.sort_values(by=['RestorationTimes'], ascending=[0])
-        rst_setup_df = rst_setup_df.append(df)
-
     uncosted_comps = set(facility.network.nodes_all).difference(comps_costed)
-    comps_to_drop = set(rst_setup_df.index.values.tolist()).\
-                        intersection(uncosted_comps)
-    
-    rst_setup_df = rst_setup_df.drop(comps_to_drop, axis=0)
-    rst_setup_df = rst_setup_df[rst_setup_df['RestorationTimes']!=0]
-    rst_setup_df = rst_setup_df.set_index('NodesToRepair')[cols[1:]]
-    rst_setup_df['DeltaTC'] = pd.Series(
-        rst_setup_df['RestorationTimes'].values * buffer_time_to_commission,
-        index=rst_setup_df.index
-    )
+
+    repair_tasks = [task for task in
+                    repair_task_list(out_node_list, repair_list_combined,
+                                     uncosted_comps, comp_fullrst_time)
+                    if task[2] != 0]
+    nodes_to_repair = [c for c, _, _ in repair_tasks]
+    output_nodes = [onode for _, onode, _ in repair_tasks]
 
     for k in repair_path.keys():
         oldlist = repair_path[k]
         repair_path[k] = [v for v in oldlist if v not in uncosted_comps]
 
-    rst_seq = []
-    num = len(rst_setup_df.index)
-    for i in range(1, 1+int(np.ceil(num/float(rst_stream)))):
-        rst_seq.extend([i]*rst_stream)
-    rst_seq = rst_seq[:num]
-    rst_setup_df['RstSeq'] = pd.Series(rst_seq, index=rst_setup_df.index)
-
-    t_init = 0
-    t0 = t_init+rst_offset
-    for inx in rst_setup_df.index[0:rst_stream]:
-        if inx!=rst_setup_df.index[0]: t0 += rst_setup_df.ix[inx]['DeltaTC']
-        rst_setup_df.loc[inx, 'RstStart'] = t0
-        rst_setup_df.loc[inx, 'RstEnd'] = \
-            rst_setup_df.ix[inx]['RstStart'] + \
-            rst_setup_df.ix[inx]['RestorationTimes']
-
-    dfx = copy.deepcopy(rst_setup_df)
-    for inx in rst_setup_df.index[rst_stream:]:
-        t0 = min(dfx['RstEnd'])   #rst_setup_df.ix[inx]['DeltaTC']
-
-        finx = rst_setup_df[rst_setup_df['RstEnd']==min(dfx['RstEnd'])]
-
-        for x in finx.index:
-            if rst_setup_df.loc[x, 'Fin'] == 0:
-                rst_setup_df.loc[x, 'Fin'] = 1
-                break
-        dfx = rst_setup_df[rst_setup_df['Fin']!=1]
-        rst_setup_df.loc[inx, 'RstStart'] = t0
-        rst_setup_df.loc[inx, 'RstEnd'] = \
-            rst_setup_df.ix[inx]['RstStart'] + \
-            rst_setup_df.ix[inx]['RestorationTimes']
-
-    cp_losses = [component_meanloss.loc[c, sc_haz_val_str] 
-                for c in rst_setup_df.index]
-    rst_setup_df['EconLoss'] = cp_losses
-
-    # add a column for 'component_meanloss'
-    rst_setup_df.to_csv(
-        os.path.join(output_path, 'restoration_setup_'+haztag+'.csv'),
-        index_label=['NodesToRepair'], sep=','
-    )
+    restoration_times = np.array([t for _, _, t in repair_tasks],
+                                 dtype=np.float64)
+    delta_tc = restoration_times * buffer_time_to_commission
+    cp_losses = [component_meanloss.loc[c, sc_haz_val_str]
+                 for c in nodes_to_repair]
+
+    schedules = schedule_repairs(restoration_times, rst_streams,
+                                 rst_offset, delta_tc)
+
+    rst_setup = {}
+    for rst_stream, (rst_start, rst_end, fin) in schedules.items():
+        rst_seq = np.arange(len(nodes_to_repair)) // rst_stream + 1
+        rst_setup_df = pd.DataFrame(
+            {'NodesToRepair': nodes_to_repair,
+             'OutputNode': output_nodes,
+             'RestorationTimes': restoration_times,
+             'RstStart': rst_start,
+             'RstEnd': rst_end,
+             'DeltaTC': delta_tc,
+             'RstSeq': rst_seq,
+             'Fin': fin.astype(int),
+             'EconLoss': cp_losses},
+            columns=cols).set_index('NodesToRepair')
+
+        if output_path is not None:
+            rst_setup_df.to_csv(
+                os.path.join(output_path, 'restoration_setup_' + haztag +
+                             '_str' + str(rst_stream) + '.csv'),
+                index_label=['NodesToRepair'], sep=','
+            )
+        rst_setup[rst_stream] = rst_setup_df
+
+    return rst_setup
+
+# ============================================================================
+
+
+def simulate_line_restoration(facility, scenario, results, hazard,
+                              repair_list_combined, comp_fullrst_time,
+                              rst_streams, num_samples,
+                              percentiles=RST_PERCENTILES):
+    """
+    Monte Carlo distribution of the restoration times of the output lines
 
-    return rst_setup_df
+    The damage states of the components to repair are sampled from their
+    fragility at the hazard value, and their repair times from the normal
+    recovery distribution of the damage state. The repairs of all the
+    realisations are list scheduled together, in the order of the
+    deterministic restoration plan.
+    --------------------------------------------------------------------------
+    :param facility: facility object, from sifraclasses
+    :param scenario: scenario object, from sifraclasses
+    :param results: results of the run, from loss_analysis_data
+    :param hazard: hazard intensity value of the scenario
+    :param repair_list_combined: dict with output nodes as keys, with list
+                                 of nodes needing repair for each output
+                                 node as values
+    :param comp_fullrst_time: dataframe with components names as indices,
+                              and time required to restore those components
+    :param rst_streams: list of the maximum numbers of components that can
+                        be repaired concurrently
+    :param num_samples: number of realisations
+    :param percentiles: percentiles of the restoration times to report
+    --------------------------------------------------------------------------
+    :return: PANDAS DataFrame with the output lines as indices, and the
+             percentiles of their restoration time for each number of
+             restoration streams as columns
+    --------------------------------------------------------------------------
+    """
+    fragdict = facility.fragdict
+    out_node_list = facility.network.out_node_list
+    comp_type_ds = results['comp_type_ds']
+    uncosted_comps = set(facility.network.nodes_all).\
+        difference(results['comps_costed'])
+
+    repair_tasks = repair_task_list(out_node_list, repair_list_combined,
+                                    uncosted_comps, comp_fullrst_time)
+    comps = [c for c, _, _ in repair_tasks]
+    ctypes = [facility.compdict['component_type'][c] for c in comps]
+
+    def param_array(name, damage_states):
+        return fragility_param_array(fragdict, name, ctypes, damage_states)
+
+    pe = stats.lognorm.cdf(hazard,
+                           param_array('damage_logstd', comp_type_ds[1:]),
+                           scale=param_array('damage_median',
+                                             comp_type_ds[1:]))
+    pb = pe2pb(pe)
+
+    if scenario.run_context:
+        prng = np.random.RandomState(int(hazard*100))
+    else:
+        prng = np.random.RandomState()
+    durations = sample_repair_durations(
+        pb, param_array('recovery_mean', comp_type_ds),
+        param_array('recovery_std', comp_type_ds), num_samples, prng)
+
+    line_tasks = np.array([[c in repair_list_combined[onode]
+                            for onode in out_node_list] for c in comps],
+                          dtype=bool).reshape(len(comps), len(out_node_list))
+
+    pct_labels = ['P{:g}'.format(p) for p in percentiles]
+    line_rst_quantiles = []
+    for RS in rst_streams:
+        end = batch_list_schedule(durations, RS, RST_OFFSET)
+        line_times = line_restoration_times(end, line_tasks)
+        line_rst_quantiles.append(pd.DataFrame(
+            np.percentile(line_times, percentiles, axis=0).T,
+            index=out_node_list, columns=pct_labels))
+
+    line_rst_quantiles_df = pd.concat(
+        line_rst_quantiles, axis=1, keys=rst_streams,
+        names=['Restoration Streams', 'Percentile'])
+    line_rst_quantiles_df.index.name = 'Output Lines'
+    return line_rst_quantiles_df
 
 # ============================================================================
 
@@ -665,6 +800,7 @@ def component_criticality(facility, scenario,
 
 
 def draw_component_loss_barchart_v1(scenario,
+                                    ctype_resp_sorted,
                                     ctype_loss_vals_tot,
                                     ctype_loss_by_type,
                                     ctype_lossbytype_rank,
@@ -766,6 +902,7 @@ def draw_component_loss_barchart_v1(scenario,
 
 
 def draw_component_loss_barchart_v2(scenario,
+                                    ctype_resp_sorted,
                                     ctype_loss_vals_tot,
                                     ctype_loss_by_type,
                                     sc_haz_val_str,
@@ -858,7 +995,8 @@ def draw_component_loss_barchart_v2(scenario,
 # ============================================================================
 
 
-def draw_component_failure_barchart(uncosted_comptypes,
+def draw_component_failure_barchart(scenario,
+                                    uncosted_comptypes,
                                     ctype_failure_mean,
                                     sc_haz_val_str,
                                     output_path,
@@ -928,58 +1066,35 @@ def draw_component_failure_barchart(uncosted_comptypes,
 # ============================================================================
 
 
-def calc_comptype_damage_scenario_given_hazard(facility,
-                                               cp_types_costed,
-                                               comptype_resp_df):
-    comptype_num = {
-        x:facility.comp_df[facility.comp_df['component_type']==x]\
-            ['component_type'].count()
-        for x in facility.cp_types_in_system
-        }
-    comptype_used = {x:0 for x in facility.cp_types_in_system}
+def calc_comptype_damage_scenario_given_hazard(facility, scenario, results,
+                                               sc_haz_val,
+                                               ctype_resp_sorted):
+    """
+    Restoration times of the components, and the outcomes for the
+    component types, for a scenario hazard value
+
+    :param facility: facility object, from sifraclasses
+    :param scenario: scenario object, from sifraclasses
+    :param results: results of the run, from loss_analysis_data
+    :param sc_haz_val: hazard intensity value of the scenario
+    :param ctype_resp_sorted: response of the component types at the
+                              hazard value, sorted by their total loss
+    :return: (component_fullrst_time, ctype_scenario_outcomes)
+    """
+    nodes_all = facility.network.nodes_all
 
     # ------------------------------------------------------------------------
-    # Logic for internal component replacement / scavenging
-
-    comptype_for_internal_replacement = {}
-    for x in facility.cp_types_in_system:
-        if x in cp_types_costed:
-            comptype_for_internal_replacement[x] = \
-                int(np.floor(
-                    (1.0 - comptype_resp_df.loc[
-                        (x, 'num_failures'), sc_haz_val_str]
-                     ) * comptype_num[x]
-                ))
-        else:
-            comptype_for_internal_replacement[x] = 0
+    # Using the HAZUS method, for each component type once:
 
-    # ------------------------------------------------------------------------
-    # Using the HAZUS method:
-
-    comp_rst = {t: {n: 0 for n in nodes_all}
-                for t in scenario.restoration_time_range}
-    for c in nodes_all:
-
-        ct = facility.compdict['component_type'][c]
-        comptype_used[ct] += 1
-        comps_avl_for_int_replacement = \
-            comptype_for_internal_replacement[ct] - comptype_used[ct]
-
-        for t in scenario.restoration_time_range:
-            comp_rst[t][c] = comp_recovery_given_haz(
-                facility, c, sc_haz_val, t,
-                COMP_TYPE_DS,
-                component_response,
-                comps_avl_for_int_replacement=0,
-                threshold=RST_THRESHOLD)[0]
-    comp_rst_df = pd.DataFrame(comp_rst,
-                               index=nodes_all,
-                               columns=scenario.restoration_time_range)
-
-    comp_rst_time_given_haz = \
-        [np.round(comp_rst_df.columns[comp_rst_df.loc[c]
-                                      >= RST_THRESHOLD][0], 0)
-         for c in nodes_all]
+    comp_types = [facility.compdict['component_type'][c] for c in nodes_all]
+    unique_types, type_index = np.unique(comp_types, return_inverse=True)
+    comptype_rst = comptype_recovery_given_haz(
+        facility, unique_types, sc_haz_val,
+        scenario.restoration_time_range, results['comp_type_ds'])
+
+    comp_rst_time_given_haz = full_restoration_times(
+        comptype_rst, scenario.restoration_time_range,
+        RST_THRESHOLD)[type_index]
 
     # ------------------------------------------------------------------------
 
@@ -996,199 +1111,154 @@ def calc_comptype_damage_scenario_given_hazard(facility,
 
     rtimes = []
     for x in ctype_scenario_outcomes.index:
-        rtimes.append(np.mean(component_fullrst_time.loc[cpmap[x]].values))
+        rtimes.append(np.mean(
+            component_fullrst_time.loc[results['cpmap'][x]].values))
     ctype_scenario_outcomes['restoration_time'] = rtimes
 
     return component_fullrst_time, ctype_scenario_outcomes
 
+
 # ============================================================================
-# READ in SETUP data
-# The first argument is the full path to the config file
+# Loading the results of a run
 # ============================================================================
 
-# --- BEGIN SETUP ---
-
-SETUPFILE = sys.argv[1]
-discard = {}
-config = {}
-
-# Read in config file and define Scenario & Facility objects
-exec (open(SETUPFILE).read(), discard, config)
-FacilityObj = eval(config["SYSTEM_CLASS"])
-scenario = Scenario(SETUPFILE)
-facility = FacilityObj(SETUPFILE)
-
-# Define input files, output location, scenario inputs
-INPUT_PATH = scenario.input_path
-OUTPUT_PATH = scenario.output_path
-RAW_OUTPUT_DIR = scenario.raw_output_dir
-SYS_CONFIG_FILE = os.path.join(INPUT_PATH, facility.sys_config_file_name)
-
-RESTORATION_TIME_RANGE = scenario.restoration_time_range
-RESTORATION_STREAMS = scenario.restoration_streams
-SCENARIO_HAZARD_VALUES = scenario.scenario_hazard_values
-SYS_DS = facility.sys_dmg_states
-COMP_TYPE_DS = sorted(list(facility.fragility_data.index.\
-                           get_level_values('damage_state').unique()))
-
-haz_vals_str = [('%0.3f' % np.float(x))
-                for x in scenario.hazard_intensity_vals]
-
-# ------------------------------------------------------------------------
-# READ in raw output files from prior analysis of system fragility
-
-economic_loss_array = \
-    np.load(os.path.join(
-        RAW_OUTPUT_DIR, 'economic_loss_array.npy'))
-
-calculated_output_array = \
-    np.load(os.path.join(
-        RAW_OUTPUT_DIR, 'calculated_output_array.npy'))
-
-output_array_given_recovery = \
-    np.load(os.path.join(
-        RAW_OUTPUT_DIR, 'output_array_given_recovery.npy'))
-
-exp_damage_ratio = \
-    np.load(os.path.join(
-        RAW_OUTPUT_DIR, 'exp_damage_ratio.npy'))
-
-sys_frag = \
-    np.load(os.path.join(
-        RAW_OUTPUT_DIR, 'sys_frag.npy'))
-
-required_time = \
-    np.load(os.path.join(RAW_OUTPUT_DIR, 'required_time.npy'))
-
-if facility.system_class == 'PowerStation':
-    pe_sys = \
-        np.load(os.path.join(RAW_OUTPUT_DIR, 'pe_sys_econloss.npy'))
-elif facility.system_class == 'Substation':
-    pe_sys = \
-        np.load(os.path.join(RAW_OUTPUT_DIR, 'pe_sys_cpfailrate.npy'))
-
-# ------------------------------------------------------------------------
-# Read in SIMULATED HAZARD RESPONSE for <COMPONENT TYPES>
-
-comptype_resp_df = \
-    pd.read_csv(os.path.join(scenario.output_path,
-                             'comptype_response.csv'),
-                index_col=['component_type', 'response'],
-                skipinitialspace=True)
-comptype_resp_df.columns = [haz_vals_str]
-
-ct_resp_flat = comptype_resp_df.reset_index('response')
-
-ctype_loss_mean = \
-    ct_resp_flat[ct_resp_flat['response'] == 'loss_mean'].\
-    drop('response', axis=1)
-
-ctype_loss_tot = \
-    ct_resp_flat[ct_resp_flat['response'] == 'loss_tot'].\
-    drop('response', axis=1)
-
-ctype_loss_std = \
-    ct_resp_flat[ct_resp_flat['response'] == 'loss_std'].\
-    drop('response', axis=1)
-
-ctype_func_mean = \
-    ct_resp_flat[ct_resp_flat['response'] == 'func_mean'].\
-    drop('response', axis=1)
-
-ctype_func_std = \
-    ct_resp_flat[ct_resp_flat['response'] == 'func_std'].\
-    drop('response', axis=1)
-
-ctype_failure_mean = \
-    ct_resp_flat[ct_resp_flat['response'] == 'num_failures'].\
-    drop('response', axis=1)
-
-# ****************************************************************************
-# Nodes not considered in the loss calculations
-# NEED TO MOVE THESE TO A MORE LOGICAL PLACE
-
-uncosted_comptypes = ['CONN_NODE', 'SYSTEM_INPUT', 'SYSTEM_OUTPUT',
-                      'Bus', 'Bus 230kV', 'Bus 69kV',
-                      'Generation Source', 'Grounding']
-
-cp_types_costed = [x for x in facility.cp_types_in_system
-                   if x not in uncosted_comptypes]
-
-# Get list of only those components that are included in cost calculations:
-
-cpmap = {c:sorted(facility.comp_df[facility.comp_df['component_type'] == c]
-                  .index.tolist())
-        for c in facility.cp_types_in_system}
-comps_costed = [v for x in cp_types_costed for v in cpmap[x]]
+def load_facility(setup_file, write_outputs=True):
+    """
+    Facility object of the system class of a scenario, the generic
+    FacilitySystem for system classes without a class of their own, such
+    as substations
+
+    :param setup_file: scenario configuration file
+    :param write_outputs: create the output directories of the facility
+                          and draw its layout into them
+    :return: facility object, from sifraclasses
+    """
+    discard = {}
+    config = {}
+    exec (open(setup_file).read(), discard, config)
+    FacilityObj = globals().get(config["SYSTEM_CLASS"], FacilitySystem)
+    return FacilityObj(setup_file, write_outputs)
 
-# ****************************************************************************
 
-# Value of component types relative to system value
-comptype_value = []
-for k in sorted(cp_types_costed):
-    v = facility.comp_df[facility.comp_df['component_type']==k]\
-        ['cost_fraction'].sum(axis=0)
-    n = facility.comp_df[facility.comp_df['component_type']==k].index.size
-    comptype_value.append(v/n)
-
-# Read in SIMULATED HAZARD RESPONSE - for <COMPONENT INSTANCES>
-component_response = \
-    pd.read_csv(os.path.join(OUTPUT_PATH, 'component_response.csv'),
-                index_col=['component_id', 'response'],
-                skiprows=0, skipinitialspace=True)
-
-component_meanloss = \
-    component_response.query('response == "loss_mean"').\
+def loss_analysis_data(facility, comptype_resp_df, component_response):
+    """
+    The results of a run that the loss analysis depends on, so that they
+    can be reused for any number of scenario hazard values
+
+    :param facility: facility object, from sifraclasses
+    :param comptype_resp_df: response of the component types, with the
+                             (component_type, response) index and the
+                             hazard values as columns (PANDAS dataframe)
+    :param component_response: response of the components, with the
+                               (component_id, response) index and the
+                               hazard values as columns (PANDAS dataframe)
+    :return: dict of the responses of the component types and components,
+             and the component lists of the facility
+    """
+    ct_resp_flat = comptype_resp_df.reset_index('response')
+    ctype_failure_mean = \
+        ct_resp_flat[ct_resp_flat['response'] == 'num_failures'].\
+        drop('response', axis=1)
+
+    cp_types_costed = [x for x in facility.cp_types_in_system
+                       if x not in UNCOSTED_COMPTYPES]
+
+    # Get list of only those components that are included in cost
+    # calculations:
+    cpmap = {c: sorted(facility.comp_df[facility.comp_df['component_type']
+                                        == c].index.tolist())
+             for c in facility.cp_types_in_system}
+    comps_costed = [v for x in cp_types_costed for v in cpmap[x]]
+
+    # Value of component types relative to system value
+    comptype_value = []
+    for k in sorted(cp_types_costed):
+        v = facility.comp_df[facility.comp_df['component_type'] == k]\
+            ['cost_fraction'].sum(axis=0)
+        n = facility.comp_df[facility.comp_df['component_type'] == k]\
+            .index.size
+        comptype_value.append(v/n)
+
+    component_meanloss = \
+        component_response.query('response == "loss_mean"').\
         reset_index('response').drop('response', axis=1)
 
-# Read in the <SYSTEM FRAGILITY MODEL> fitted to simulated data
-system_fragility_mdl = \
-    pd.read_csv(os.path.join(OUTPUT_PATH, 'system_model_fragility.csv'),
-                index_col=0)
-
-system_fragility_mdl.index.name = "Damage States"
+    return {'comptype_resp_df': comptype_resp_df,
+            'ctype_failure_mean': ctype_failure_mean,
+            'cp_types_costed': cp_types_costed,
+            'cpmap': cpmap,
+            'comps_costed': comps_costed,
+            'comptype_value': comptype_value,
+            'component_response': component_response,
+            'component_meanloss': component_meanloss,
+            'comp_type_ds': sorted(list(
+                facility.fragility_data.index.
+                get_level_values('damage_state').unique()))}
 
-# Define the system as a network, with components as nodes
-# Network setup with igraph
 
-G = facility.network.G
-nodes_all = facility.network.nodes_all
-
-# -- END SETUP ---
-
-# ****************************************************************************
-# Configuration values that can be adjusted for specific scenarios:
-
-RST_THRESHOLD = 0.98
-
-# Restoration time starts x time units after hazard impact:
-# This represents lead up time for damage and safety assessments
-rst_offset = 1
-
-# Set weighting criteria for edges: 
-# This influences the path chosen for restoration
-# Options are: 
-#   [1] None
-#   [2] 'MIN_COST'
-#   [3] 'MIN_TIME'
-weight_criteria = 'MIN_COST'
-
-# ****************************************************************************
+def load_loss_analysis_data(scenario, facility):
+    """
+    Read the results of a run that the loss analysis depends on, once, so
+    that they can be reused for any number of scenario hazard values
+
+    :param scenario: scenario object, from sifraclasses
+    :param facility: facility object, from sifraclasses
+    :return: dict of the responses of the component types and components,
+             and the component lists of the facility, see
+             loss_analysis_data
+    """
+    haz_vals_str = [('%0.3f' % np.float(x))
+                    for x in scenario.hazard_intensity_vals]
+
+    # Read in SIMULATED HAZARD RESPONSE for <COMPONENT TYPES>
+    comptype_resp_df = \
+        pd.read_csv(os.path.join(scenario.output_path,
+                                 'comptype_response.csv'),
+                    index_col=['component_type', 'response'],
+                    skipinitialspace=True)
+    comptype_resp_df.columns = [haz_vals_str]
+
+    # Read in SIMULATED HAZARD RESPONSE - for <COMPONENT INSTANCES>
+    component_response = \
+        pd.read_csv(os.path.join(scenario.output_path,
+                                 'component_response.csv'),
+                    index_col=['component_id', 'response'],
+                    skiprows=0, skipinitialspace=True)
+
+    return loss_analysis_data(facility, comptype_resp_df, component_response)
 
-col_tp = []
-for h in SCENARIO_HAZARD_VALUES:
-    col_tp.extend(zip([h]*len(RESTORATION_STREAMS), RESTORATION_STREAMS))
-mcols = pd.MultiIndex.from_tuples(
-            col_tp, names=['Hazard', 'Restoration Streams'])
-line_rst_times_df = \
-    pd.DataFrame(index=facility.network.out_node_list, columns=mcols)
-line_rst_times_df.index.name = 'Output Lines'
+# ============================================================================
+# Scenario loss analysis
+# ============================================================================
 
+def analyse_scenario(results, facility, scenario, hazard, streams=None,
+                     draw_figures=True, write_outputs=True):
+    """
+    Loss and restoration analysis of the facility for a scenario hazard
+    value
+
+    :param results: results of the run, from loss_analysis_data
+    :param facility: facility object, from sifraclasses
+    :param scenario: scenario object, from sifraclasses
+    :param hazard: hazard intensity value of the scenario
+    :param streams: numbers of simultaneous repairs to evaluate, the
+                    restoration streams of the scenario if not given
+    :param draw_figures: draw the loss, restoration and criticality figures
+    :param write_outputs: write the restoration setup of each number of
+                          streams to the output path of the scenario
+    :return: dict with the 'component_fullrst_time' and the
+             'ctype_scenario_outcomes' (PANDAS dataframes), the
+             'rst_setup' and 'line_rst_times' of each number of streams,
+             and the 'line_rst_quantiles' of the sampled restoration
+             times of the lines, None unless RESTORATION_SAMPLES is set
+    """
+    if streams is None:
+        streams = scenario.restoration_streams
+    comptype_resp_df = results['comptype_resp_df']
+    out_node_list = facility.network.out_node_list
 
-for h in SCENARIO_HAZARD_VALUES:
-    sc_haz_val = h
-    sc_haz_val_str = '%0.3f' % np.float(sc_haz_val)
-    haztag = 'SC_'+('%0.2f' % np.float(sc_haz_val))+'g'
+    sc_haz_val_str = '%0.3f' % np.float(hazard)
+    haztag = 'SC_'+('%0.2f' % np.float(hazard))+'g'
 
     # -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- --
     # Extract scenario-specific values from the 'hazard response' dataframe
@@ -1197,100 +1267,224 @@ for h in SCENARIO_HAZARD_VALUES:
     ctype_resp_scenario = comptype_resp_df[sc_haz_val_str].unstack(level=-1)
     ctype_resp_scenario = ctype_resp_scenario.sort_index()
     ctype_resp_scenario['loss_per_type'] = \
-        ctype_resp_scenario['loss_mean']/comptype_value
+        ctype_resp_scenario['loss_mean']/results['comptype_value']
     ctype_resp_scenario = \
         ctype_resp_scenario.loc[ctype_resp_scenario['loss_per_type']>=0]
     ctype_resp_sorted = ctype_resp_scenario.sort_values(by=['loss_tot'],
                                                         ascending=[0])
 
-    ctype_loss_vals_tot = ctype_resp_sorted['loss_tot'].values * 100
-    ctype_loss_by_type = ctype_resp_sorted['loss_per_type'].values * 100
-    ctype_lossbytype_rank = \
-        len(ctype_loss_by_type) - \
-        stats.rankdata(ctype_loss_by_type, method='dense').astype(int)
-
-    # -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- --
-    # Economic loss percentage for component types
-
-    fig_name = 'fig_'+haztag+'_loss_sys_vs_comptype_v1.png'
-    draw_component_loss_barchart_v1(scenario,
-                                    ctype_loss_vals_tot,
-                                    ctype_loss_by_type,
-                                    ctype_lossbytype_rank,
-                                    sc_haz_val_str,
-                                    fig_name)
-
-    fig_name = 'fig_'+haztag+'_loss_sys_vs_comptype_v2.png'
-    draw_component_loss_barchart_v2(scenario,
-                                    ctype_loss_vals_tot,
-                                    ctype_loss_by_type,
-                                    sc_haz_val_str,
-                                    fig_name)
-
-    # -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- --
-    # Failure percentage of component types
-
-    figname = 'fig_'+haztag+'_comptype_failures.png'
-    draw_component_failure_barchart(uncosted_comptypes,
-                                    ctype_failure_mean,
-                                    sc_haz_val_str,
-                                    OUTPUT_PATH,
-                                    figname)
+    if draw_figures:
+        ctype_loss_vals_tot = ctype_resp_sorted['loss_tot'].values * 100
+        ctype_loss_by_type = ctype_resp_sorted['loss_per_type'].values * 100
+        ctype_lossbytype_rank = \
+            len(ctype_loss_by_type) - \
+            stats.rankdata(ctype_loss_by_type, method='dense').astype(int)
+
+        # Economic loss percentage for component types
+        draw_component_loss_barchart_v1(
+            scenario, ctype_resp_sorted, ctype_loss_vals_tot,
+            ctype_loss_by_type, ctype_lossbytype_rank, sc_haz_val_str,
+            'fig_'+haztag+'_loss_sys_vs_comptype_v1.png')
+        draw_component_loss_barchart_v2(
+            scenario, ctype_resp_sorted, ctype_loss_vals_tot,
+            ctype_loss_by_type, sc_haz_val_str,
+            'fig_'+haztag+'_loss_sys_vs_comptype_v2.png')
+
+        # Failure percentage of component types
+        draw_component_failure_barchart(
+            scenario, UNCOSTED_COMPTYPES, results['ctype_failure_mean'],
+            sc_haz_val_str, scenario.output_path,
+            'fig_'+haztag+'_comptype_failures.png')
 
     # -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- --
     # RESTORATION PROGNOSIS for specified scenarios
 
     component_fullrst_time, ctype_scenario_outcomes = \
-        calc_comptype_damage_scenario_given_hazard(facility,
-                                                   cp_types_costed,
-                                                   comptype_resp_df)
+        calc_comptype_damage_scenario_given_hazard(facility, scenario,
+                                                   results, hazard,
+                                                   ctype_resp_sorted)
 
     # All the nodes that need to be fixed for each output node:
     repair_list_combined = prep_repair_list(facility,
-                                            weight_criteria,
+                                            WEIGHT_CRITERIA,
                                             sc_haz_val_str,
-                                            component_meanloss,
+                                            results['component_meanloss'],
                                             component_fullrst_time)
 
     repair_path = copy.deepcopy(repair_list_combined)
 
-    for RS in RESTORATION_STREAMS:
-        rst_setup_df = calc_restoration_setup(
-            facility.network.out_node_list, repair_list_combined,
-            RS, rst_offset, sc_haz_val_str,
-            comps_costed, component_fullrst_time,
-            scenario.output_path,
-            haztag
-        )
+    rst_setup = calc_restoration_setup(
+        facility, out_node_list, repair_list_combined, repair_path,
+        streams, RST_OFFSET, sc_haz_val_str,
+        results['comps_costed'], component_fullrst_time,
+        results['component_meanloss'],
+        scenario.output_path if write_outputs else None,
+        haztag
+    )
 
-        rst_time_line, line_rst_times = vis_restoration_process(
-            scenario,
-            facility,
-            rst_setup_df,
-            RS,
-            repair_path,
-            haztag
-        )
+    line_rst_times = {}
+    for RS in streams:
+        if draw_figures:
+            rst_time_line, line_rst_times[RS] = vis_restoration_process(
+                scenario,
+                facility,
+                rst_setup[RS],
+                RS,
+                repair_path,
+                haztag
+            )
+        else:
+            line_rst_times[RS] = \
+                {onode: max(rst_setup[RS].loc[repair_path[onode]]['RstEnd'])
+                 for onode in out_node_list}
+
+    if draw_figures:
+        component_criticality(facility, scenario,
+                              ctype_scenario_outcomes,
+                              sc_haz_val_str,
+                              haztag)
+
+    # Distribution of the restoration times of the output lines
+    if scenario.restoration_samples > 0:
+        line_rst_quantiles = simulate_line_restoration(
+            facility, scenario, results, hazard, repair_list_combined,
+            component_fullrst_time, streams, scenario.restoration_samples)
+    else:
+        line_rst_quantiles = None
 
-        line_rst_times_df[(h, RS)] = \
-            [line_rst_times[x] for x in facility.network.out_node_list]
-        
-    # -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- --
+    return {'component_fullrst_time': component_fullrst_time,
+            'ctype_scenario_outcomes': ctype_scenario_outcomes,
+            'rst_setup': rst_setup,
+            'line_rst_times': line_rst_times,
+            'line_rst_quantiles': line_rst_quantiles}
 
-    component_criticality(facility, scenario,
-                          ctype_scenario_outcomes,
-                          sc_haz_val_str,
-                          haztag)
 
-    ##########################################################################
-    # --- END FOR LOOP ---
+def _init_analysis(results, facility, scenario, streams, draw_figures,
+                   write_outputs):
+    _analysis_state.update(results=results, facility=facility,
+                           scenario=scenario, streams=streams,
+                           draw_figures=draw_figures,
+                           write_outputs=write_outputs)
+
+
+def _analyse_hazard(hazard):
+    state = _analysis_state
+    return analyse_scenario(state['results'], state['facility'],
+                            state['scenario'], hazard, state['streams'],
+                            state['draw_figures'], state['write_outputs'])
+
+
+def analyse_scenarios(results, facility, scenario, hazards=None,
+                      streams=None, processes=None, draw_figures=True,
+                      write_outputs=True):
+    """
+    Loss and restoration analysis of the facility for a number of scenario
+    hazard values, analysed concurrently in a pool of processes
+
+    :param results: results of the run, from loss_analysis_data
+    :param facility: facility object, from sifraclasses
+    :param scenario: scenario object, from sifraclasses
+    :param hazards: hazard intensity values of the scenarios, the scenario
+                    hazard values of the scenario if not given
+    :param streams: numbers of simultaneous repairs to evaluate, the
+                    restoration streams of the scenario if not given
+    :param processes: number of processes, one per CPU if not given, the
+                      hazard values are analysed in turn if 1
+    :param draw_figures: draw the loss, restoration and criticality figures
+    :param write_outputs: write the restoration setup of each hazard value
+                          and number of streams
+    :return: (line_rst_times_df, analyses), the restoration times of the
+             output lines for each hazard value and number of streams
+             (PANDAS dataframe), and the list of the results of
+             analyse_scenario for each hazard value
+    """
+    if hazards is None:
+        hazards = scenario.scenario_hazard_values
+    if streams is None:
+        streams = scenario.restoration_streams
+    initargs = (results, facility, scenario, streams, draw_figures,
+                write_outputs)
+
+    if processes == 1 or len(hazards) == 1:
+        _init_analysis(*initargs)
+        analyses = [_analyse_hazard(h) for h in hazards]
+    else:
+        pool = Pool(processes, _init_analysis, initargs)
+        try:
+            analyses = pool.map(_analyse_hazard, hazards)
+        finally:
+            pool.close()
+            pool.join()
+
+    out_node_list = facility.network.out_node_list
+    col_tp = []
+    for h in hazards:
+        col_tp.extend(zip([h]*len(streams), streams))
+    mcols = pd.MultiIndex.from_tuples(
+                col_tp, names=['Hazard', 'Restoration Streams'])
+    line_rst_times_df = pd.DataFrame(index=out_node_list, columns=mcols)
+    line_rst_times_df.index.name = 'Output Lines'
+    for h, analysis in zip(hazards, analyses):
+        for RS in streams:
+            line_rst_times_df[(h, RS)] = \
+                [analysis['line_rst_times'][RS][x] for x in out_node_list]
+
+    return line_rst_times_df, analyses
+
+
+def write_line_restoration(scenario, line_rst_times_df, analyses):
+    """
+    Write the restoration prognosis of the output lines, and the
+    percentiles of their sampled restoration times if they were sampled
+
+    :param scenario: scenario object, from sifraclasses
+    :param line_rst_times_df: restoration times of the output lines, from
+                              analyse_scenarios
+    :param analyses: results of analyse_scenario for the scenario hazard
+                     values, from analyse_scenarios
+    :return: None
+    """
+    line_rst_times_csv = os.path.join(scenario.output_path,
+                                      'line_restoration_prognosis.csv')
+    line_rst_times_df.to_csv(line_rst_times_csv, sep=',')
+
+    if scenario.restoration_samples > 0:
+        line_rst_quantiles_df = pd.concat(
+            [analysis['line_rst_quantiles'] for analysis in analyses],
+            axis=1, keys=scenario.scenario_hazard_values,
+            names=['Hazard', 'Restoration Streams', 'Percentile'])
+        line_rst_quantiles_df.to_csv(
+            os.path.join(scenario.output_path,
+                         'line_restoration_quantiles.csv'), sep=',')
+
+# ============================================================================
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("setup_file",
+                        help="scenario configuration file")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="number of processes, one per CPU by default")
+    parser.add_argument("--no-figures", dest="draw_figures",
+                        action="store_false",
+                        help="only write the restoration prognosis")
+    args = parser.parse_args()
+
+    # Read in config file and define Scenario & Facility objects
+    scenario = Scenario(args.setup_file)
+    facility = load_facility(args.setup_file)
+
+    results = load_loss_analysis_data(scenario, facility)
+    line_rst_times_df, analyses = analyse_scenarios(
+        results, facility, scenario, processes=args.processes,
+        draw_figures=args.draw_figures)
+    write_line_restoration(scenario, line_rst_times_df, analyses)
 
-line_rst_times_csv = os.path.join(OUTPUT_PATH,
-                                  'line_restoration_prognosis.csv')
-line_rst_times_df.to_csv(line_rst_times_csv, sep=',')
+    print(Fore.YELLOW + "\nScenario loss analysis complete." + Fore.RESET)
+    print("Outputs saved in: \n" +
+          Fore.GREEN + scenario.output_path + Fore.RESET + '\n')
 
-##############################################################################
 
-print(Fore.YELLOW + "\nScenario loss analysis complete." + Fore.RESET)
-print("Outputs saved in: \n" +
-      Fore.GREEN + scenario.output_path + Fore.RESET + '\n')
\ No newline at end of file
+if __name__ == '__main__':
+    main()
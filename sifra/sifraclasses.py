@@ -20,6 +20,16 @@ import time
 
 # =============================================================================
 
+# Outputs that can be requested from a simulation:
+#   'loss'     - component and system economic loss
+#   'output'   - system output given the component damage
+#   'recovery' - system output and recovery time over the restoration period
+#   'plots'    - figures of the requested outputs, only gates the report
+#                stage, no simulation stage depends on it
+METRICS = ('loss', 'output', 'recovery', 'plots')
+
+# =============================================================================
+
 def _readfile(setup_file):
     """
     Module for reading in scenario data file
@@ -45,28 +55,39 @@ class _IoDataGetter(object):
     """
     Class for reading in scenario setup information
     """
-    def __init__(self, setup_file):
+    def __init__(self, setup_file, output_path=None, create_dirs=True):
         self.setup = _readfile(setup_file)
         self.input_dir_name = self.setup["INPUT_DIR_NAME"]
         self.output_dir_name = self.setup["OUTPUT_DIR_NAME"]
         self.sys_config_file_name = self.setup["SYS_CONF_FILE_NAME"]
         self.input_path = None
-        self.output_path = None
+        # an existing output path is given when resuming a run
+        self.output_path = output_path
         self.root_dir = os.path.dirname(
             os.path.dirname(os.path.abspath(__file__)))
         self.raw_output_dir = None
-        self.set_io_dirs()
-
-    def set_io_dirs(self):
+        self.set_io_dirs(create_dirs)
+        # Results of seeded runs are cached for reuse by identical runs
+        self.cache_dir = os.path.join(
+            self.root_dir, self.setup.get("CACHE_DIR", 'cache'))
+        self.cache_max_bytes = self.setup.get("CACHE_MAX_BYTES", 2 * 1024 ** 3)
+        # Chunk format of the results store of the run
+        self.results_format = self.setup.get("RESULTS_FORMAT", 'npz')
+
+    def set_io_dirs(self, create_dirs=True):
         self.input_path = os.path.join(self.root_dir,
                                        self.input_dir_name)
-        timestamp = time.strftime('_%Y%m%d_%H%M%S')
-        output_dir_timestamped = self.output_dir_name + timestamp
-        self.output_path = os.path.join(self.root_dir,
-                                        output_dir_timestamped)
+        if self.output_path is None:
+            timestamp = time.strftime('_%Y%m%d_%H%M%S')
+            output_dir_timestamped = self.output_dir_name + timestamp
+            self.output_path = os.path.join(self.root_dir,
+                                            output_dir_timestamped)
         self.raw_output_dir = os.path.join(self.output_path,
                                            'raw_output')
 
+        # a run that writes no outputs only names its directories
+        if not create_dirs:
+            return
         if not os.path.exists(self.output_path):
             os.makedirs(self.output_path)
         if not os.path.exists(self.raw_output_dir):
@@ -96,6 +117,34 @@ class _ScenarioDataGetter(object):
         self.restore_pct_chkpoints = self.setup["RESTORE_PCT_CHKPOINTS"]
         self.restore_time_max = self.setup["RESTORE_TIME_MAX"]
         self.restoration_streams = self.setup["RESTORATION_STREAMS"]
+        # Optional settings for the evaluation of output during recovery
+        self.recovery_mode = self.setup.get("RECOVERY_MODE", 'time_grid')
+        self.recovery_func_quantum = \
+            self.setup.get("RECOVERY_FUNC_QUANTUM", 0.01)
+        self.recovery_checkpoints = \
+            self.setup.get("RECOVERY_CHECKPOINTS", None)
+        self.recovery_threshold = self.setup.get("RECOVERY_THRESHOLD", 0.99)
+        self.recovery_time_tol = self.setup.get("RECOVERY_TIME_TOL", 0.01)
+        # The outputs to be calculated, unrequested stages are not run
+        self.requested_metrics = self.setup.get("REQUESTED_METRICS",
+                                                list(METRICS))
+        for metric in self.requested_metrics:
+            if metric not in METRICS:
+                raise ValueError("Unknown metric {}, the available metrics "
+                                 "are {}".format(metric, METRICS))
+        # Completed blocks of samples are saved so a run can be resumed
+        self.checkpoint = self.setup.get("CHECKPOINT", False)
+        self.sample_block_size = self.setup.get("SAMPLE_BLOCK_SIZE", None)
+        # Figures are rendered by a separate report stage after the run,
+        # which a headless run leaves to be run later
+        self.headless = self.setup.get("HEADLESS", False)
+        self.report_processes = self.setup.get("REPORT_PROCESSES", None)
+        # Per-sample responses exported as a Parquet table, needs pyarrow
+        self.export_event_table = self.setup.get("EXPORT_EVENT_TABLE", False)
+        # Bootstrap confidence intervals of the fitted models, none if 0
+        self.bootstrap_replicates = self.setup.get("BOOTSTRAP_REPLICATES", 0)
+        # Sampled restoration times of the output lines, none if 0
+        self.restoration_samples = self.setup.get("RESTORATION_SAMPLES", 0)
 
 
 class _RestorationDataGetter(object):
@@ -188,12 +237,13 @@ class _FacilityDataGetter(object):
 
 class _Network(object):
 
-    def __init__(self, facility):
+    def __init__(self, facility, draw_layout=True):
         self.num_elements, self.G, self.nodes_all = \
             self.return_network(facility)
 
         self.sup_node_list, self.dep_node_list, \
-        self.src_node_list, self.out_node_list = self.network_setup(facility)
+        self.src_node_list, self.out_node_list = \
+            self.network_setup(facility, draw_layout)
 
     @staticmethod
     def return_network(facility):
@@ -227,7 +277,7 @@ class _Network(object):
         return num_elements, G, nodes_all
 
     @staticmethod
-    def network_setup(facility):
+    def network_setup(facility, draw_layout=True):
         #                    --------
         # Network setup with NetworkX (for drawing graph)
         #                    --------
@@ -239,24 +289,26 @@ class _Network(object):
                        capacity=row['link_capacity'],
                        weight=row['weight'])
 
-        if facility.system_class.lower() in ['potablewatertreatmentplant']:
-            systemlayout.draw_sys_layout(
-                sys, comp_df,
-                out_dir=facility.output_path,
-                graph_label="Water Treatment Plant Component Layout",
-                orientation = "TB",
-                connector_type="ortho",
-                clustering=True
-            )
-        else:
-            systemlayout.draw_sys_layout(
-                sys, comp_df,
-                out_dir=facility.output_path,
-                graph_label="System Component Layout",
-                orientation="LR",
-                connector_type="spline",
-                clustering=False
-            )
+        # the layout is drawn into the output directory of the facility
+        if draw_layout:
+            if facility.system_class.lower() in ['potablewatertreatmentplant']:
+                systemlayout.draw_sys_layout(
+                    sys, comp_df,
+                    out_dir=facility.output_path,
+                    graph_label="Water Treatment Plant Component Layout",
+                    orientation = "TB",
+                    connector_type="ortho",
+                    clustering=True
+                )
+            else:
+                systemlayout.draw_sys_layout(
+                    sys, comp_df,
+                    out_dir=facility.output_path,
+                    graph_label="System Component Layout",
+                    orientation="LR",
+                    connector_type="spline",
+                    clustering=False
+                )
 
         # ---------------------------------------------------------------------
         # List of tagged nodes with special roles:
@@ -278,9 +330,15 @@ class FacilitySystem(_FacilityDataGetter, _IoDataGetter):
     Defines an Critical Infrastructure Facility and its parameters
     """
 
-    def __init__(self, setup_file):
+    def __init__(self, setup_file, write_outputs=True):
+        """
+        :param setup_file: Scenario setting values and the infrastructure
+                           configuration file path
+        :param write_outputs: Create the output directories and draw the
+                              layout of the system into them
+        """
         _FacilityDataGetter.__init__(self, setup_file)
-        _IoDataGetter.__init__(self, setup_file)
+        _IoDataGetter.__init__(self, setup_file, create_dirs=write_outputs)
         self.cp_types_in_system, self.cp_types_in_db = \
             self.check_types_with_db()
         self.uncosted_comptypes = \
@@ -294,7 +352,7 @@ class FacilitySystem(_FacilityDataGetter, _IoDataGetter):
         self.sys = self.build_system_model()
         self.fragdict = self.fragility_dict()
         self.compdict = self.comp_df.to_dict()
-        self.network = _Network(self)
+        self.network = _Network(self, draw_layout=write_outputs)
 
     def build_system_model(self):
         """
@@ -452,9 +510,21 @@ class Scenario(_ScenarioDataGetter, _IoDataGetter):
     Defines the scenario for hazard impact modelling
     """
 
-    def __init__(self, setup_file):
+    def __init__(self, setup_file, output_path=None, write_outputs=True):
+        """
+        :param setup_file: Scenario setting values and the infrastructure
+                           configuration file path
+        :param output_path: Output path of the run, a new timestamped
+                            directory if not given
+        :param write_outputs: Create the output directories of the run.
+                              A run that writes no outputs keeps no
+                              checkpoints and exports no event table.
+        """
         _ScenarioDataGetter.__init__(self, setup_file)
-        _IoDataGetter.__init__(self, setup_file)
+        _IoDataGetter.__init__(self, setup_file, output_path, write_outputs)
+        if not write_outputs:
+            self.checkpoint = False
+            self.export_event_table = False
 
         """Set up parameters for simulating hazard impact"""
         self.num_hazard_pts = \
@@ -469,7 +539,9 @@ class Scenario(_ScenarioDataGetter, _IoDataGetter):
 
         # Set up parameters for simulating recovery from hazard impact
         self.restoration_time_range, self.time_step = np.linspace(
-            0, self.restore_time_max, num=self.restore_time_max + 1,
+            0, self.restore_time_max,
+            num=int(round(self.restore_time_max /
+                          float(self.restore_time_step))) + 1,
             endpoint=True, retstep=True)
 
         self.num_time_steps = len(self.restoration_time_range)
@@ -645,8 +717,8 @@ class PowerStation(FacilitySystem):
     the Critical Infrastructure Facility class
     """
 
-    def __init__(self, setup_file):
-        super(PowerStation, self).__init__(setup_file)
+    def __init__(self, setup_file, write_outputs=True):
+        super(PowerStation, self).__init__(setup_file, write_outputs)
 
         self.asset_type = 'Power Station'
         self.name = ''
@@ -674,8 +746,9 @@ class PotableWaterTreatmentPlant(FacilitySystem):
     customising the Critical Infrastructure Facility class
     """
 
-    def __init__(self, setup_file):
-        super(PotableWaterTreatmentPlant, self).__init__(setup_file)
+    def __init__(self, setup_file, write_outputs=True):
+        super(PotableWaterTreatmentPlant, self).__init__(setup_file,
+                                                         write_outputs)
 
         self.asset_type = "Potable Water Treatment Plant"
         self.name = ''
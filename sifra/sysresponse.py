@@ -35,11 +35,13 @@ matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 
 from sifraclasses import *
+from results_store import open_results_store
+from box_summary import box_stats
+from fragility import damage_state_index, prob_exceedance, \
+    class_membership_matrix, class_damage_fraction, pe2pb
 
 import os
 import sys
-import cPickle
-import zipfile
 import logging
 
 import numpy as np
@@ -70,19 +72,33 @@ def cal_pe_ds(comp, PGA, compdict, fragdict, sc):
     :return:
     """
     ct = compdict['component_type'][comp]
+    return cal_pe_ds_by_type(ct, [PGA], fragdict, sc)[0]
+
+
+def cal_pe_ds_by_type(ct, hazard_vals, fragdict, sc):
+    """
+    Computes prob. of exceedence of the damage states of a component type,
+    for all the given hazard values at once
+    :param ct: component type
+    :param hazard_vals: hazard intensity values
+    :param fragdict:
+    :param sc:
+    :return: array of hazard values x damage states, sorted along the
+             damage states
+    """
     ds_list = sorted(fragdict['damage_median'][ct].keys())
     ds_list.remove('DS0 None')
-    pe_ds = np.zeros(len(ds_list))
+    PGA = np.asarray(hazard_vals, dtype=np.float64)
+    pe_ds = np.zeros((len(PGA), len(ds_list)))
 
     for i, ds in enumerate(ds_list):
         m = fragdict['damage_median'][ct][ds]
         b = fragdict['damage_logstd'][ct][ds]
         algo = fragdict['damage_function'][ct][ds].lower()
         mode = int(fragdict['mode'][ct][ds])
-        # pe_ds[i] = stats.lognorm.cdf(PGA,b,scale=m)
 
         if algo == 'lognormal' and mode == 1:
-            pe_ds[i] = stats.lognorm.cdf(PGA, b, scale=m)
+            pe_ds[:, i] = stats.lognorm.cdf(PGA, b, scale=m)
         elif algo == 'lognormal' and mode == 2:
             # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
             lower_lim = fragdict['minimum'][ct][ds]
@@ -101,12 +117,37 @@ def cal_pe_ds(comp, PGA, compdict, fragdict, sc):
             w1 = 0.5
             w2 = 0.5
             # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
-            pe_ds[i] = (
+            pe_ds[:, i] = (
                 w1 * stats.lognorm.cdf(PGA, s1, loc=0.0, scale=m) +
                 w2 * stats.lognorm.cdf(PGA, s2, loc=0.0, scale=m)
             ) * stepv
             # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
-    return np.sort(pe_ds)
+    return np.sort(pe_ds, axis=1)
+
+
+def calc_exp_damage_ratio(fc, sc):
+    """
+    Computes the expected damage ratio of each component at each hazard
+    value. The damage state probabilities are evaluated once for each
+    component type, for all hazard values together.
+    :param fc: Facility object, from sifraclasses
+    :param sc: Scenario object, from sifraclasses
+    :return: array of components x hazard values
+    """
+    comp_types = [fc.compdict['component_type'][comp_name]
+                  for comp_name in fc.network.nodes_all]
+    exp_damage_ratio_by_type = {}
+    for comp_type in set(comp_types):
+        pb = pe2pb(cal_pe_ds_by_type(comp_type, sc.hazard_intensity_vals,
+                                     fc.fragdict, sc))
+        dr = np.array([fc.fragdict['damage_ratio'][comp_type][ds]
+                       for ds in fc.sys_dmg_states])
+        exp_damage_ratio_by_type[comp_type] = np.dot(pb, dr)
+
+    cost_fractions = np.array([fc.compdict['cost_fraction'][comp_name]
+                               for comp_name in fc.network.nodes_all])
+    return cost_fractions[:, np.newaxis] * \
+        np.array([exp_damage_ratio_by_type[ct] for ct in comp_types])
 
 # ============================================================================
 
@@ -176,21 +217,6 @@ def compute_output_given_ds(cp_func, fc):
 # ============================================================================
 
 
-def pe2pb(pe):
-    """
-    Convert probablity of exceedence of damage states, to
-    probability of being in each discrete damage state
-    """
-    # sorted array: from max to min
-    pex = np.sort(pe)[::-1]
-    tmp = -1.0 * np.diff(pex)
-    pb = np.append(tmp, pex[-1])
-    pb = np.insert(pb, 0, 1 - pex[0])
-    return pb
-
-# ============================================================================
-
-
 def calc_sys_output(fc, sc):
     """
     Power output and economic loss calculations for each component
@@ -434,12 +460,17 @@ def plot_mean_econ_loss(fc, sc, economic_loss_array):
     #                                 markeredgecolor='salmon',
     #                                 markerfacecolor='salmon')
     #                 )
-    ax = sns.boxplot(economic_loss_array * 100, showmeans=True,
-                     linewidth=0.7, color='lightgrey',
-                     meanprops=dict(marker='s',
-                                    markeredgecolor='salmon',
-                                    markerfacecolor='salmon')
-                     )
+    ax = fig.add_subplot(111)
+    ax.bxp(box_stats(economic_loss_array * 100, axis=0),
+           showmeans=True, showfliers=False, patch_artist=True,
+           boxprops=dict(facecolor='lightgrey', linewidth=0.7),
+           whiskerprops=dict(linewidth=0.7),
+           capprops=dict(linewidth=0.7),
+           medianprops=dict(linewidth=0.7),
+           meanprops=dict(marker='s',
+                          markeredgecolor='salmon',
+                          markerfacecolor='salmon')
+           )
     sns.despine(top=True, left=True, right=True)
     ax.tick_params(axis='y', left='off', right='off')
     ax.yaxis.grid(True)
@@ -462,26 +493,22 @@ def post_processing(fc, sc, ids_comp_vs_haz, sys_output_dict,
                     economic_loss_array, output_array_given_recovery):
 
     # ------------------------------------------------------------------------
-    # 'ids_comp_vs_haz' is a dict of numpy arrays
-    # We pickle it for archival. But the file size can get very large.
-    # So we zip it for archival and delete the original
-    idshaz = os.path.join(sc.raw_output_dir, 'ids_comp_vs_haz.pickle')
-    with open(idshaz, 'w') as handle:
-        cPickle.dump(ids_comp_vs_haz, handle)
-
-    crd_pkl = os.path.join(sc.raw_output_dir, 'component_resp_dict.pickle')
-    with open(crd_pkl, 'w') as handle:
-        cPickle.dump(component_resp_dict, handle)
-
-    sod_pkl = os.path.join(sc.raw_output_dir, 'sys_output_dict.pickle')
-    with open(sod_pkl, 'w') as handle:
-        cPickle.dump(sys_output_dict, handle)
-
-    idshaz_zip = os.path.join(sc.raw_output_dir, 'ids_comp_vs_haz.zip')
-    zipmode = zipfile.ZIP_DEFLATED
-    with zipfile.ZipFile(idshaz_zip, 'w', zipmode) as zip:
-        zip.write(idshaz)
-    os.remove(idshaz)
+    # 'ids_comp_vs_haz' is a dict of numpy arrays, the results are kept
+    # in the results store of the run, one chunk per hazard level
+    results_store = open_results_store(sc)
+    results_store.write_metadata(
+        'component_types',
+        {comp_id: fc.compdict['component_type'][comp_id]
+         for comp_id in fc.network.nodes_all})
+    results_store.write_dict_by_hazard(
+        'ids_comp_vs_haz', ids_comp_vs_haz, 2,
+        axes=('sample', 'component', 'hazard'),
+        labels={'component': fc.network.nodes_all})
+    results_store.write_response_dict('component_resp_dict',
+                                      component_resp_dict,
+                                      axes=('component', 'response'))
+    results_store.write_response_dict('sys_output_dict', sys_output_dict,
+                                      axes=('output',))
 
     # ------------------------------------------------------------------------
     # System output file (for given hazard transfer parameter value)
@@ -540,20 +567,10 @@ def post_processing(fc, sc, ids_comp_vs_haz, sys_output_dict,
 
     # ------------------------------------------------------------------------
         # Calculating system fragility:
-    sys_frag = np.zeros_like(economic_loss_array, dtype=int)
-    for j in range(sc.num_hazard_pts):
-        for i in range(sc.num_samples):
-            # system output and economic loss
-            sys_frag[i, j] = np.sum(
-                economic_loss_array[i, j] > fc.dmg_scale_bounds
-            )
+    sys_frag = damage_state_index(economic_loss_array, fc.dmg_scale_bounds)
 
     # Calculating Probability of Exceedence:
-    pe_sys_econloss = np.zeros((len(fc.sys_dmg_states), sc.num_hazard_pts))
-    for j in range(sc.num_hazard_pts):
-        for i in range(len(fc.sys_dmg_states)):
-            pe_sys_econloss[i, j] = \
-                np.sum(sys_frag[:, j] >= i)/float(sc.num_samples)
+    pe_sys_econloss = prob_exceedance(sys_frag, len(fc.sys_dmg_states))
 
     # ------------------------------------------------------------------------
     # For Probability of Exceedence calculations based on component failures
@@ -590,44 +607,32 @@ def post_processing(fc, sc, ids_comp_vs_haz, sys_output_dict,
             [x for x in cp_classes_in_system if x not in uncosted_classes]
 
         # --- System fragility - Based on Failure of Component Classes ---
-        comp_class_failures = \
-            {cc: np.zeros((sc.num_samples, sc.num_hazard_pts))
-             for cc in cp_classes_costed}
-
-        comp_class_frag = {cc: np.zeros((sc.num_samples, sc.num_hazard_pts))
-                           for cc in cp_classes_costed}
-        for j, PGA in enumerate(sc.hazard_intensity_str):
-            for i in range(sc.num_samples):
-                for compclass in cp_classes_costed:
-                    for c in cp_class_map[compclass]:
-                        comp_class_failures[compclass][i, j] += \
-                            ids_comp_vs_haz[PGA][
-                                i, fc.network.node_map[c]
-                            ]
-                    comp_class_failures[compclass][i, j] /= \
-                        len(cp_class_map[compclass])
-
-                    comp_class_frag[compclass][i, j] = \
-                        np.sum(comp_class_failures[compclass][i, j]
-                               > ds_lims_compclasses[compclass])
+        # damage states of samples x components x hazards
+        ids_tensor = np.dstack([ids_comp_vs_haz[PGA]
+                                for PGA in sc.hazard_intensity_str])
+        class_membership = class_membership_matrix(
+            [[fc.network.nodes_all.index(c) for c in cp_class_map[cc]]
+             for cc in cp_classes_costed],
+            ids_tensor.shape[1])
+        comp_class_failures = class_damage_fraction(ids_tensor,
+                                                    class_membership)
+
+        comp_class_frag = \
+            {cc: damage_state_index(comp_class_failures[k],
+                                    ds_lims_compclasses[cc])
+             for k, cc in enumerate(cp_classes_costed)}
 
         # Probability of Exceedence -- Based on Failure of Component Classes
-        pe_sys_cpfailrate = np.zeros(
-            (len(fc.sys_dmg_states), sc.num_hazard_pts)
-        )
-        for p in range(sc.num_hazard_pts):
-            for d in range(len(fc.sys_dmg_states)):
-                ds_ss_ix = []
-                for compclass in cp_classes_costed:
-                    ds_ss_ix.append(
-                        np.sum(comp_class_frag[compclass][:, p] >= d) /
-                        float(sc.num_samples)
-                    )
-                pe_sys_cpfailrate[d, p] = np.median(ds_ss_ix)
-
-        # --- Save prob exceedance data as npy ---
-        np.save(os.path.join(sc.raw_output_dir, 'pe_sys_cpfailrate.npy'),
-                pe_sys_cpfailrate)
+        pe_sys_cpfailrate = np.median(
+            [prob_exceedance(comp_class_frag[cc], len(fc.sys_dmg_states))
+             for cc in cp_classes_costed],
+            axis=0)
+
+        # --- Save prob exceedance data ---
+        results_store.write_by_hazard('pe_sys_cpfailrate', pe_sys_cpfailrate,
+                                      sc.hazard_intensity_str, 1,
+                                      axes=('damage_state', 'hazard'),
+                                      labels={'damage_state': fc.sys_dmg_states})
 
     # ------------------------------------------------------------------------
 
@@ -650,20 +655,8 @@ def post_processing(fc, sc, ids_comp_vs_haz, sys_output_dict,
     # Validate damage ratio of the system
     # ------------------------------------------------------------------------
 
-    exp_damage_ratio = np.zeros((len(fc.network.nodes_all),
-                                 sc.num_hazard_pts))
-    for l, PGA in enumerate(sc.hazard_intensity_vals):
-        # compute expected damage ratio
-        for j, comp_name in enumerate(fc.network.nodes_all):
-            pb = pe2pb(
-                cal_pe_ds(comp_name, PGA, fc.compdict, fc.fragdict, sc)
-            )
-            comp_type = fc.compdict['component_type'][comp_name]
-            dr = np.array([fc.fragdict['damage_ratio'][comp_type][ds]
-                           for ds in fc.sys_dmg_states])
-            cf = fc.compdict['cost_fraction'][comp_name]
-            loss_list = dr * cf
-            exp_damage_ratio[j, l] = np.sum(pb * loss_list)
+    # components x hazard values
+    exp_damage_ratio = calc_exp_damage_ratio(fc, sc)
 
     # ------------------------------------------------------------------------
     # Time to Restoration of Full Capacity
@@ -769,43 +762,40 @@ def post_processing(fc, sc, ids_comp_vs_haz, sys_output_dict,
     # *** Saving vars ***
     # ------------------------------------------------------------------------
 
-    if sc.save_vars_npy:
+    hazards = sc.hazard_intensity_str
 
-        np.save(
-            os.path.join(sc.raw_output_dir, 'economic_loss_array.npy'),
-            economic_loss_array
-        )
+    # the expected damage ratios are small, components x hazards,
+    # and are saved with every run
+    results_store.write_by_hazard(
+        'exp_damage_ratio', exp_damage_ratio, hazards, 1,
+        axes=('component', 'hazard'),
+        labels={'component': fc.network.nodes_all})
 
-        np.save(
-            os.path.join(sc.raw_output_dir, 'calculated_output_array.npy'),
-            calculated_output_array
-        )
+    if sc.save_vars_npy:
 
-        np.save(
-            os.path.join(sc.raw_output_dir,
-                         'output_array_given_recovery.npy'),
-            output_array_given_recovery
-        )
+        results_store.write_by_hazard('economic_loss_array',
+                                      economic_loss_array, hazards, 1,
+                                      axes=('sample', 'hazard'))
 
-        np.save(
-            os.path.join(sc.raw_output_dir, 'exp_damage_ratio.npy'),
-            exp_damage_ratio
-        )
+        results_store.write_by_hazard('calculated_output_array',
+                                      calculated_output_array, hazards, 1,
+                                      axes=('sample', 'hazard'))
 
-        np.save(
-            os.path.join(sc.raw_output_dir, 'sys_frag.npy'),
-            sys_frag
-        )
+        results_store.write_by_hazard(
+            'output_array_given_recovery', output_array_given_recovery,
+            hazards, 1, axes=('sample', 'hazard', 'time'),
+            labels={'time': sc.restoration_time_range.tolist()})
 
-        np.save(
-            os.path.join(sc.raw_output_dir, 'required_time.npy'),
-            required_time
-        )
+        results_store.write_by_hazard('sys_frag', sys_frag, hazards, 1,
+                                      axes=('sample', 'hazard'))
 
-        np.save(
-            os.path.join(sc.raw_output_dir, 'pe_sys_econloss.npy'),
-            pe_sys_econloss
-        )
+        results_store.write_by_hazard('required_time', required_time,
+                                      hazards, 0, axes=('hazard',))
+
+        results_store.write_by_hazard(
+            'pe_sys_econloss', pe_sys_econloss, hazards, 1,
+            axes=('damage_state', 'hazard'),
+            labels={'damage_state': fc.sys_dmg_states})
     # ------------------------------------------------------------------------
         logging.info("\nOutputs saved in: " +
                      Fore.GREEN + sc.output_path + Fore.RESET + '\n')
@@ -0,0 +1,51 @@
+import unittest
+
+import numpy as np
+
+from box_summary import box_stats, box_stats_array, box_stats_from_array
+
+
+class TestBoxStats(unittest.TestCase):
+    def test_columns(self):
+        prng = np.random.RandomState(7)
+        values = prng.lognormal(size=(1000, 4))
+        stats = box_stats(values, axis=0, labels=['a', 'b', 'c', 'd'])
+
+        self.assertEqual(len(stats), 4)
+        for j, col_stats in enumerate(stats):
+            column = values[:, j]
+            q1, med, q3 = np.percentile(column, [25, 50, 75])
+            iqr = q3 - q1
+            self.assertEqual(col_stats['label'], 'abcd'[j])
+            self.assertAlmostEqual(col_stats['q1'], q1)
+            self.assertAlmostEqual(col_stats['med'], med)
+            self.assertAlmostEqual(col_stats['q3'], q3)
+            self.assertAlmostEqual(col_stats['mean'], np.mean(column))
+            self.assertAlmostEqual(
+                col_stats['whislo'], np.min(column[column >= q1 - 1.5 * iqr]))
+            self.assertAlmostEqual(
+                col_stats['whishi'], np.max(column[column <= q3 + 1.5 * iqr]))
+
+    def test_sample_axis(self):
+        values = np.arange(30, dtype=float).reshape(3, 10)
+        stats = box_stats(values, axis=1)
+        self.assertEqual(len(stats), 3)
+        self.assertEqual([s['med'] for s in stats], [4.5, 14.5, 24.5])
+        self.assertEqual([s['whislo'] for s in stats], [0.0, 10.0, 20.0])
+        self.assertEqual([s['whishi'] for s in stats], [9.0, 19.0, 29.0])
+
+    def test_array_round_trip(self):
+        prng = np.random.RandomState(3)
+        stats = box_stats(prng.normal(size=(200, 5)), axis=0)
+        stats_array = box_stats_array(stats)
+        self.assertEqual(stats_array.shape, (6, 5))
+
+        rebuilt = box_stats_from_array(stats_array, labels=list('vwxyz'))
+        for box, rebuilt_box in zip(stats, rebuilt):
+            for statistic in ('whislo', 'q1', 'med', 'q3', 'whishi', 'mean'):
+                self.assertEqual(rebuilt_box[statistic], box[statistic])
+        self.assertEqual([box['label'] for box in rebuilt], list('vwxyz'))
+
+
+if __name__ == '__main__':
+    unittest.main()
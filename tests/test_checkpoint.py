@@ -0,0 +1,68 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from checkpoint import Checkpoint
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.raw_output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.raw_output_dir)
+
+    def test_missing_block(self):
+        checkpoint = Checkpoint(self.raw_output_dir)
+        self.assertIsNone(checkpoint.load(0.1, 0))
+
+    def test_save_and_load(self):
+        checkpoint = Checkpoint(self.raw_output_dir)
+        results = (np.arange(6).reshape(3, 2), np.ones(3))
+        checkpoint.save(0.1, 2, results)
+
+        loaded = checkpoint.load(0.1, 2)
+        self.assertEqual(len(loaded), 2)
+        self.assertTrue(np.array_equal(loaded[0], results[0]))
+        self.assertTrue(np.array_equal(loaded[1], results[1]))
+        # other blocks and hazard levels are not affected
+        self.assertIsNone(checkpoint.load(0.1, 1))
+        self.assertIsNone(checkpoint.load(0.2, 2))
+        # no temporary files are left behind
+        self.assertEqual(os.listdir(checkpoint.checkpoint_dir),
+                         [os.path.basename(checkpoint.block_path(0.1, 2))])
+
+    def test_resume(self):
+        results = (np.arange(6).reshape(3, 2), np.ones(3))
+        Checkpoint(self.raw_output_dir, 'run_a').save(0.1, 0, results)
+
+        # a resumed run with the same hash loads the saved blocks
+        resumed = Checkpoint(self.raw_output_dir, 'run_a')
+        loaded = resumed.load(0.1, 0)
+        self.assertTrue(np.array_equal(loaded[0], results[0]))
+        self.assertTrue(np.array_equal(loaded[1], results[1]))
+        self.assertEqual(resumed.saved_key(), 'run_a')
+
+    def test_key_mismatch(self):
+        results = (np.arange(6).reshape(3, 2), np.ones(3))
+        Checkpoint(self.raw_output_dir, 'run_a').save(0.1, 0, results)
+
+        # the blocks of a run with another model or scenario are discarded
+        checkpoint = Checkpoint(self.raw_output_dir, 'run_b')
+        self.assertIsNone(checkpoint.load(0.1, 0))
+        self.assertEqual(checkpoint.saved_key(), 'run_b')
+        self.assertEqual(os.listdir(checkpoint.checkpoint_dir),
+                         [Checkpoint.KEY_FILE_NAME])
+
+    def test_remove(self):
+        checkpoint = Checkpoint(self.raw_output_dir, 'run_a')
+        checkpoint.save(0.1, 0, (np.ones(3),))
+        checkpoint.remove()
+        self.assertFalse(os.path.exists(checkpoint.checkpoint_dir))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from event_table import EventTableWriter, pq
+
+
+@unittest.skipIf(pq is None, "pyarrow is not installed")
+class TestEventTable(unittest.TestCase):
+    def setUp(self):
+        self.out_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.out_dir, 'event_table.parquet')
+
+    def tearDown(self):
+        shutil.rmtree(self.out_dir)
+
+    def test_row_group_per_hazard(self):
+        prng = np.random.RandomState(5)
+        hazards = [0.1, 0.2, 0.3]
+        loss = prng.uniform(size=(8, 3))
+        output = prng.uniform(size=(8, 3, 2))
+        recovery = prng.uniform(size=(8, 3))
+
+        with EventTableWriter(self.path, ['gen_1', 'gen_2']) as writer:
+            for j, hazard in enumerate(hazards):
+                writer.write_hazard(hazard, loss[:, j], output[:, j, :],
+                                    recovery[:, j])
+
+        parquet_file = pq.ParquetFile(self.path)
+        self.assertEqual(parquet_file.metadata.num_row_groups, 3)
+        self.assertEqual(parquet_file.schema.names,
+                         ['hazard', 'sample', 'economic_loss',
+                          'output_gen_1', 'output_gen_2', 'recovery_time'])
+
+        table = parquet_file.read_row_group(1).to_pandas()
+        self.assertTrue(np.all(table['hazard'] == 0.2))
+        self.assertEqual(table['sample'].tolist(), list(range(8)))
+        self.assertTrue(np.allclose(table['economic_loss'], loss[:, 1]))
+        self.assertTrue(np.allclose(table['output_gen_2'], output[:, 1, 1]))
+        self.assertTrue(np.allclose(table['recovery_time'], recovery[:, 1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+
+import numpy as np
+from scipy import stats
+
+from fragility import damage_state_index
+from fit_bootstrap import resample_exceedance_counts, bootstrap_fragility, \
+    restoration_profiles
+
+
+class TestFitBootstrap(unittest.TestCase):
+    def setUp(self):
+        prng = np.random.RandomState(21)
+        self.hazard_vals = np.linspace(0.05, 1.5, 30)
+        self.bounds = [0.01, 0.15, 0.4, 0.8]
+        # losses that grow with the hazard intensity
+        self.loss = stats.norm.cdf(
+            np.log(self.hazard_vals / 0.5) / 0.5
+            + prng.normal(0, 1, size=(400, 30)))
+        self.sys_frag = damage_state_index(self.loss, self.bounds)
+
+    def test_resampled_counts(self):
+        counts = resample_exceedance_counts(self.sys_frag, 5, 50,
+                                            np.random.RandomState(3))
+        self.assertEqual(counts.shape, (50, 5, 30))
+        self.assertTrue(np.all(counts[:, 0, :] == 400))
+        self.assertTrue(np.all(np.diff(counts, axis=1) <= 0))
+
+    def test_fragility_percentiles(self):
+        median_pct, logstd_pct = bootstrap_fragility(
+            self.hazard_vals, self.sys_frag, 5, num_replicates=40,
+            processes=1, seed=5)
+        self.assertEqual(median_pct.shape, (3, 4))
+        self.assertEqual(logstd_pct.shape, (3, 4))
+        self.assertTrue(np.all(np.diff(median_pct, axis=0) >= 0))
+        self.assertTrue(np.all(np.diff(logstd_pct, axis=0) >= 0))
+
+    def test_fragility_process_pool(self):
+        # the replicates are drawn before they are split into blocks, so a
+        # seeded bootstrap does not depend on the number of processes
+        serial = bootstrap_fragility(self.hazard_vals, self.sys_frag, 5,
+                                     num_replicates=20, processes=1, seed=5)
+        pooled = bootstrap_fragility(self.hazard_vals, self.sys_frag, 5,
+                                     num_replicates=20, processes=2, seed=5)
+        for serial_pct, pooled_pct in zip(serial, pooled):
+            self.assertTrue(np.allclose(serial_pct, pooled_pct))
+
+    def test_restoration_profiles(self):
+        prng = np.random.RandomState(9)
+        output = prng.uniform(size=(400, 30, 6))
+        weights = np.ones((1, 30, 400))
+        profiles = restoration_profiles(weights, self.sys_frag, output,
+                                        2.0, 5)
+        for ds in range(5):
+            expected = np.nanmean(
+                [np.mean(output[self.sys_frag[:, j] == ds, j, :], axis=0)
+                 if np.any(self.sys_frag[:, j] == ds)
+                 else np.full(6, np.nan)
+                 for j in range(30)], axis=0) / 2.0
+            self.assertTrue(np.allclose(profiles[0, ds], expected,
+                                        equal_nan=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
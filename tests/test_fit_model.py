@@ -0,0 +1,47 @@
+import matplotlib
+matplotlib.use('Agg')
+
+import unittest
+
+import numpy as np
+
+from fit_model import mean_restoration_profile, has_recovery_output
+
+
+class TestRestorationProfile(unittest.TestCase):
+    def test_mean_restoration_profile(self):
+        prng = np.random.RandomState(2)
+        sys_frag = prng.randint(0, 4, size=(50, 6))
+        output = prng.uniform(size=(50, 6, 8))
+        profile = mean_restoration_profile(sys_frag, output, 2.0, 5)
+        self.assertEqual(profile.shape, (5, 8))
+        # no sample is in the last damage state
+        self.assertTrue(np.all(np.isnan(profile[4])))
+        expected = np.mean(
+            [np.mean(output[sys_frag[:, j] == 1, j, :], axis=0)
+             for j in range(6)], axis=0) / 2.0
+        self.assertTrue(np.allclose(profile[1], expected))
+
+    def test_chunks_of_hazard_levels(self):
+        prng = np.random.RandomState(4)
+        sys_frag = prng.randint(0, 4, size=(50, 6))
+        output = prng.uniform(size=(50, 6, 8))
+        profile = mean_restoration_profile(
+            sys_frag, (output[:, j, :] for j in range(6)), 2.0, 5)
+        self.assertTrue(np.allclose(
+            profile, mean_restoration_profile(sys_frag, output, 2.0, 5),
+            equal_nan=True))
+
+    def test_no_recovery_output(self):
+        # the output during recovery has no time steps in the 'direct'
+        # recovery mode
+        sys_frag = np.zeros((50, 6), dtype=int)
+        output = np.zeros((50, 6, 0))
+        self.assertFalse(has_recovery_output(output))
+        self.assertFalse(has_recovery_output(None))
+        with self.assertRaises(ValueError):
+            mean_restoration_profile(sys_frag, output, 2.0, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import unittest
+
+import numpy as np
+
+from fragility import damage_state_index, prob_exceedance, \
+    class_membership_matrix, class_damage_fraction, pe2pb, \
+    exceedance_counts, damage_state_mean
+
+
+class TestFragility(unittest.TestCase):
+    def setUp(self):
+        prng = np.random.RandomState(123)
+        self.loss = prng.uniform(size=(500, 6))
+        self.bounds = [0.01, 0.15, 0.4, 0.8, 1.0]
+        self.num_damage_states = 5
+
+    def test_damage_state_index(self):
+        sys_frag = damage_state_index(self.loss, self.bounds)
+        for j in range(self.loss.shape[1]):
+            for i in range(self.loss.shape[0]):
+                self.assertEqual(sys_frag[i, j],
+                                 np.sum(self.loss[i, j] > self.bounds))
+
+    def test_values_on_bounds(self):
+        values = np.array([[0.0, 0.15, 0.150001, 1.0]])
+        self.assertEqual(damage_state_index(values, self.bounds).tolist(),
+                         [[0, 1, 2, 4]])
+
+    def test_prob_exceedance(self):
+        sys_frag = damage_state_index(self.loss, self.bounds)
+        pe = prob_exceedance(sys_frag, self.num_damage_states)
+
+        num_samples, num_hazard_pts = self.loss.shape
+        expected = np.zeros((self.num_damage_states, num_hazard_pts))
+        for j in range(num_hazard_pts):
+            for i in range(self.num_damage_states):
+                expected[i, j] = \
+                    np.sum(sys_frag[:, j] >= i) / float(num_samples)
+
+        self.assertTrue(np.allclose(pe, expected))
+
+    def test_exceedance_counts(self):
+        sys_frag = damage_state_index(self.loss, self.bounds)
+        counts = exceedance_counts(sys_frag, self.num_damage_states)
+        self.assertTrue(np.all(counts[0] == self.loss.shape[0]))
+        for i in range(self.num_damage_states):
+            self.assertTrue(np.array_equal(counts[i],
+                                           np.sum(sys_frag >= i, axis=0)))
+
+    def test_class_damage_fraction(self):
+        prng = np.random.RandomState(42)
+        ids_tensor = prng.randint(0, 5, size=(50, 7, 3))
+        class_members = [[0, 3], [1, 2, 6], [5]]
+        membership = class_membership_matrix(class_members, 7)
+        class_failures = class_damage_fraction(ids_tensor, membership)
+
+        self.assertEqual(class_failures.shape, (3, 50, 3))
+        for k, columns in enumerate(class_members):
+            for j in range(3):
+                for i in range(50):
+                    expected = np.sum(ids_tensor[i, columns, j]) \
+                        / float(len(columns))
+                    self.assertAlmostEqual(class_failures[k, i, j], expected)
+
+    def test_pe2pb(self):
+        prng = np.random.RandomState(8)
+        pe = prng.uniform(size=(4, 6, 3))
+        pb = pe2pb(pe, axis=1)
+        self.assertEqual(pb.shape, (4, 7, 3))
+        self.assertTrue(np.allclose(np.sum(pb, axis=1), 1.0))
+        for i in range(4):
+            for k in range(3):
+                pex = np.sort(pe[i, :, k])[::-1]
+                expected = np.concatenate(([1 - pex[0]], -np.diff(pex),
+                                           [pex[-1]]))
+                self.assertTrue(np.allclose(pb[i, :, k], expected))
+
+    def test_pe2pb_single(self):
+        self.assertTrue(np.allclose(pe2pb([0.2, 0.9, 0.5]),
+                                    [0.1, 0.4, 0.3, 0.2]))
+
+    def test_damage_state_mean(self):
+        prng = np.random.RandomState(17)
+        ds_index = prng.randint(0, 4, size=200)
+        values = prng.uniform(size=(200, 9))
+        means = damage_state_mean(ds_index, values, 5)
+        self.assertEqual(means.shape, (5, 9))
+        for ds in range(4):
+            self.assertTrue(np.allclose(means[ds],
+                                        np.mean(values[ds_index == ds],
+                                                axis=0)))
+        # no samples are in the last damage state
+        self.assertTrue(np.all(np.isnan(means[4])))
+
+    def test_weighted_damage_state_mean(self):
+        prng = np.random.RandomState(18)
+        ds_index = prng.randint(0, 3, size=50)
+        values = prng.uniform(size=(50, 4))
+        weights = prng.randint(0, 3, size=(6, 50))
+        means = damage_state_mean(ds_index, values, 3, weights)
+        self.assertEqual(means.shape, (6, 3, 4))
+        for r in range(6):
+            for ds in range(3):
+                in_state = ds_index == ds
+                expected = np.average(values[in_state], axis=0,
+                                      weights=weights[r, in_state])
+                self.assertTrue(np.allclose(means[r, ds], expected))
+
+
+if __name__ == '__main__':
+    unittest.main()
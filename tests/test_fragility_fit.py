@@ -0,0 +1,82 @@
+import unittest
+
+import numpy as np
+from scipy import stats
+
+from fragility_fit import probit_estimates, fit_fragility_curves, \
+    fit_fragility_portfolio, fit_fragility_mle
+
+
+class TestFragilityFit(unittest.TestCase):
+    def setUp(self):
+        self.hazard_vals = np.linspace(0.0, 1.5, 31)
+        self.medians = np.array([0.2, 0.45, 0.7, 1.1])
+        self.logstd = 0.4
+        self.logstds = np.array([0.4, 0.3, 0.5, 0.35])
+        self.pe = stats.lognorm.cdf(self.hazard_vals[np.newaxis, :],
+                                    self.logstd,
+                                    scale=self.medians[:, np.newaxis])
+
+    def test_probit_estimates(self):
+        medians, logstds = probit_estimates(self.hazard_vals, self.pe)
+        self.assertTrue(np.allclose(medians, self.medians, rtol=1e-3))
+        self.assertTrue(np.allclose(logstds, self.logstd, rtol=1e-3))
+
+    def test_joint_fit(self):
+        prng = np.random.RandomState(1)
+        noisy_pe = np.clip(self.pe + prng.normal(0, 0.01, self.pe.shape),
+                           0.0, 1.0)
+        medians, logstds, chisqr = fit_fragility_curves(self.hazard_vals,
+                                                        noisy_pe)
+        self.assertTrue(np.allclose(medians, self.medians, rtol=0.05))
+        self.assertTrue(np.allclose(logstds, self.logstd, atol=0.05))
+        self.assertEqual(chisqr.shape, (4,))
+
+    def test_logstd_per_damage_state(self):
+        pe = stats.lognorm.cdf(self.hazard_vals[np.newaxis, :],
+                               self.logstds[:, np.newaxis],
+                               scale=self.medians[:, np.newaxis])
+        medians, logstds, _ = fit_fragility_curves(self.hazard_vals, pe)
+        self.assertTrue(np.allclose(medians, self.medians, rtol=1e-3))
+        self.assertTrue(np.allclose(logstds, self.logstds, rtol=1e-3))
+
+    def test_ordered_medians(self):
+        # the data of the two upper damage states are swapped, the fitted
+        # medians still increase with the damage state
+        swapped_pe = self.pe[[0, 1, 3, 2], :]
+        medians, _, _ = fit_fragility_curves(self.hazard_vals,
+                                             swapped_pe)
+        self.assertTrue(np.all(np.diff(medians) >= 0))
+
+    def test_portfolio(self):
+        fits = fit_fragility_portfolio(self.hazard_vals,
+                                       [self.pe, self.pe[:2]])
+        self.assertEqual(len(fits), 2)
+        self.assertEqual(len(fits[1][0]), 2)
+
+    def test_mle(self):
+        prng = np.random.RandomState(4)
+        num_samples = 2000
+        num_exceed = prng.binomial(num_samples, self.pe)
+        medians, logstds, median_se, logstd_se = fit_fragility_mle(
+            self.hazard_vals, num_exceed, num_samples)
+        # the estimates are within a few standard errors of the truth
+        self.assertTrue(np.all(np.abs(medians - self.medians)
+                               < 4 * median_se))
+        self.assertTrue(np.all(np.abs(logstds - self.logstd)
+                               < 4 * logstd_se))
+        self.assertTrue(np.all(median_se > 0))
+        self.assertTrue(np.all(median_se < 0.05))
+
+    def test_mle_unidentifiable(self):
+        num_exceed = np.zeros((2, len(self.hazard_vals)))
+        num_exceed[0] = np.round(1000 * self.pe[0])
+        medians, logstds, _, _ = fit_fragility_mle(
+            self.hazard_vals, num_exceed, 1000)
+        self.assertTrue(np.isfinite(medians[0]))
+        self.assertTrue(np.isnan(medians[1]))
+        self.assertTrue(np.isnan(logstds[1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
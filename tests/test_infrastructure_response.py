@@ -0,0 +1,140 @@
+import matplotlib
+matplotlib.use('Agg')
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from model_ingest import ingest_spreadsheet
+from sifraclasses import Scenario
+from infrastructure_response import calculate_response, post_processing, \
+    loss_by_comp_type
+from event_table import EVENT_TABLE_FILE_NAME, pq
+
+config_file = '../tests/test_identical_comps.conf'
+
+
+class TestRequestedMetrics(unittest.TestCase):
+    def setUp(self):
+        self.output_path = tempfile.mkdtemp()
+        self.scenario = Scenario(config_file, self.output_path)
+        self.scenario.num_samples = 20
+        self.scenario.run_parallel_proc = 0
+        self.scenario.checkpoint = False
+        self.infrastructure = ingest_spreadsheet(config_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.output_path)
+
+    def test_loss_only(self):
+        self.scenario.requested_metrics = ['loss']
+        response_list = calculate_response(self.scenario, self.infrastructure)
+
+        num_hazards = self.scenario.num_hazard_pts
+        # the output and recovery stages are skipped
+        self.assertEqual(response_list[5].shape,
+                         (self.scenario.num_samples, num_hazards, 0))
+        self.assertEqual(response_list[8].shape,
+                         (self.scenario.num_samples, num_hazards, 0))
+        for hazard_str in self.scenario.hazard_intensity_str:
+            self.assertEqual(response_list[1][hazard_str], {})
+            self.assertEqual(sorted(response_list[7][hazard_str].keys()),
+                             ['economic_loss'])
+        self.assertEqual(response_list[4].shape,
+                         (self.scenario.num_samples, num_hazards))
+
+        post_processing(self.infrastructure, self.scenario, response_list)
+        output_files = os.listdir(self.output_path)
+        self.assertIn('comptype_response.csv', output_files)
+        self.assertNotIn('system_output_vs_haz_intensity.csv', output_files)
+
+
+class TestLossByCompType(unittest.TestCase):
+    def setUp(self):
+        self.output_path = tempfile.mkdtemp()
+        self.scenario = Scenario(config_file, self.output_path)
+        self.scenario.num_samples = 20
+        self.scenario.run_parallel_proc = 0
+        self.scenario.checkpoint = False
+        self.scenario.requested_metrics = ['loss']
+        self.infrastructure = ingest_spreadsheet(config_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.output_path)
+
+    def test_grouped_reduction_matches_loop(self):
+        # give one of the costed components a type of its own
+        type_index = self.infrastructure.get_component_type_index()
+        single_comp_id = type_index[sorted(type_index.keys())[0]][-1]
+        self.infrastructure.components[single_comp_id].component_type = \
+            'SINGLE COMPONENT TYPE'
+        type_index = self.infrastructure.get_component_type_index()
+        self.assertEqual(type_index['SINGLE COMPONENT TYPE'],
+                         [single_comp_id])
+
+        response_list = calculate_response(self.scenario, self.infrastructure)
+        loss_by_comp_type(response_list, self.infrastructure, self.scenario)
+        comptype_resp_df = pd.read_csv(
+            os.path.join(self.output_path, 'comptype_response.csv'),
+            index_col=[0, 1])
+
+        component_resp_dict = response_list[2]
+        for component_type, comp_ids in type_index.items():
+            for hazard_str in self.scenario.hazard_intensity_str:
+                resp = component_resp_dict[hazard_str]
+                expected = {
+                    'loss_mean': np.mean([resp[(c, 'loss_mean')]
+                                          for c in comp_ids]),
+                    'loss_std': np.mean([resp[(c, 'loss_std')]
+                                         for c in comp_ids]),
+                    'loss_tot': np.sum([resp[(c, 'loss_mean')]
+                                        for c in comp_ids]),
+                    'func_mean': np.mean([resp[(c, 'func_mean')]
+                                          for c in comp_ids]),
+                    'func_std': np.mean([resp[(c, 'func_std')]
+                                         for c in comp_ids]),
+                    'num_failures': np.mean([resp[(c, 'num_failures')]
+                                             for c in comp_ids])}
+                for response, value in expected.items():
+                    self.assertAlmostEqual(
+                        comptype_resp_df.loc[(component_type, response),
+                                             hazard_str],
+                        value)
+
+
+@unittest.skipIf(pq is None, "pyarrow is not installed")
+class TestEventTableExport(unittest.TestCase):
+    def setUp(self):
+        self.output_path = tempfile.mkdtemp()
+        self.scenario = Scenario(config_file, self.output_path)
+        self.scenario.num_samples = 20
+        self.scenario.run_parallel_proc = 0
+        self.scenario.checkpoint = False
+        self.scenario.requested_metrics = ['loss', 'output']
+        self.scenario.export_event_table = True
+        self.infrastructure = ingest_spreadsheet(config_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.output_path)
+
+    def test_row_group_per_hazard(self):
+        response_list = calculate_response(self.scenario, self.infrastructure)
+
+        # the table is written by the simulation, one hazard at a time
+        parquet_file = pq.ParquetFile(
+            os.path.join(self.output_path, EVENT_TABLE_FILE_NAME))
+        self.assertEqual(parquet_file.num_row_groups,
+                         self.scenario.num_hazard_pts)
+        table = parquet_file.read().to_pandas()
+        for j, hazard in enumerate(self.scenario.hazard_intensity_vals):
+            rows = table[table['hazard'] == hazard]
+            np.testing.assert_allclose(rows['economic_loss'].values,
+                                       response_list[4][:, j])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import matplotlib
+matplotlib.use('Agg')
+
+import unittest
+
+import numpy as np
+
+from model_ingest import ingest_spreadsheet
+from sifraclasses import Scenario
+
+config_file = '../tests/test_identical_comps.conf'
+
+
+def component_function_at_time(infrastructure, scenario, component_ds):
+    """
+    Functionality of each component over the restoration period, for the
+    given damage state index of each component.
+    """
+    return np.array(
+        [infrastructure.calc_recov_time_given_comp_ds(
+            infrastructure.components[comp_key], damage_state, scenario)
+         for comp_key, damage_state in
+         zip(sorted(infrastructure.components.keys()), component_ds)])
+
+
+class TestOutputGivenRecovery(unittest.TestCase):
+    def setUp(self):
+        self.scenario = Scenario(config_file)
+        self.infrastructure = ingest_spreadsheet(config_file)
+        num_components = len(self.infrastructure.components)
+        # a mix of the damage states, from none to complete
+        self.component_ds = np.arange(num_components) % 5
+        self.comp_func = component_function_at_time(
+            self.infrastructure, self.scenario, self.component_ds)
+
+        self.scenario.recovery_mode = 'time_grid'
+        self.grid_output = self.infrastructure.calc_output_given_recovery(
+            self.comp_func, self.scenario)
+
+    def test_event_at_checkpoints(self):
+        self.scenario.recovery_mode = 'event'
+        self.scenario.recovery_checkpoints = [2.0, 5.0, 8.0]
+        event_output = self.infrastructure.calc_output_given_recovery(
+            self.comp_func, self.scenario, {})
+
+        checkpoint_steps = np.searchsorted(
+            self.scenario.restoration_time_range,
+            self.scenario.recovery_checkpoints)
+        for time_step in np.append(0, checkpoint_steps):
+            self.assertAlmostEqual(event_output[time_step],
+                                   self.grid_output[time_step])
+
+    def test_event_with_small_quantum(self):
+        # with a quantum far below the changes of functionality between
+        # the time steps, every time step is a breakpoint
+        self.scenario.recovery_mode = 'event'
+        self.scenario.recovery_checkpoints = None
+        self.scenario.recovery_func_quantum = 1.0e-12
+        event_output = self.infrastructure.calc_output_given_recovery(
+            self.comp_func, self.scenario, {})
+
+        np.testing.assert_allclose(event_output, self.grid_output,
+                                   rtol=1.0e-9, atol=1.0e-6)
+
+
+class TestRecoveryTime(unittest.TestCase):
+    def setUp(self):
+        self.scenario = Scenario(config_file)
+        self.scenario.recovery_mode = 'time_grid'
+        self.infrastructure = ingest_spreadsheet(config_file)
+        self.num_components = len(self.infrastructure.components)
+
+    def test_bisection_matches_grid(self):
+        for component_ds in [np.ones(self.num_components, dtype=int),
+                             np.full(self.num_components, 2, dtype=int),
+                             np.arange(self.num_components) % 5]:
+            comp_func = component_function_at_time(
+                self.infrastructure, self.scenario, component_ds)
+            output = self.infrastructure.calc_output_given_recovery(
+                comp_func, self.scenario)
+            grid_time = self.infrastructure.recovery_time_given_output(
+                output[np.newaxis, :], self.scenario)[0]
+            direct_time = self.infrastructure.calc_recovery_time(
+                component_ds, self.scenario)
+            # the grid time is the first time step at which the output
+            # reaches the threshold
+            self.assertLessEqual(abs(grid_time - direct_time),
+                                 self.scenario.restore_time_step)
+
+
+if __name__ == '__main__':
+    unittest.main()
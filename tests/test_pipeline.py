@@ -0,0 +1,58 @@
+import matplotlib
+matplotlib.use('Agg')
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from sifraclasses import Scenario
+from pipeline import run_pipeline
+
+config_file = '../tests/test_small_ps.conf'
+
+
+def directory_listings(paths):
+    return {path: sorted(os.listdir(path)) if os.path.isdir(path) else None
+            for path in paths}
+
+
+class TestRunPipeline(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_no_outputs_written(self):
+        scenario = Scenario(config_file, write_outputs=False)
+        self.assertFalse(scenario.checkpoint)
+        self.assertFalse(scenario.export_event_table)
+        # the result cache, and the timestamped output directories of
+        # runs without an output path, are in the root of the project
+        watched_paths = [
+            self.tempdir, os.getcwd(), scenario.cache_dir,
+            os.path.dirname(os.path.join(scenario.root_dir,
+                                         scenario.output_dir_name))]
+        listings = directory_listings(watched_paths)
+
+        output_path = os.path.join(self.tempdir, 'output')
+        results = run_pipeline(config_file, output_path, write_outputs=False,
+                               processes=1)
+
+        self.assertFalse(os.path.exists(output_path))
+        self.assertEqual(directory_listings(watched_paths), listings)
+
+        self.assertIn('fragility', results['models'])
+        self.assertIn('restoration', results['models'])
+        # the scenario hazard values are analysed from the response in
+        # memory
+        line_rst_times_df = results['line_rst_times']
+        self.assertEqual(
+            sorted(set(line_rst_times_df.columns.get_level_values(0))),
+            results['scenario'].scenario_hazard_values)
+        self.assertFalse(line_rst_times_df.isnull().values.any())
+
+
+if __name__ == '__main__':
+    unittest.main()
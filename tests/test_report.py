@@ -0,0 +1,72 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from results_store import ResultsStore, results_store_path
+from box_summary import box_stats, box_stats_array
+from report import generate_report
+
+
+class TestGenerateReport(unittest.TestCase):
+    def setUp(self):
+        self.output_path = tempfile.mkdtemp()
+        self.raw_output_dir = os.path.join(self.output_path, 'raw_output')
+        self.hazards = ['0.100', '0.200', '0.300']
+        self.store = ResultsStore(results_store_path(self.raw_output_dir))
+        self.store.write_metadata(
+            'scenario',
+            {'hazard_intensity_vals': [0.1, 0.2, 0.3],
+             'intensity_measure_param': 'PGA',
+             'intensity_measure_unit': 'g',
+             'time_unit': 'week'})
+        prng = np.random.RandomState(3)
+        self.store.write_by_hazard(
+            'economic_loss_box_stats',
+            box_stats_array(box_stats(prng.uniform(size=(50, 3)), axis=0)),
+            self.hazards, 1)
+
+    def tearDown(self):
+        shutil.rmtree(self.output_path)
+
+    def test_stored_figures_rendered(self):
+        pe_sys = np.array([[1.0, 1.0, 1.0],
+                           [0.2, 0.5, 0.8],
+                           [0.1, 0.3, 0.6]])
+        self.store.write_by_hazard(
+            'pe_sys_econloss', pe_sys, self.hazards, 1,
+            axes=('damage_state', 'hazard'),
+            labels={'damage_state': ['DS0 None', 'DS1 Slight',
+                                     'DS2 Moderate']})
+
+        figfiles = generate_report(self.raw_output_dir, processes=1)
+
+        self.assertEqual(
+            sorted(os.path.basename(figfile) for figfile in figfiles),
+            ['fig_lossratio_boxplot.png', 'fig_sys_pe_econloss.png'])
+        for figfile in figfiles:
+            self.assertEqual(os.path.dirname(figfile), self.output_path)
+            self.assertTrue(os.path.exists(figfile))
+        # the restoration profile was not stored, so it is not rendered
+        self.assertFalse(os.path.exists(
+            os.path.join(self.output_path, 'fig_restoration_profile.png')))
+
+    def test_process_pool(self):
+        self.store.write_by_hazard(
+            'restoration_profile', np.linspace(0.0, 1.0, 15).reshape(3, 5),
+            self.hazards, 0, axes=('hazard', 'time'),
+            labels={'time': [0.0, 1.0, 2.0, 3.0, 4.0]})
+
+        figfiles = generate_report(self.raw_output_dir, processes=2)
+
+        self.assertEqual(
+            sorted(os.path.basename(figfile) for figfile in figfiles),
+            ['fig_lossratio_boxplot.png', 'fig_restoration_profile.png'])
+        for figfile in figfiles:
+            self.assertTrue(os.path.exists(figfile))
+
+
+if __name__ == '__main__':
+    unittest.main()
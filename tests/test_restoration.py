@@ -0,0 +1,159 @@
+import itertools
+import unittest
+
+import numpy as np
+from scipy import stats
+
+from restoration import min_repair_set, list_schedule, schedule_repairs, \
+    sample_repair_durations, batch_list_schedule, line_restoration_times, \
+    recovery_given_hazard, full_restoration_times
+
+
+def brute_force_repair_set(capacities, threshold, path_nodes, base_nodes):
+    """ Enumerate the subsets of the supply nodes, in increasing size """
+    best = (np.inf, None, None)
+    for size in range(1, len(capacities) + 1):
+        for subset in itertools.combinations(range(len(capacities)), size):
+            if sum(capacities[i] for i in subset) < threshold:
+                continue
+            nodes = set(base_nodes).union(*[path_nodes[i] for i in subset])
+            if len(nodes) < best[0]:
+                best = (len(nodes), subset, nodes)
+    return best[1], best[2]
+
+
+class TestRepairSet(unittest.TestCase):
+    def test_against_enumeration(self):
+        prng = np.random.RandomState(8)
+        for trial in range(200):
+            num_supply = prng.randint(1, 8)
+            capacities = list(prng.dirichlet(np.ones(num_supply)))
+            threshold = prng.uniform(0.05, 1.0)
+            path_nodes = [set(prng.choice(12, prng.randint(1, 6)))
+                          for _ in range(num_supply)]
+            base_nodes = set(prng.choice(12, 2))
+            self.assertEqual(
+                min_repair_set(capacities, threshold, path_nodes, base_nodes),
+                brute_force_repair_set(capacities, threshold, path_nodes,
+                                       base_nodes))
+
+    def test_infeasible(self):
+        self.assertEqual(min_repair_set([0.2, 0.3], 0.6, [{1}, {2}]),
+                         (None, None))
+
+    def test_many_supply_nodes(self):
+        # only the two large supply nodes are needed, the search does not
+        # enumerate the 2^40 subsets
+        capacities = [0.5, 0.5] + [0.001] * 40
+        path_nodes = [{'a'}, {'b'}] + [{'c', 'd', i} for i in range(40)]
+        subset, nodes = min_repair_set(capacities, 1.0, path_nodes, {'z'})
+        self.assertEqual(subset, (0, 1))
+        self.assertEqual(nodes, {'a', 'b', 'z'})
+
+
+class TestSchedule(unittest.TestCase):
+    def test_single_stream(self):
+        start, end, freed = list_schedule([5.0, 3.0, 2.0], 1, start_time=1.0)
+        self.assertEqual(start.tolist(), [1.0, 6.0, 9.0])
+        self.assertEqual(end.tolist(), [6.0, 9.0, 11.0])
+        self.assertEqual(freed.tolist(), [True, True, False])
+
+    def test_first_free_stream(self):
+        start, end, freed = list_schedule([10.0, 4.0, 3.0, 2.0, 1.0], 2)
+        # the second stream repairs the 4, 3 and 2 unit tasks in turn
+        self.assertEqual(start.tolist(), [0.0, 0.0, 4.0, 7.0, 9.0])
+        self.assertEqual(end.tolist(), [10.0, 4.0, 7.0, 9.0, 10.0])
+        self.assertEqual(freed.tolist(), [False, True, True, True, False])
+
+    def test_delays_of_first_tasks(self):
+        start, _, _ = list_schedule([4.0, 4.0, 4.0, 1.0], 3, start_time=1.0,
+                                    delays=[0.4, 0.4, 0.4, 0.1])
+        self.assertTrue(np.allclose(start, [1.0, 1.4, 1.8, 5.0]))
+
+    def test_streams_in_one_call(self):
+        prng = np.random.RandomState(6)
+        durations = prng.uniform(1, 20, size=2000)
+        schedules = schedule_repairs(durations, [1, 4, 16])
+        self.assertTrue(np.isclose(np.max(schedules[1][1]),
+                                   np.sum(durations)))
+        for num_streams, (start, end, _) in schedules.items():
+            self.assertTrue(np.allclose(end - start, durations))
+            # at no time are more tasks running than there are streams
+            events = np.concatenate((start, end))
+            for t in events[::97]:
+                running = np.sum((start <= t) & (end > t))
+                self.assertTrue(running <= num_streams)
+
+
+class TestStochasticRestoration(unittest.TestCase):
+    def test_sampled_durations(self):
+        pb = np.array([[1.0, 0.0, 0.0],
+                       [0.0, 0.0, 1.0],
+                       [0.5, 0.5, 0.0]])
+        mean = np.array([[0.0, 5.0, 50.0]] * 3)
+        std = np.array([[1.0, 1.0, 2.0]] * 3)
+        durations = sample_repair_durations(pb, mean, std, 20000,
+                                            np.random.RandomState(1))
+        self.assertEqual(durations.shape, (20000, 3))
+        self.assertTrue(np.all(durations[:, 0] == 0))
+        self.assertAlmostEqual(np.mean(durations[:, 1]), 50.0, delta=0.1)
+        self.assertAlmostEqual(np.std(durations[:, 1]), 2.0, delta=0.1)
+        self.assertAlmostEqual(np.mean(durations[:, 2] > 0), 0.5, delta=0.02)
+
+    def test_batch_matches_list_schedule(self):
+        prng = np.random.RandomState(12)
+        durations = prng.uniform(1, 10, size=(50, 30))
+        end = batch_list_schedule(durations, 4, start_time=2.0)
+        for r in range(50):
+            _, expected, _ = list_schedule(durations[r], 4, start_time=2.0)
+            self.assertTrue(np.allclose(end[r], expected))
+
+    def test_undamaged_tasks_not_scheduled(self):
+        durations = np.array([[3.0, 0.0, 2.0]])
+        end = batch_list_schedule(durations, 1)
+        self.assertTrue(np.isnan(end[0, 1]))
+        self.assertEqual(end[0, 2], 5.0)
+
+    def test_line_times(self):
+        end = np.array([[3.0, np.nan, 5.0],
+                        [4.0, 1.0, np.nan]])
+        line_tasks = np.array([[True, False, False],
+                               [True, True, False],
+                               [False, True, False]])
+        self.assertEqual(line_restoration_times(end, line_tasks).tolist(),
+                         [[3.0, 5.0, 0.0], [4.0, 1.0, 0.0]])
+
+
+class TestRecovery(unittest.TestCase):
+    def test_against_scalar_recovery(self):
+        # Example from HAZUS MH MR3, Technical Manual, Ch.8, p8-73
+        m = np.array([[np.inf, 0.15, 0.25, 0.35, 0.70]])
+        b = np.array([[1.0, 0.60, 0.50, 0.40, 0.40]])
+        rmu = np.array([[-np.inf, 1.0, 3.0, 7.0, 30.0]])
+        rsd = np.array([[1.0, 0.5, 1.5, 3.5, 15.0]])
+        times = np.arange(0.0, 60.0, 1.0)
+        hazard = 0.3
+        recovery = recovery_given_hazard(hazard, m, b, rmu, rsd, times)
+        self.assertEqual(recovery.shape, (1, 60))
+
+        pe = [stats.lognorm.cdf(hazard, b[0, d], scale=m[0, d])
+              for d in range(5)]
+        pb = [1.0 - pe[1], pe[1] - pe[2], pe[2] - pe[3], pe[3] - pe[4], pe[4]]
+        for k, t in enumerate(times):
+            recov = [1.0] + [stats.norm.cdf(t, rmu[0, d], scale=rsd[0, d])
+                             for d in range(1, 5)]
+            self.assertAlmostEqual(recovery[0, k],
+                                   sum(p * r for p, r in zip(pb, recov)))
+
+    def test_full_restoration_times(self):
+        times = np.array([0.0, 1.0, 2.0, 3.0])
+        functionality = np.array([[0.5, 0.99, 1.0, 1.0],
+                                  [1.0, 1.0, 1.0, 1.0],
+                                  [0.1, 0.2, 0.3, 0.4]])
+        self.assertEqual(
+            full_restoration_times(functionality, times, 0.98).tolist(),
+            [1.0, 0.0, 3.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
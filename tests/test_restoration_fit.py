@@ -0,0 +1,37 @@
+import unittest
+
+import numpy as np
+from scipy import stats
+
+from restoration_fit import fit_restoration_curves
+
+
+class TestRestorationFit(unittest.TestCase):
+    def setUp(self):
+        self.times = np.linspace(0, 200, 101)
+        self.means = np.array([20.0, 60.0, 110.0])
+        self.stddevs = np.array([8.0, 15.0, 25.0])
+        self.profiles = stats.norm.cdf(self.times[np.newaxis, :],
+                                       loc=self.means[:, np.newaxis],
+                                       scale=self.stddevs[:, np.newaxis])
+
+    def test_fit(self):
+        means, stddevs, chisqr = fit_restoration_curves(self.times,
+                                                        self.profiles)
+        self.assertTrue(np.allclose(means, self.means, rtol=1e-3))
+        self.assertTrue(np.allclose(stddevs, self.stddevs, rtol=1e-3))
+        self.assertEqual(chisqr.shape, (3,))
+
+    def test_missing_profile(self):
+        # no sample of any hazard level is in the second damage state
+        profiles = self.profiles.copy()
+        profiles[1] = np.nan
+        means, stddevs, _ = fit_restoration_curves(self.times, profiles)
+        self.assertTrue(np.isnan(means[1]))
+        self.assertTrue(np.isnan(stddevs[1]))
+        self.assertTrue(np.allclose(means[[0, 2]], self.means[[0, 2]],
+                                    rtol=1e-3))
+
+
+if __name__ == '__main__':
+    unittest.main()
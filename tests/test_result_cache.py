@@ -0,0 +1,40 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from result_cache import ResultCache
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_save_and_load(self):
+        cache = ResultCache(self.cache_dir, 10 ** 6)
+        self.assertIsNone(cache.load('abc'))
+        cache.save('abc', [{'0.100': 1.0}, [1, 2, 3]])
+        self.assertEqual(cache.load('abc'), [{'0.100': 1.0}, [1, 2, 3]])
+
+    def test_least_recently_used_evicted(self):
+        cache = ResultCache(self.cache_dir, 10 ** 6)
+        cache.save('first', range(1000))
+        cache.save('second', range(1000))
+        os.utime(cache.result_path('first'), (1, 1))
+        os.utime(cache.result_path('second'), (2, 2))
+        cache.load('first')
+
+        # room for only two of the three results
+        cache.max_bytes = os.path.getsize(cache.result_path('first')) * 2
+        cache.save('third', range(1000))
+
+        self.assertIsNotNone(cache.load('first'))
+        self.assertIsNone(cache.load('second'))
+        self.assertIsNotNone(cache.load('third'))
+
+
+if __name__ == '__main__':
+    unittest.main()
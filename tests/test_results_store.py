@@ -0,0 +1,159 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from results_store import ResultsStore, RunResults
+
+
+class TestResultsStore(unittest.TestCase):
+    def setUp(self):
+        self.store_dir = os.path.join(tempfile.mkdtemp(), 'results_store')
+        self.hazards = ['0.100', '0.200', '0.300']
+
+    def tearDown(self):
+        shutil.rmtree(os.path.dirname(self.store_dir))
+
+    def check_arrays(self, store_format):
+        store = ResultsStore(self.store_dir, store_format)
+        loss = np.random.uniform(size=(20, 3))
+        recovery = np.random.uniform(size=(20, 3, 7))
+        store.write_by_hazard('economic_loss_array', loss, self.hazards, 1)
+        store.write_by_hazard('output_array_given_recovery', recovery,
+                              self.hazards, 1)
+        store.write('restoration_time_range', np.arange(7))
+
+        # a new reader gets the contents from the manifest
+        store = ResultsStore(self.store_dir)
+        self.assertEqual(store.store_format, store_format)
+        self.assertEqual(store.hazards, self.hazards)
+        self.assertTrue(np.array_equal(store.read('economic_loss_array'),
+                                       loss))
+        self.assertTrue(np.array_equal(
+            store.read('output_array_given_recovery', ['0.300']),
+            recovery[:, 2:3, :]))
+        self.assertTrue(np.array_equal(
+            store.read_chunk('economic_loss_array', '0.200'), loss[:, 1]))
+        self.assertTrue(np.array_equal(store.read('restoration_time_range'),
+                                       np.arange(7)))
+
+    def test_npz_format(self):
+        self.check_arrays('npz')
+
+    def test_npy_format(self):
+        self.check_arrays('npy')
+
+    def test_default_format_is_compressed(self):
+        self.assertEqual(ResultsStore(self.store_dir).store_format, 'npz')
+
+    def test_npy_format_is_memory_mapped(self):
+        store = ResultsStore(self.store_dir, 'npy')
+        store.write_by_hazard('economic_loss_array',
+                              np.random.uniform(size=(20, 3)),
+                              self.hazards, 1)
+        chunk = RunResults(self.store_dir).get('economic_loss_array',
+                                               hazard='0.200')
+        self.assertIsInstance(chunk, np.memmap)
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            ResultsStore(self.store_dir, 'csv')
+
+    def test_one_manifest_write_per_array(self):
+        store = ResultsStore(self.store_dir)
+        manifest_writes = []
+        write_manifest = store._write_manifest
+
+        def counting_write_manifest():
+            manifest_writes.append(1)
+            write_manifest()
+        store._write_manifest = counting_write_manifest
+
+        store.write_by_hazard('economic_loss_array',
+                              np.random.uniform(size=(20, 3)),
+                              self.hazards, 1)
+        store.write_dict_by_hazard(
+            'ids_comp_vs_haz',
+            {hazard: np.zeros((20, 4), dtype=int) for hazard in self.hazards},
+            2)
+        self.assertEqual(len(manifest_writes), 2)
+        self.assertEqual(ResultsStore(self.store_dir).names(),
+                         ['economic_loss_array', 'ids_comp_vs_haz'])
+
+    def test_response_dicts(self):
+        store = ResultsStore(self.store_dir)
+        component_resp_dict = {
+            hazard: {(comp_id, response): float(i + j + k)
+                     for j, comp_id in enumerate(['boiler', 'turbine'])
+                     for k, response in enumerate(['loss_mean', 'func_mean'])}
+            for i, hazard in enumerate(self.hazards)}
+        sys_output_dict = {hazard: {'output_1': float(i)}
+                           for i, hazard in enumerate(self.hazards)}
+        store.write_response_dict('component_resp_dict', component_resp_dict,
+                                  axes=('component', 'response'))
+        store.write_response_dict('sys_output_dict', sys_output_dict,
+                                  axes=('output',))
+
+        store = ResultsStore(self.store_dir)
+        self.assertEqual(store.read_response_dict('component_resp_dict'),
+                         component_resp_dict)
+        self.assertEqual(store.read_response_dict('sys_output_dict'),
+                         sys_output_dict)
+        self.assertEqual(store.read('component_resp_dict').shape, (2, 2, 3))
+
+
+class TestRunResults(unittest.TestCase):
+    def setUp(self):
+        self.store_dir = os.path.join(tempfile.mkdtemp(), 'results_store')
+        self.hazards = ['0.100', '0.200', '0.300']
+        self.comp_ids = ['boiler_1', 'boiler_2', 'turbine_1']
+        self.ids = np.random.randint(0, 5, size=(10, 3, 3))
+        self.recovery = np.random.uniform(size=(10, 3, 6))
+
+        store = ResultsStore(self.store_dir, 'npy')
+        store.write_metadata('component_types',
+                             {'boiler_1': 'Boiler', 'boiler_2': 'Boiler',
+                              'turbine_1': 'Turbine'})
+        store.write_by_hazard('ids_comp_vs_haz', self.ids, self.hazards, 2,
+                              axes=('sample', 'component', 'hazard'),
+                              labels={'component': self.comp_ids})
+        store.write_by_hazard('output_array_given_recovery', self.recovery,
+                              self.hazards, 1,
+                              axes=('sample', 'hazard', 'time'),
+                              labels={'time': [0, 1, 2, 3, 4, 5]})
+
+    def tearDown(self):
+        shutil.rmtree(os.path.dirname(self.store_dir))
+
+    def test_select_hazard(self):
+        results = RunResults(self.store_dir)
+        self.assertTrue(np.array_equal(results.get('ids_comp_vs_haz'),
+                                       self.ids))
+        self.assertTrue(np.array_equal(results.get('ids_comp_vs_haz', 0.2),
+                                       self.ids[:, :, 1]))
+        self.assertTrue(np.array_equal(
+            results.get('ids_comp_vs_haz', [0.1, '0.300']),
+            self.ids[:, :, [0, 2]]))
+
+    def test_select_components(self):
+        results = RunResults(self.store_dir)
+        self.assertTrue(np.array_equal(
+            results.get('ids_comp_vs_haz', component='turbine_1'),
+            self.ids[:, [2], :]))
+        self.assertTrue(np.array_equal(
+            results.get('ids_comp_vs_haz', 0.3, component_type='Boiler'),
+            self.ids[:, [0, 1], 2]))
+        with self.assertRaises(KeyError):
+            results.get('ids_comp_vs_haz', component='pump')
+
+    def test_select_time_window(self):
+        results = RunResults(self.store_dir)
+        self.assertTrue(np.array_equal(
+            results.get('output_array_given_recovery', time_window=(1, 3)),
+            self.recovery[:, :, 1:4]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import matplotlib
+matplotlib.use('Agg')
+
+import unittest
+
+from model_ingest import ingest_spreadsheet
+from sifraclasses import Scenario
+from infrastructure_response import calculate_response, \
+    comptype_response_df, component_response_df
+from scenario_loss_analysis import load_facility, loss_analysis_data, \
+    analyse_scenario, analyse_scenarios
+
+config_file = '../tests/test_ss.conf'
+
+
+class TestAnalyseScenarios(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.scenario = Scenario(config_file, write_outputs=False)
+        cls.scenario.requested_metrics = ['loss']
+        infrastructure = ingest_spreadsheet(config_file)
+        response_list = calculate_response(cls.scenario, infrastructure)
+        cls.facility = load_facility(config_file, write_outputs=False)
+        cls.results = loss_analysis_data(
+            cls.facility,
+            comptype_response_df(response_list, infrastructure, cls.scenario),
+            component_response_df(response_list, cls.scenario))
+        cls.hazards = cls.scenario.scenario_hazard_values
+
+    def analyse(self, processes):
+        return analyse_scenarios(self.results, self.facility, self.scenario,
+                                 processes=processes, draw_figures=False,
+                                 write_outputs=False)
+
+    def assert_same_analyses(self, analyses, expected_analyses):
+        self.assertEqual(len(analyses), len(expected_analyses))
+        for analysis, expected in zip(analyses, expected_analyses):
+            self.assertEqual(analysis['line_rst_times'],
+                             expected['line_rst_times'])
+            self.assertTrue(analysis['component_fullrst_time'].equals(
+                expected['component_fullrst_time']))
+            for streams, rst_setup_df in expected['rst_setup'].items():
+                self.assertTrue(
+                    analysis['rst_setup'][streams].equals(rst_setup_df))
+
+    def test_matches_serial_loop(self):
+        serial = [analyse_scenario(self.results, self.facility,
+                                   self.scenario, hazard,
+                                   draw_figures=False, write_outputs=False)
+                  for hazard in self.hazards]
+        line_rst_times_df, analyses = self.analyse(processes=1)
+
+        self.assert_same_analyses(analyses, serial)
+        out_node_list = self.facility.network.out_node_list
+        for hazard, analysis in zip(self.hazards, serial):
+            for streams in self.scenario.restoration_streams:
+                self.assertEqual(
+                    list(line_rst_times_df[(hazard, streams)]),
+                    [analysis['line_rst_times'][streams][onode]
+                     for onode in out_node_list])
+
+    def test_process_pool(self):
+        serial_df, serial = self.analyse(processes=1)
+        pooled_df, pooled = self.analyse(processes=2)
+
+        self.assertTrue(pooled_df.equals(serial_df))
+        self.assert_same_analyses(pooled, serial)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+
+import numpy as np
+
+from sifra.modelling.sketches import HistogramSketch, merge_sketches
+
+
+class TestHistogramSketch(unittest.TestCase):
+    def setUp(self):
+        prng = np.random.RandomState(11)
+        self.values = prng.beta(2.0, 5.0, size=20000)
+
+    def test_percentiles(self):
+        sketch = HistogramSketch(0.0, 1.0).add(self.values)
+        self.assertEqual(sketch.count, self.values.size)
+        estimated = sketch.percentiles([5, 50, 95])
+        exact = np.percentile(self.values, [5, 50, 95])
+        # the error is within the width of a bin
+        self.assertTrue(np.all(np.abs(estimated - exact) <= sketch.bin_width))
+
+    def test_extremes(self):
+        sketch = HistogramSketch(0.0, 1.0).add(self.values)
+        self.assertEqual(sketch.quantile(0.0), np.min(self.values))
+        self.assertEqual(sketch.quantile(1.0), np.max(self.values))
+
+    def test_merge(self):
+        whole = HistogramSketch(0.0, 1.0).add(self.values)
+        blocks = [{'economic_loss': HistogramSketch(0.0, 1.0).add(block)}
+                  for block in np.array_split(self.values, 7)]
+        merged = merge_sketches(blocks)['economic_loss']
+        self.assertTrue(np.array_equal(merged.counts, whole.counts))
+        self.assertTrue(np.allclose(merged.percentiles([5, 50, 95]),
+                                    whole.percentiles([5, 50, 95])))
+        # the sketches of the blocks are not changed by the merge
+        self.assertEqual(blocks[0]['economic_loss'].count,
+                         np.array_split(self.values, 7)[0].size)
+
+    def test_incompatible_merge(self):
+        with self.assertRaises(ValueError):
+            HistogramSketch(0.0, 1.0).merge(HistogramSketch(0.0, 2.0))
+
+    def test_empty(self):
+        self.assertTrue(np.all(np.isnan(
+            HistogramSketch(0.0, 1.0).percentiles([5, 95]))))
+
+
+if __name__ == '__main__':
+    unittest.main()